@@ -17,22 +17,55 @@ CREATE TABLE accounts(
 
 DROP TABLE IF EXISTS logins CASCADE;
 CREATE TABLE logins(
-  id SERIAL,
+  id SERIAL PRIMARY KEY,
   user_id VARCHAR,
   session_key VARCHAR UNIQUE NOT NULL
 );
+CREATE INDEX logins_user_id ON logins (user_id);
 
 DROP SCHEMA IF EXISTS forms CASCADE;
 CREATE SCHEMA forms;
 
+DROP TABLE IF EXISTS form_groupings;
+DROP TABLE IF EXISTS form_responses;
 DROP TABLE IF EXISTS hosted_forms;
 CREATE TABLE hosted_forms(
   id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
   account_id INT NOT NULL REFERENCES accounts(id) ON DELETE CASCADE,
-  form_structure VARCHAR NOT NULL,
+  form_structure JSONB NOT NULL,
   created_at TIMESTAMP NOT NULL DEFAULT NOW(),
   expires_at TIMESTAMP
 );
+CREATE INDEX hosted_forms_account_id ON hosted_forms (account_id);
+
+CREATE TABLE form_groupings(
+  form_id UUID PRIMARY KEY REFERENCES hosted_forms(id) ON DELETE CASCADE,
+  schedule VARCHAR NOT NULL,
+  score INT,
+  generated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Responses of every form, for the "jsonb" response store
+CREATE TABLE form_responses(
+  id BIGSERIAL,
+  form_id UUID NOT NULL REFERENCES hosted_forms(id) ON DELETE CASCADE,
+  answers JSONB NOT NULL,
+  PRIMARY KEY (form_id, id)
+) PARTITION BY HASH (form_id);
+
+CREATE TABLE form_responses_0 PARTITION OF form_responses FOR VALUES WITH (MODULUS 8, REMAINDER 0);
+CREATE TABLE form_responses_1 PARTITION OF form_responses FOR VALUES WITH (MODULUS 8, REMAINDER 1);
+CREATE TABLE form_responses_2 PARTITION OF form_responses FOR VALUES WITH (MODULUS 8, REMAINDER 2);
+CREATE TABLE form_responses_3 PARTITION OF form_responses FOR VALUES WITH (MODULUS 8, REMAINDER 3);
+CREATE TABLE form_responses_4 PARTITION OF form_responses FOR VALUES WITH (MODULUS 8, REMAINDER 4);
+CREATE TABLE form_responses_5 PARTITION OF form_responses FOR VALUES WITH (MODULUS 8, REMAINDER 5);
+CREATE TABLE form_responses_6 PARTITION OF form_responses FOR VALUES WITH (MODULUS 8, REMAINDER 6);
+CREATE TABLE form_responses_7 PARTITION OF form_responses FOR VALUES WITH (MODULUS 8, REMAINDER 7);
+
+-- Containment filters on answers, e.g. answers @> '{"are_you_a_group_leader": "true"}'
+CREATE INDEX form_responses_answers ON form_responses USING GIN (answers jsonb_path_ops);
+-- Looking up a form's submission by the respondent's email
+CREATE INDEX form_responses_email ON form_responses (form_id, (answers ->> 'email'));
 
 INSERT INTO mupp_setup_demo (name) VALUES ('test1'), ('test2'), ('test3');
 
@@ -0,0 +1,13 @@
+-- form_structure was VARCHAR before it held JSONB
+DO $$
+BEGIN
+  IF (
+    SELECT data_type FROM information_schema.columns
+    WHERE table_schema = current_schema()
+    AND table_name = 'hosted_forms'
+    AND column_name = 'form_structure'
+  ) <> 'jsonb' THEN
+    ALTER TABLE hosted_forms
+      ALTER COLUMN form_structure TYPE JSONB USING form_structure::jsonb;
+  END IF;
+END $$;
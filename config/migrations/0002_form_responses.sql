@@ -0,0 +1,19 @@
+-- Responses of every form, for the "jsonb" response store
+CREATE TABLE IF NOT EXISTS form_responses(
+  id BIGSERIAL,
+  form_id UUID NOT NULL REFERENCES hosted_forms(id) ON DELETE CASCADE,
+  answers JSONB NOT NULL,
+  PRIMARY KEY (form_id, id)
+) PARTITION BY HASH (form_id);
+
+CREATE TABLE IF NOT EXISTS form_responses_0 PARTITION OF form_responses FOR VALUES WITH (MODULUS 8, REMAINDER 0);
+CREATE TABLE IF NOT EXISTS form_responses_1 PARTITION OF form_responses FOR VALUES WITH (MODULUS 8, REMAINDER 1);
+CREATE TABLE IF NOT EXISTS form_responses_2 PARTITION OF form_responses FOR VALUES WITH (MODULUS 8, REMAINDER 2);
+CREATE TABLE IF NOT EXISTS form_responses_3 PARTITION OF form_responses FOR VALUES WITH (MODULUS 8, REMAINDER 3);
+CREATE TABLE IF NOT EXISTS form_responses_4 PARTITION OF form_responses FOR VALUES WITH (MODULUS 8, REMAINDER 4);
+CREATE TABLE IF NOT EXISTS form_responses_5 PARTITION OF form_responses FOR VALUES WITH (MODULUS 8, REMAINDER 5);
+CREATE TABLE IF NOT EXISTS form_responses_6 PARTITION OF form_responses FOR VALUES WITH (MODULUS 8, REMAINDER 6);
+CREATE TABLE IF NOT EXISTS form_responses_7 PARTITION OF form_responses FOR VALUES WITH (MODULUS 8, REMAINDER 7);
+
+CREATE INDEX IF NOT EXISTS form_responses_answers ON form_responses USING GIN (answers jsonb_path_ops);
+CREATE INDEX IF NOT EXISTS form_responses_email ON form_responses (form_id, (answers ->> 'email'));
@@ -0,0 +1,4 @@
+-- Sessions are looked up by user when logging in
+CREATE INDEX IF NOT EXISTS logins_user_id ON logins (user_id);
+-- Forms are listed by owner
+CREATE INDEX IF NOT EXISTS hosted_forms_account_id ON hosted_forms (account_id);
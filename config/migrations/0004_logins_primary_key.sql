@@ -0,0 +1,8 @@
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_constraint WHERE conrelid = 'logins'::regclass AND contype = 'p'
+  ) THEN
+    ALTER TABLE logins ADD PRIMARY KEY (id);
+  END IF;
+END $$;
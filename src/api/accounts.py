@@ -1,6 +1,5 @@
-from os import environ
 from flask_restful import Resource, reqparse
-from db.utils.db import Database
+from api.request_db import get_db, json_response
 from psycopg2.errors import UniqueViolation
 import hashlib
 import secrets
@@ -9,11 +8,12 @@ from api.logins import require_login
 
 class Accounts(Resource):
     def get(self):
-        db = Database(environ.get("DB_SCHEMA", "public"))
-        return db.tables["accounts"].select(["username", "email"])
+        db = get_db()
+        accounts, _, _ = db.tables["accounts"].select_json(["username", "email"])
+        return json_response(accounts)
 
     def post(self):
-        db = Database(environ.get("DB_SCHEMA", "public"))
+        db = get_db()
         parser = reqparse.RequestParser(bundle_errors=True)
         parser.add_argument(
             "username", type=str, help="'username' must be a string", required=False
@@ -48,7 +48,7 @@ class Accounts(Resource):
 
 class Account(Resource):
     def get(self, account_id):
-        db = Database(environ.get("DB_SCHEMA", "public"))
+        db = get_db()
         try:
             accounts = db.tables["accounts"].select(
                 ["username", "email"], {"id": account_id}
@@ -62,7 +62,7 @@ class Account(Resource):
 
     @require_login
     def put(self, account_id):
-        db = Database(environ.get("DB_SCHEMA", "public"))
+        db = get_db()
         parser = reqparse.RequestParser(bundle_errors=True)
         parser.add_argument(
             "username", type=str, help="'username' must be a string", required=True
@@ -98,7 +98,7 @@ class Account(Resource):
             return {"message": "email already in use"}, 409
 
     def delete(self, account_id):
-        db = Database(environ.get("DB_SCHEMA", "public"))
+        db = get_db()
         try:
             res = db.tables["accounts"].delete({"id": account_id}, returning=["id"])
             if len(res) == 1:
@@ -0,0 +1,33 @@
+from functools import lru_cache
+from flask_restful import Resource, request
+from db.utils.db import Database, plan_capture
+from api.logins import require_login
+
+MAX_OFFENDERS = 100
+
+
+@lru_cache(maxsize=1)
+def debug_operators() -> frozenset:
+    """Ids of the accounts allowed on debug endpoints, from `debug_operators` in db.yml"""
+    # Sessions hold user ids as text
+    return frozenset(str(id) for id in Database.load_config().get("debug_operators") or [])
+
+
+class QueryPlans(Resource):
+    @require_login
+    def get(self):
+        """
+        Query shapes that took the most database time in this worker, with
+        their latest plans. Only served to operators, while plan capture is on.
+        """
+        if not plan_capture.enabled:
+            return {"message": "Query plan capture is off"}, 404
+        if str(request.user_id) not in debug_operators():
+            return {"message": "Error: Operators only"}, 403
+        try:
+            limit = int(request.args.get("limit", 10))
+        except ValueError:
+            return {"message": "limit must be a number"}, 400
+        if not 0 < limit <= MAX_OFFENDERS:
+            return {"message": f"limit must be between 1 and {MAX_OFFENDERS}"}, 400
+        return plan_capture.plans.top(limit)
@@ -1,26 +1,72 @@
-from os import environ
-from flask import request
+from flask import request, Response
 from flask_restful import Resource, reqparse
 from psycopg2.errors import ForeignKeyViolation
-from db.utils.db import Database
-from db.form_hosting import generate_form_table, format_table_name
+from api.request_db import get_db, detach_db, stream_and_close, json_response
+from db.form_hosting import get_column_label_map
+from db.response_store import get_response_store
 from json import dumps, loads
 from api.logins import require_login, get_user_id_from_session_key
-from db.form_hosting import generate_groupings_for_form
+from db.form_hosting import generate_groupings_for_form, solve_groupings_for_form
+from db.MatchingAlgorithms import stream_schedule
 from flask import jsonify
 
+MAX_PAGE_SIZE = 1000
+
+
+def parse_page_args(keys: tuple = ("id",)) -> dict:
+    """
+    Read `fields`, `limit` and `after` query args for a list endpoint.
+    Paged results are ordered by the monotonic sort `keys`, ending with a
+    unique column. With several keys, `after` is the JSON array of their
+    values that the previous page sent as its cursor.
+    """
+    page = {}
+    if request.args.get("fields"):
+        page["fields"] = request.args["fields"].split(",") + ["id"]
+    if "limit" in request.args:
+        limit = int(request.args["limit"])
+        if not 0 < limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+        page["limit"] = limit
+    if "after" in request.args:
+        page["after"] = request.args["after"]
+        if len(keys) > 1:
+            try:
+                page["after"] = loads(page["after"])
+            except ValueError:
+                page["after"] = None
+            if not isinstance(page["after"], list) or len(page["after"]) != len(keys):
+                raise ValueError("after must be the cursor of a previous page")
+    if "limit" in page or "after" in page:
+        page["order_by"] = list(keys)
+    return page
+
+
+def page_headers(count: int, last: str | None, page: dict) -> dict:
+    """Point a `Next-Cursor` header at the `last` sort values of a full page of `count` entities"""
+    if "limit" in page and count == page["limit"]:
+        return {"Next-Cursor": last}
+    return {}
 
 
 class Forms(Resource):
     @require_login
     def get(self):        
-        db = Database(environ.get("DB_SCHEMA", "public"))
+        db = get_db()
         user_id = get_user_id_from_session_key(request.headers.get('Session-Key'))
-        return (db.tables['hosted_forms'].select(where={ 'account_id': user_id }))
+        try:
+            # Form ids are random, so pages follow creation order
+            page = parse_page_args(("created_at", "id"))
+        except ValueError as e:
+            return {"message": str(e)}, 400
+        forms, count, last = db.tables['hosted_forms'].select_json(
+            where={ 'account_id': user_id }, **page
+        )
+        return json_response(forms, 200, page_headers(count, last, page))
     
     @require_login
     def post(self):
-        db = Database(environ.get("DB_SCHEMA", "public"))
+        db = get_db()
         # TODO: Form structure validation, login and posting to database
         parser = reqparse.RequestParser(bundle_errors=True)
         parser.add_argument(
@@ -36,16 +82,18 @@ class Forms(Resource):
 
         try:
             # print("Parsed args:", args)
-            form = db.tables["hosted_forms"].insert(
-                {
-                    "account_id": account_id,
-                    "form_structure": dumps(args["form_structure"]),
-                },
-                ["id"],
-            )
-
-            # print("Inserted into hosted_forms, new form id:", form["id"])
-            generate_form_table(db, form["id"])
+            # One commit for the form and its table; neither is kept if either fails
+            with db.transaction():
+                form = db.tables["hosted_forms"].insert(
+                    {
+                        "account_id": account_id,
+                        "form_structure": dumps(args["form_structure"]),
+                    },
+                    ["id"],
+                )
+
+                # print("Inserted into hosted_forms, new form id:", form["id"])
+                get_response_store().create(db, form["id"])
             # TODO: Consider returning formatted id
             return {"form_endpoint": form["id"]}, 201
         except ForeignKeyViolation:
@@ -58,16 +106,15 @@ class Forms(Resource):
 class Form(Resource):
     @require_login
     def delete(self, form_id: str):
-        db = Database(environ.get("DB_SCHEMA", "public"))
-
-        # Delete form table if it exists
-        table_name = format_table_name(form_id)
-        if db.tables.get(table_name):
-            db.exec_commit(f'DROP TABLE IF EXISTS {table_name}')
+        db = get_db()
 
-        # Delete from hosted_forms
         try:
-            result = db.tables["hosted_forms"].delete({"id": form_id}, ['id'])
+            with db.transaction():
+                # Delete form responses if they exist
+                get_response_store().drop(db, form_id)
+
+                # Delete from hosted_forms
+                result = db.tables["hosted_forms"].delete({"id": form_id}, ['id'])
             if result is None:
                 return {"message": "Form not found"}, 404
             return "", 204
@@ -76,29 +123,26 @@ class Form(Resource):
             return {"message": "Failed to delete form"}, 500
 
     def get(self, form_id: str):
-        form_name = format_table_name(form_id)
-        db = Database(environ.get("DB_SCHEMA", "public"))
-        if db.tables.get(form_name) is None:
+        db = get_db()
+        if not get_response_store().exists(db, form_id):
             return {"message": "Form not found"}, 404
         try:
-            data = db.tables.get("hosted_forms").select(
-                ["form_structure"], {"id": form_id}, 1
-            )
-            data['form_structure'] = loads(data['form_structure'])
-            return data, 200
+            data = db.tables.get("hosted_forms").select_json_obj(["form_structure"], {"id": form_id})
+            if data is None:
+                return {"message": "Form not found"}, 404
+            return json_response(data)
         except Exception as e:
             print(e)
             return {"message": "Something went wrong"}, 500
 
     def post(self, form_id: str):
-        db = Database(environ.get("DB_SCHEMA", "public"))
+        db = get_db()
         body = request.get_json()
-        table_name = format_table_name(form_id)
-        if db.tables.get(table_name) is None:
+        store = get_response_store()
+        if not store.exists(db, form_id):
             return {"message": "Form not found"}, 404
         try:
-            valid_fields = db.tables[table_name]._columns
-            ordered_columns = [col["column_name"] for col in valid_fields if col["column_name"] != "id"]
+            ordered_columns = store.columns(db, form_id)
 
             print("Ordered columns:", ordered_columns)
             print("Incoming body values:", list(body.values()))
@@ -108,16 +152,10 @@ class Form(Resource):
             if len(values) != len(ordered_columns):
                 return {"message": "Mismatched fields"}, 400
 
-            insert_dict = {}
-            for col_name, value in zip(ordered_columns, values):
-                col_type = next(col["type"] for col in valid_fields if col["column_name"] == col_name)
-                if col_type == "json" and not isinstance(value, str):
-                    insert_dict[col_name] = dumps(value)
-                else:
-                    insert_dict[col_name] = value
+            insert_dict = dict(zip(ordered_columns, values))
 
             print("Filtered body being inserted:", insert_dict)
-            db.tables[table_name].insert(insert_dict)
+            store.insert(db, form_id, insert_dict)
             return "", 201
         except Exception as e:
             print(e)
@@ -126,22 +164,61 @@ class Form(Resource):
 class FormResponses(Resource):
     @require_login
     def get(self, form_id):
-        form_name = format_table_name(form_id)
-        db = Database(environ.get("DB_SCHEMA", "public"))
-        if db.tables.get(form_name) is None:
+        db = get_db()
+        store = get_response_store()
+        if not store.exists(db, form_id):
             return {"message": "Form not found"}, 404
         try:
-            data = db.tables.get(form_name).select()
-            return data, 200
+            page = parse_page_args()
+        except ValueError as e:
+            return {"message": str(e)}, 400
+        if "limit" not in page:
+            # Unbounded, so stream every response from a server-side cursor
+            rows = store.view(db, form_id).stream_json(
+                page.get("fields", []), order_by=page.get("order_by"), after=page.get("after")
+            )
+            return json_response(stream_and_close(detach_db(), rows))
+        try:
+            data, count, last = store.view(db, form_id).select_json(**page)
+            return json_response(data, 200, page_headers(count, last, page))
         except Exception as e:
             print(e)
             return {"message": "Something went wrong"}, 500
-    
+
+
+class FormResponsesExport(Resource):
+    @require_login
+    def get(self, form_id):
+        db = get_db()
+        store = get_response_store()
+        if not store.exists(db, form_id):
+            return {"message": "Form not found"}, 404
+        try:
+            labels = get_column_label_map(db, form_id)
+            rows = store.view(db, form_id).export_csv(labels)
+        except Exception as e:
+            print(e)
+            return {"message": "Something went wrong"}, 500
+        # The COPY runs while the response is sent, after request teardown
+        return Response(
+            stream_and_close(detach_db(), rows),
+            mimetype="text/csv",
+            headers={"Content-Disposition": f"attachment; filename={form_id}.csv"},
+        )
+
 class FormGroupings(Resource):
     def get(self, form_id):
-        db = Database(environ.get("DB_SCHEMA", "public"))
+        db = get_db()
         try:
-            grouping_result = generate_groupings_for_form(db, form_id)
+            exact = request.args.get("solver") == "exact"
+            stream = request.args.get("stream")
+            if stream in ("json", "ndjson"):
+                leaders, participants = solve_groupings_for_form(db, form_id, exact)
+                return Response(
+                    stream_schedule(leaders, participants, stream == "ndjson"),
+                    mimetype="application/x-ndjson" if stream == "ndjson" else "application/json",
+                )
+            grouping_result = generate_groupings_for_form(db, form_id, exact)
             return jsonify(grouping_result)
         except Exception as e:
             print(e)
@@ -1,6 +1,5 @@
-from os import environ
 from flask_restful import Resource, reqparse, request
-from db.utils.db import Database
+from api.request_db import get_db
 from psycopg2.errors import UniqueViolation
 from functools import wraps
 import hashlib
@@ -15,10 +14,12 @@ def require_login(func):
         if session_key is None:
             return {"message": "Error: Session key is required"}, 401
 
-        schema = environ.get("DB_SCHEMA", "public")
-        db = Database(schema)
+        db = get_db()
 
-        result = db.tables["logins"].select(where={"session_key": session_key})
+        # Sessions are used right after logging in, before replicas may have them
+        result = db.tables["logins"].select(
+            where={"session_key": session_key}, prepare=True, primary=True
+        )
 
         if not result:
             return {"message": "Error: Invalid session key"}, 401
@@ -34,7 +35,7 @@ def require_login(func):
 class GetLoginTable(Resource):
     @require_login
     def get(self):
-        db = Database(environ.get("DB_SCHEMA", "public"))
+        db = get_db()
         return db.tables["logins"].select(["id", "user_id", "session_key"])
 
 
@@ -50,7 +51,7 @@ class LoginAPI(Resource):
         parser.add_argument("password", type=str, required=True)
         args = parser.parse_args()
 
-        db = Database(environ.get("DB_SCHEMA", "public"))
+        db = get_db()
 
         user_result = db.tables["accounts"].select(where={"email": args["email"]})
         if not user_result:
@@ -84,7 +85,7 @@ class LogoutAPI(Resource):
         """This will log a user out, and remove the session key from the session table"""
         session_key = request.headers.get("session-key")
 
-        db = Database(environ.get("DB_SCHEMA", "public"))
+        db = get_db()
         user_result = db.tables["logins"].select(where={"session-key": session_key})
         if not user_result:
             return {"message": "Login session not found"}, 404
@@ -96,7 +97,7 @@ class LogoutAPI(Resource):
 
 def get_username_by_ID(user_id):
     """Returns a username if it exists from an ID, and None if not"""
-    db = Database(environ.get("DB_SCHEMA", "public"))
+    db = get_db()
     result = db.tables["accounts"].select(where={"id": user_id})
     if result:
         user = result[0] if isinstance(result, list) else result
@@ -105,8 +106,10 @@ def get_username_by_ID(user_id):
 
 def get_user_id_from_session_key(session_key):
     """Helper function that returns a username from the session key"""
-    db = Database(environ.get("DB_SCHEMA", "public"))
-    result = db.tables["logins"].select(where={"session_key": session_key})
+    db = get_db()
+    result = db.tables["logins"].select(
+        where={"session_key": session_key}, prepare=True, primary=True
+    )
     if result:
         user_id = result[0] if isinstance(result, list) else result
         return user_id["user_id"]
@@ -0,0 +1,62 @@
+from os import environ
+from flask import g, Response
+from db.utils.db import Database
+from db.utils.pool import get_pool
+from db.utils.instrumentation import track_queries, tracked_queries
+
+
+def get_db() -> Database:
+    """
+    Database for the current request, checked out of the schema's pool
+    on first use and shared by `require_login` and the handler.
+    """
+    if "db" not in g:
+        schema = environ.get("DB_SCHEMA", "public")
+        g.db = Database(schema, get_pool(schema))
+    return g.db
+
+
+def close_db(exception=None):
+    """Return the request's connection to the pool at teardown"""
+    db = g.pop("db", None)
+    if db is not None and db.is_open:
+        db.close()
+
+
+def count_queries():
+    """Start the current request's query counters"""
+    track_queries()
+
+
+def add_server_timing(response: Response) -> Response:
+    """Report the request's query count and time in a `Server-Timing` header"""
+    stats = tracked_queries()
+    if stats is not None:
+        response.headers.add(
+            "Server-Timing",
+            f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries"',
+        )
+    return response
+
+
+def detach_db() -> Database:
+    """
+    Take the request's Database away from teardown, for responses that
+    keep reading after the view returns. The caller must close it.
+    """
+    db = get_db()
+    g.pop("db")
+    return db
+
+
+def stream_and_close(db: Database, chunks):
+    """Yield `chunks`, then return the detached `db`'s connection to the pool"""
+    try:
+        yield from chunks
+    finally:
+        db.close()
+
+
+def json_response(document, status: int = 200, headers: dict = {}) -> Response:
+    """Send JSON already rendered by Postgres (text, or an iterable of byte chunks) as is"""
+    return Response(document, status, headers, mimetype="application/json")
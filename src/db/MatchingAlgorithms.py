@@ -1,8 +1,15 @@
 import random
 import copy
+from json import dumps
+
+try:
+    import pulp
+except ImportError:  # exact mode falls back to the tier list generator
+    pulp = None
 
 rounds = 3
 max_group_size = 5
+exact_max_slots = 30000  # leader/participant/round variables the exact solver takes on
 num_questions = 5
 question_weights = [5, 2, 1, 1, 1]
 
@@ -71,7 +78,22 @@ def generate_matches(leaders, participants, weights):
             leader.matches[match_score].append(participant)
 
 
-def tier_list_optimized_generator(leaders, participants):
+def match_tier(leader, participants, tier, scores=None):
+    """
+    Participants matching a leader with score `tier`: the leader's bucket
+    from generate_matches, or read from the ScoreMatrix `scores` when given
+    so the buckets are never held in memory.
+    """
+    if scores is None:
+        return(leader.matches[tier])
+    return([participant for participant, score in zip(participants, scores.row(leader)) if score == tier])
+
+
+def tier_list_optimized_generator(leaders, participants, scores=None, rng=random):
+    """
+    Match scores are read from the ScoreMatrix `scores` when given, else from generate_matches.
+    Shuffles draw from `rng`, the shared random module unless a random.Random is passed.
+    """
     generation_complete = False
     total_slots_available = len(participants) * rounds
     round_matching_order = []
@@ -91,12 +113,13 @@ def tier_list_optimized_generator(leaders, participants):
       while((k < total_slots_available) and (not generation_complete)):
         k+=1
         for i in range(total_weights-1, -1, -1):
-          random.shuffle(leaders)
+          rng.shuffle(leaders)
           for leader in leaders:
-            random.shuffle(leader.matches[i])
-            for participant in leader.matches[i]:
+            tier = match_tier(leader, participants, i, scores)
+            rng.shuffle(tier)
+            for participant in tier:
               if((participant.rounds_scheduled < rounds) and (leader not in participant.schedule) and leader.slots_open > 0):
-                random.shuffle(round_matching_order)
+                rng.shuffle(round_matching_order)
                 for round in round_matching_order:
                   if((len(leader.schedule[round]) < max_group_size) and (participant.schedule[round] == None) and (leader not in participant.schedule)):
                     leader.schedule_participant(round, participant)
@@ -107,6 +130,67 @@ def tier_list_optimized_generator(leaders, participants):
     
     return(genetic_optimizer)
 
+def exact_optimized_generator(leaders, participants, weights, time_limit=30, scores=None):
+  """
+  Solve the schedule as an integer program with PuLP's bundled CBC solver,
+  under the same rules as tier_list_optimized_generator: every participant
+  meets one leader per round, groups stay within max_group_size and no
+  leader is repeated. The tier list schedule seeds the solver and is kept
+  whenever CBC is missing, the event has more than exact_max_slots
+  leader/participant/round slots, or the solver cannot beat it within
+  time_limit seconds. Match scores are read from the ScoreMatrix `scores` when given.
+  Returns True when the schedule left in place is proven optimal.
+  """
+  tier_list_optimized_generator(leaders, participants, scores)
+  if pulp is None or len(leaders) * len(participants) * rounds > exact_max_slots:
+    return(False)
+  solver = pulp.COIN_CMD(msg=False, timeLimit=time_limit, warmStart=True)
+  if not solver.available():
+    return(False)
+  incumbent_score = TMSCalc(generate_parent(leaders), weights, scores)
+
+  problem = pulp.LpProblem("mupp_schedule", pulp.LpMaximize)
+  slots = {}
+  for li, leader in enumerate(leaders):
+    for pi, participant in enumerate(participants):
+      for round in range(rounds):
+        slot = problem.add_variable(f"x_{li}_{pi}_{round}", cat=pulp.LpBinary)
+        slot.setInitialValue(1 if participant.schedule[round] is leader else 0)
+        slots[leader, participant, round] = slot
+
+  if scores is None:
+    match_score = lambda leader, participant: leader.match_participant(participant, weights)
+  else:
+    match_score = scores.score
+  problem += pulp.lpSum(
+    match_score(leader, participant) * slot
+    for (leader, participant, _), slot in slots.items()
+  )
+  for participant in participants:
+    for round in range(rounds):
+      problem += pulp.lpSum(slots[leader, participant, round] for leader in leaders) == 1
+    for leader in leaders:
+      problem += pulp.lpSum(slots[leader, participant, round] for round in range(rounds)) <= 1
+  for leader in leaders:
+    for round in range(rounds):
+      problem += pulp.lpSum(slots[leader, participant, round] for participant in participants) <= max_group_size
+
+  problem.solve(solver)
+  if problem.sol_status not in (pulp.LpSolutionOptimal, pulp.LpSolutionIntegerFeasible):
+    return(False)
+  if problem.sol_status != pulp.LpSolutionOptimal and pulp.value(problem.objective) <= incumbent_score:
+    return(False)
+
+  for participant in participants:
+    participant.clear_schedule()
+  for leader in leaders:
+    leader.clear_schedule()
+  for (leader, participant, round), slot in slots.items():
+    if slot.varValue is not None and slot.varValue > 0.5:
+      leader.schedule_participant(round, participant)
+      participant.schedule_round(round, leader)
+  return(problem.sol_status == pulp.LpSolutionOptimal)
+
 def p_sch_name_conversion(participant_schedule):
   name_schedule = []
   for leader in participant_schedule:
@@ -128,7 +212,31 @@ def output_schedule(leaders,participants):
     schedule_dict[participant.name] = p_sch_name_conversion(participant.schedule) 
   return(schedule_dict)
             
-def gene_evaluator(gene,weights):
+def schedule_entries(leaders, participants):
+  """Lazily pair each person's name with their schedule in names, without mutating it"""
+  for leader in leaders:
+    yield(leader.name, [[p.name for p in group] for group in leader.schedule])
+  for participant in participants:
+    yield(participant.name, [l.name if l is not None else None for l in participant.schedule])
+
+def stream_schedule(leaders, participants, ndjson=False):
+  """
+  Yield the schedule in chunks as it is read from solver state. By default
+  the chunks join into the same JSON object output_schedule builds; with
+  ndjson each chunk is one {"name": ..., "schedule": ...} line.
+  """
+  if ndjson:
+    for name, schedule in schedule_entries(leaders, participants):
+      yield(dumps({"name": name, "schedule": schedule}) + "\n")
+    return
+  
+  separator = "{"
+  for name, schedule in schedule_entries(leaders, participants):
+    yield(separator + dumps(name) + ": " + dumps(schedule))
+    separator = ", "
+  yield("{}" if separator == "{" else "}")
+            
+def gene_evaluator(gene,weights,scores=None):
   """
   Weights for future implementation of genetic algorithm variance to be tied to front end
   
@@ -140,14 +248,17 @@ def gene_evaluator(gene,weights):
   
   TMSWeight = 1
   
-  return(TMSWeight*TMSCalc(gene,weights))
+  return(TMSWeight*TMSCalc(gene,weights,scores))
 
-def TMSCalc(gene,weights):
+def TMSCalc(gene,weights,scores=None):
   total_match_score = 0
   for leader, schedule in gene.items():
     for round in schedule:
       for participant in round:
-        total_match_score += leader.match_participant(participant,weights)
+        if scores is not None:
+          total_match_score += scores.score(leader, participant)
+        else:
+          total_match_score += leader.match_participant(participant,weights)
   return(total_match_score)
 
 def min_group_size_calc(gene):
@@ -222,19 +333,19 @@ def check_valid_gene(gene):
   return(True)
     
 
-def mutation(gene):
+def mutation(gene, rng=random):
   mutated_gene = copy.deepcopy(gene)
   leaders = list(mutated_gene.keys())
   
   if not leaders: 
     return (mutated_gene)
   
-  leader = random.choice(leaders)
-  round_index = random.randint(0, rounds - 1)
+  leader = rng.choice(leaders)
+  round_index = rng.randint(0, rounds - 1)
   participants = mutated_gene[leader][round_index]
   
   if len(participants) >= 2:
-    i, j = random.sample(range(len(participants)), 2)
+    i, j = rng.sample(range(len(participants)), 2)
     participants[i], participants[j] = participants[j], participants[i]
   
   if(check_valid_gene):  
@@ -243,7 +354,7 @@ def mutation(gene):
     return(gene)
 
 
-def crossover(gene_one, gene_two):
+def crossover(gene_one, gene_two, rng=random):
   child = {}
   
   for leader in gene_one:
@@ -256,43 +367,88 @@ def crossover(gene_one, gene_two):
   if check_valid_gene(child):
     return (child)
   else:
-    if random.random() < 0.5:
+    if rng.random() < 0.5:
       return(gene_one)
     else:
       return(gene_two)
 
 
       
-def genetic_optimizer(leaders, participants, weights):
-  max_score = 0
-  optimal_gene = None
-  generation_size = 10
-  iterations = 10
-  generate_matches(leaders, participants, weights)
+def snapshot_gene(leaders):
+  """Copy the leaders' current schedules into a gene that later runs cannot alter"""
+  gene = {}
+  for leader in leaders:
+    gene[leader] = [list(group) for group in leader.schedule]
+  return(gene)
+
+def seed_population(leaders, participants, generation_size, seed=None, scores=None, rng=None):
+  """
+  Build a starting generation from independent tier list runs.
+  Runs draw from `rng`, or a random.Random of their own made from `seed`,
+  so a seed makes the population reproducible without touching the
+  shared random module.
+  """
+  if rng is None:
+    rng = random.Random(seed)
   generation = []
   for _ in range(generation_size):
-    generation.append(generate_parent(leaders))
+    tier_list_optimized_generator(leaders, participants, scores, rng)
+    generation.append(snapshot_gene(leaders))
+  return(generation)
+
+def gene_signature(gene):
+  """Hashable summary of who meets whom each round, ignoring order within a group"""
+  signature = []
+  for leader, schedule in gene.items():
+    groups = tuple(tuple(sorted(p.name for p in group)) for group in schedule)
+    signature.append((leader.name, groups))
+  return(tuple(sorted(signature)))
+
+def population_diversity(generation):
+  """Number of distinct schedules in a generation"""
+  return(len(set(gene_signature(gene) for gene in generation)))
+
+def genetic_optimizer(leaders, participants, weights, generation_size=10, iterations=10, patience=3, seed=None, scores=None):
+  """
+  Evolve schedules seeded from independent tier list runs.
+  Stops early once the best score has not improved for `patience`
+  generations or every gene in the population is the same schedule.
+  Match scores are read from the ScoreMatrix `scores` when given.
+  Every random choice draws from one random.Random made from `seed`.
+  """
+  rng = random.Random(seed)
+  max_score = 0
+  optimal_gene = None
+  stale_generations = 0
+  if scores is None:
+    generate_matches(leaders, participants, weights)
+  generation = seed_population(leaders, participants, generation_size, scores=scores, rng=rng)
 
 
   for j in range(iterations):
     scored_generation = []
     for gene in generation:
-      scored_generation.append((gene, gene_evaluator(gene, weights)))
+      scored_generation.append((gene, gene_evaluator(gene, weights, scores)))
 
     scored_generation.sort(key=lambda x: x[1], reverse=True)
     
     if scored_generation[0][1] > max_score:
       max_score = scored_generation[0][1]
       optimal_gene = scored_generation[0][0]
+      stale_generations = 0
+    else:
+      stale_generations += 1
+    if stale_generations >= patience or population_diversity(generation) <= 1:
+      break
     new_generation = [scored_generation[0][0], scored_generation[1][0]]
     
     while len(new_generation) < generation_size:
-      parent_one = random.choice(scored_generation[:5])[0]
-      parent_two = random.choice(scored_generation[:5])[0]
-      child = crossover(parent_one, parent_two)
+      parent_one = rng.choice(scored_generation[:5])[0]
+      parent_two = rng.choice(scored_generation[:5])[0]
+      child = crossover(parent_one, parent_two, rng)
       
-      if random.random() < 0.3:
-        child = mutation(child)
+      if rng.random() < 0.3:
+        child = mutation(child, rng)
         
       new_generation.append(child)
     generation = new_generation
@@ -0,0 +1,138 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from json import dumps
+import csv
+import os.path as path
+import time
+from .utils.db import Database
+from .form_hosting import (
+    column_name,
+    get_uuid_to_column_map,
+    build_grouping_members,
+    solve_groupings,
+)
+from .response_store import get_response_store
+from .MatchingAlgorithms import TMSCalc, generate_parent, output_schedule
+
+
+def load_form_members(schema: str, form_id: str) -> tuple[list, list]:
+    """
+    Read a hosted form's responses from the database as Leaders and Participants.
+    Responses are streamed, so only the built members stay in memory.
+    """
+    db = Database(schema)
+    try:
+        columns = list(get_uuid_to_column_map(db, form_id).values())
+        store = get_response_store()
+        if not store.exists(db, form_id):
+            raise ValueError(f"Form {form_id} has no responses")
+        return build_grouping_members(store.rows(db, form_id), columns)
+    finally:
+        db.cleanup()
+
+
+def load_csv_rows(csv_path: str) -> tuple[list, list]:
+    """
+    Read exported responses, using the header row as the column order.
+    Exports are headed by question labels, which map back to response columns.
+    """
+    with open(csv_path, "r", newline="") as file:
+        reader = csv.reader(file)
+        header = [column_name(label) for label in next(reader, [])]
+        rows = [dict(zip(header, values)) for values in reader]
+    columns = [col for col in header if col != "id"]
+    return rows, columns
+
+
+def solve_source(
+    source: tuple, exact: bool = False, time_limit: int = 30, score_dir: str | None = None
+) -> dict:
+    """
+    Generate groupings for a single form.
+    `source` is either ("db", schema, form_id) or ("csv", csv_path, form_id).
+    `exact` solves to optimality within `time_limit` seconds per form.
+    `score_dir` keeps each form's score matrix in a memory-mapped file there.
+    Runs inside worker processes, so errors are reported rather than raised.
+    """
+    kind, location, form_id = source
+    result = {"form_id": form_id, "source": kind}
+    try:
+        start = time.perf_counter()
+        if kind == "db":
+            leaders, participants = load_form_members(location, form_id)
+        else:
+            leaders, participants = build_grouping_members(*load_csv_rows(location))
+        loaded = time.perf_counter()
+
+        score_path = path.join(score_dir, f"{form_id}.scores") if score_dir else None
+        weights = solve_groupings(leaders, participants, exact, time_limit, score_path)
+        # Score before output_schedule swaps schedule entries for names
+        result["score"] = TMSCalc(generate_parent(leaders), weights)
+        result["schedule"] = output_schedule(leaders, participants)
+        solved = time.perf_counter()
+
+        result["leaders"] = len(leaders)
+        result["participants"] = len(participants)
+        result["load_seconds"] = loaded - start
+        result["solve_seconds"] = solved - loaded
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+def run_batch(
+    sources: list,
+    workers: int | None = None,
+    exact: bool = False,
+    time_limit: int = 30,
+    score_dir: str | None = None,
+) -> list:
+    """Solve every source across a process pool, preserving input order"""
+    solve = partial(solve_source, exact=exact, time_limit=time_limit, score_dir=score_dir)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(solve, sources))
+
+
+def write_results_to_files(results: list, out_dir: str):
+    """Write each successful schedule to `<out_dir>/<form_id>.json`"""
+    for result in results:
+        if "error" in result:
+            continue
+        with open(path.join(out_dir, f"{result['form_id']}.json"), "w") as file:
+            file.write(dumps(result["schedule"]))
+
+
+def write_results_to_database(db: Database, results: list):
+    """Store each successful schedule in `form_groupings`, replacing older runs"""
+    for result in results:
+        if "error" in result:
+            continue
+        db.exec_commit(
+            """
+            INSERT INTO form_groupings (form_id, schedule, score)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (form_id) DO UPDATE
+            SET schedule = EXCLUDED.schedule,
+                score = EXCLUDED.score,
+                generated_at = NOW();
+            """,
+            (result["form_id"], dumps(result["schedule"]), result["score"]),
+        )
+
+
+def format_summary(results: list) -> str:
+    """Tabulate timings and scores for a finished batch"""
+    lines = [
+        f"{'form':<38} {'leaders':>7} {'people':>7} {'load s':>8} {'solve s':>8} {'score':>7}"
+    ]
+    for result in results:
+        if "error" in result:
+            lines.append(f"{result['form_id']:<38} FAILED: {result['error']}")
+            continue
+        lines.append(
+            f"{result['form_id']:<38} {result['leaders']:>7} {result['participants']:>7} "
+            f"{result['load_seconds']:>8.3f} {result['solve_seconds']:>8.3f} {result['score']:>7}"
+        )
+    failed = len([r for r in results if "error" in r])
+    lines.append(f"{len(results) - failed} solved, {failed} failed")
+    return "\n".join(lines)
@@ -1,7 +1,8 @@
 from .utils.db import Database
-import json
+import os
 import re
-from .MatchingAlgorithms import Leader, Participant, generate_matches, tier_list_optimized_generator, output_schedule
+from .score_matrix import ScoreMatrix
+from .MatchingAlgorithms import Leader, Participant, tier_list_optimized_generator, exact_optimized_generator, output_schedule
 
 
 def format_table_name(uuid: str) -> str:
@@ -10,37 +11,63 @@ def format_table_name(uuid: str) -> str:
     return "f" + uuid.replace("-", "")
 
 
-def generate_form_table(db: Database, form_id: str):
-    """This will generate a form table based on the form_structure"""
-    table_name = format_table_name(form_id)
+def column_name(label: str) -> str:
+    """Response column for a question label, sanitized to a valid SQL identifier"""
+    return re.sub(r'\W+', '_', label.lower()).strip('_')
+
+
+# Response column types of question types; anything else is stored as text
+COLUMN_TYPES = {'textField': 'VARCHAR', 'boolean': 'BOOLEAN', 'numberScale': 'INT'}
+
+
+def column_type(entity_type: str) -> str:
+    """Postgres type of the response column for a question type"""
+    return COLUMN_TYPES.get(entity_type, 'VARCHAR')
 
-    form_structure_row = db.select(
-        "SELECT form_structure FROM hosted_forms WHERE id=%s", (form_id,)
-    )
 
-    if not form_structure_row:
+def get_form_questions(db: Database, form_id: str) -> list:
+    """
+    (uuid, label, type, required) of each question of a form, in `root` order,
+    read out of the JSONB form_structure by Postgres instead of parsing it whole
+    """
+    rows = db.select(
+        """
+        SELECT e.key, e.value #>> '{attributes,label}', e.value ->> 'type',
+          COALESCE(e.value #> '{attributes,required}' = 'true', FALSE)
+        FROM hosted_forms f
+        LEFT JOIN LATERAL JSONB_EACH(f.form_structure -> 'entities') AS e ON TRUE
+        LEFT JOIN LATERAL JSONB_ARRAY_ELEMENTS_TEXT(
+          CASE WHEN JSONB_TYPEOF(f.form_structure -> 'root') = 'array'
+          THEN f.form_structure -> 'root' ELSE '[]' END
+        ) WITH ORDINALITY AS r(key, position) ON r.key = e.key
+        WHERE f.id = %s
+        ORDER BY r.position NULLS LAST, e.key;
+        """,
+        (form_id,),
+    )
+    if not rows:
         raise ValueError(f"Form {form_id} not found")
+    questions = []
+    for uuid, label, entity_type, required in rows:
+        if uuid is None:
+            continue  # a form without entities
+        if label is None:
+            raise ValueError(f"Question {uuid} of form {form_id} has no label")
+        questions.append((uuid, label, entity_type, required))
+    return questions
 
-    form_structure = json.loads(form_structure_row[0][0])
+
+def generate_form_table(db: Database, form_id: str):
+    """This will generate a form table based on the form_structure"""
+    table_name = format_table_name(form_id)
 
     columns = []
     uuid_to_col = {}
 
-    for uuid, entity in form_structure['entities'].items():
-        entity_type = entity['type']
-        label = entity['attributes']['label']
-        safe_label = re.sub(r'\W+', '_', label.lower()).strip('_')  # sanitize to valid SQL identifier
+    for uuid, label, entity_type, required in get_form_questions(db, form_id):
+        safe_label = column_name(label)
         uuid_to_col[uuid] = safe_label
-        required = entity['attributes'].get('required',False)
-        if entity_type == 'textField':
-            pg_type = 'VARCHAR'
-        elif type == 'boolean':
-            pg_type = 'BOOLEAN'
-        elif type == 'numberScale':
-            pg_type = 'INT'
-        else:
-            pg_type = "VARCHAR"
-
+        pg_type = column_type(entity_type)
         columns.append(f"{safe_label} {pg_type}{' NOT NULL' if required else ''}")
     create_query = """
         CREATE TABLE {} (
@@ -50,61 +77,89 @@ def generate_form_table(db: Database, form_id: str):
     """.format(table_name, ',\n'.join(columns))
 
     db.exec_commit(create_query)
-    db.fetch_tables()
+    db.invalidate_tables()
     return uuid_to_col
 
 def get_uuid_to_column_map(db: Database, form_id: str) -> dict:
     """Reconstructs the UUID-to-column-name mapping from a form_id's structure"""
-    form_structure_row = db.select(
-        "SELECT form_structure FROM hosted_forms WHERE id=%s", (form_id,)
-    )
-    if not form_structure_row:
-        raise ValueError("Form not found")
-
-    form_structure = json.loads(form_structure_row[0][0])
-    uuid_to_col = {}
-
-    for uuid, entity in form_structure['entities'].items():
-        label = entity['attributes']['label']
-        safe_label = re.sub(r'\W+', '_', label.lower()).strip('_')
-        uuid_to_col[uuid] = safe_label
+    return {uuid: column_name(label) for uuid, label, _, _ in get_form_questions(db, form_id)}
 
-    return uuid_to_col
-
-def generate_groupings_for_form(db: Database, form_id: str) -> dict:
-    table_name = format_table_name(form_id)
-    uuid_to_col = get_uuid_to_column_map(db, form_id)
-    rows = db.tables[table_name].select()
+def get_column_label_map(db: Database, form_id: str) -> dict:
+    """Maps each response column of a form to the question label it was generated from"""
+    return {column_name(label): label for _, label, _, _ in get_form_questions(db, form_id)}
 
+def build_grouping_members(rows, columns: list) -> tuple[list, list]:
+    """
+    Split response rows (any iterable of dicts) into Leaders and Participants.
+    `columns` lists the form's column names in question order.
+    """
     # Infer key fields
-    leader_qid = next((uuid for uuid, col in uuid_to_col.items() if 'leader' in col), None)
-    name_qid = next((uuid for uuid, col in uuid_to_col.items() if 'name' in col), None)
-    email_qid = next((uuid for uuid, col in uuid_to_col.items() if 'email' in col), None)
-    answer_qids = [uuid for uuid in uuid_to_col if uuid not in {name_qid, email_qid, leader_qid}]
+    leader_col = next((col for col in columns if 'leader' in col), None)
+    name_col = next((col for col in columns if 'name' in col), None)
+    email_col = next((col for col in columns if 'email' in col), None)
+    answer_cols = [col for col in columns if col not in {name_col, email_col, leader_col}]
 
     leaders, participants = [], []
 
     for row in rows:
-        name = row[uuid_to_col[name_qid]]
-        email = row[uuid_to_col[email_qid]]
-        is_leader = str(row[uuid_to_col[leader_qid]]).strip().lower() in ("true", "1", "yes")
-        answers = [row[uuid_to_col[qid]] for qid in answer_qids]
+        name = row[name_col]
+        email = row[email_col]
+        is_leader = str(row[leader_col]).strip().lower() in ("true", "1", "yes")
+        answers = [row[col] for col in answer_cols]
 
         if is_leader:
             leaders.append(Leader(name, email, answers))
         else:
             participants.append(Participant(name, email, answers))
 
+    return leaders, participants
+
+
+def solve_groupings(
+    leaders: list,
+    participants: list,
+    exact: bool = False,
+    time_limit: int = 30,
+    score_path: str | None = None,
+) -> list:
+    """
+    Schedule participants with leaders in place, returning the weights used.
+    `exact` solves small events to optimality within `time_limit` seconds.
+    `score_path` keeps the match score matrix in a memory-mapped file there
+    while solving; the file is removed afterwards.
+    """
+    # Equal weights rank matches the same at any scale; unit weights keep
+    # scores inside the generator's tier list
+    weights = [1] * (len(leaders[0].preference_list) if leaders else 0)
+    scores = ScoreMatrix.build(leaders, participants, weights, score_path)
+    try:
+        if exact:
+            exact_optimized_generator(leaders, participants, weights, time_limit, scores)
+        else:
+            tier_list_optimized_generator(leaders, participants, scores)
+    finally:
+        scores.close()
+        if score_path is not None:
+            os.remove(score_path)
+    return weights
+
+
+def solve_groupings_for_form(db: Database, form_id: str, exact: bool = False) -> tuple[list, list]:
+    """Load a form's responses and schedule them, returning the Leaders and Participants"""
+    # Imported here since the response stores build on this module
+    from .response_store import get_response_store
+
+    uuid_to_col = get_uuid_to_column_map(db, form_id)
+    rows = get_response_store().rows(db, form_id)
+    leaders, participants = build_grouping_members(rows, list(uuid_to_col.values()))
+
     print(f"Leaders: {[l.name for l in leaders]}")
     print(f"Participants: {[p.name for p in participants]}")
 
-    weights = [5] * len(answer_qids)
+    solve_groupings(leaders, participants, exact)
+    return leaders, participants
 
-    for leader in leaders:
-        for participant in participants:
-            score = leader.match_participant(participant, weights)
-            print(f"{leader.name} vs {participant.name} = {score}")
 
-    generate_matches(leaders, participants, weights)
-    tier_list_optimized_generator(leaders, participants)
-    return output_schedule(leaders, participants)
\ No newline at end of file
+def generate_groupings_for_form(db: Database, form_id: str, exact: bool = False) -> dict:
+    leaders, participants = solve_groupings_for_form(db, form_id, exact)
+    return output_schedule(leaders, participants)
@@ -0,0 +1,162 @@
+from functools import lru_cache
+from json import dumps
+from os import environ
+from uuid import UUID
+from .utils.db import Database
+from .utils.table import Table
+from .form_hosting import (
+    column_name,
+    column_type,
+    format_table_name,
+    generate_form_table,
+    get_form_questions,
+    get_uuid_to_column_map,
+)
+
+
+class TableResponseStore:
+    """
+    Responses of each form in a table of their own, `f<uuid>`, with a
+    column per question. Creating and deleting a form runs DDL.
+    """
+
+    def create(self, db: Database, form_id: str):
+        generate_form_table(db, form_id)
+
+    def drop(self, db: Database, form_id: str):
+        table_name = format_table_name(form_id)
+        if db.tables.get(table_name):
+            db.exec_commit(f"DROP TABLE IF EXISTS {table_name}")
+            db.invalidate_tables()
+
+    def exists(self, db: Database, form_id: str) -> bool:
+        return db.tables.get(format_table_name(form_id)) is not None
+
+    def columns(self, db: Database, form_id: str) -> list:
+        """Response columns in question order"""
+        table = db.tables[format_table_name(form_id)]
+        return [col["column_name"] for col in table._columns if col["column_name"] != "id"]
+
+    def insert(self, db: Database, form_id: str, answers: dict):
+        table = db.tables[format_table_name(form_id)]
+        types = {col["column_name"]: col["type"] for col in table._columns}
+        table.insert(
+            {
+                col: dumps(value) if types.get(col) == "json" and not isinstance(value, str) else value
+                for col, value in answers.items()
+            }
+        )
+
+    def view(self, db: Database, form_id: str) -> Table:
+        """Table to read a form's responses from"""
+        return db.tables[format_table_name(form_id)]
+
+    def rows(self, db: Database, form_id: str):
+        """Stream every response as an object"""
+        return self.view(db, form_id).select(stream=True)
+
+
+class JsonbResponseStore:
+    """
+    Responses of every form in the hash partitioned `form_responses` table,
+    one row per submission with its answers in a JSONB object keyed by
+    response column. Creating and deleting a form needs no DDL.
+    Answers are cast to their question's column type on the way in and out,
+    so reads see each form as the table store's typed columns.
+    """
+
+    def questions(self, db: Database, form_id: str) -> list:
+        """(column, type, required) of each question, in order"""
+        return [
+            (column_name(label), column_type(entity_type), required)
+            for _, label, entity_type, required in get_form_questions(db, form_id)
+        ]
+
+    def create(self, db: Database, form_id: str):
+        # Nothing to create, but reject structures a form table could not hold
+        self.columns(db, form_id)
+
+    def drop(self, db: Database, form_id: str):
+        # Deleting the hosted form cascades to its responses
+        pass
+
+    def exists(self, db: Database, form_id: str) -> bool:
+        try:
+            UUID(form_id)
+        except ValueError:
+            return False
+        return db.select("SELECT 1 FROM hosted_forms WHERE id=%s", (form_id,), 1) is not None
+
+    def columns(self, db: Database, form_id: str) -> list:
+        """Response columns in question order"""
+        return list(get_uuid_to_column_map(db, form_id).values())
+
+    def insert(self, db: Database, form_id: str, answers: dict):
+        questions = self.questions(db, form_id)
+        missing = [col for col, _, required in questions if required and answers.get(col) is None]
+        if missing:
+            raise ValueError(f"Missing required answers: {missing}")
+        # Postgres casts each answer, rejecting values the column type would
+        given = [(col, pg_type) for col, pg_type, _ in questions if col in answers]
+        pairs = ", ".join(f"%s, %s::{pg_type}" for _, pg_type in given)
+        args = [form_id]
+        for col, _ in given:
+            value = answers[col]
+            args += [col, dumps(value) if isinstance(value, (dict, list)) else value]
+        db.exec_commit(
+            f"INSERT INTO form_responses (form_id, answers) VALUES (%s, JSONB_BUILD_OBJECT({pairs}));",
+            args,
+        )
+
+    def view(self, db: Database, form_id: str) -> Table:
+        """
+        Read-only Table over a form's responses, so selects, JSON and CSV
+        exports page and render them as they would a form table.
+        """
+        questions = tuple((col, pg_type) for col, pg_type, _ in self.questions(db, form_id))
+        return response_view(str(UUID(form_id)), questions, db)
+
+    def rows(self, db: Database, form_id: str):
+        """Stream every response as an object"""
+        return self.view(db, form_id).select(stream=True)
+
+
+# Names pg_catalog reports for COLUMN_TYPES, as Table metadata expects
+TYPE_NAMES = {"VARCHAR": "character varying", "INT": "integer", "BOOLEAN": "boolean"}
+
+
+def response_view(form_id: str, questions: tuple, db: Database) -> Table:
+    """Table over a form's responses, given its (column, type) questions"""
+    # The derived table stands in for a table name in every statement;
+    # form_id is a validated UUID, columns are sanitized labels and types
+    # come from COLUMN_TYPES
+    projection = ", ".join(
+        ["id"] + [f"(answers ->> '{col}')::{pg_type} AS {col}" for col, pg_type in questions]
+    )
+    name = f"(SELECT {projection} FROM form_responses WHERE form_id = '{form_id}') AS responses"
+    return Table(
+        name,
+        [{"column_name": "id", "type": "bigint"}]
+        + [{"column_name": col, "type": TYPE_NAMES[pg_type]} for col, pg_type in questions],
+        db,
+    )
+
+
+STORES = {"table": TableResponseStore(), "jsonb": JsonbResponseStore()}
+
+
+@lru_cache(maxsize=1)
+def configured_store() -> str:
+    return Database.load_config().get("response_store", "table")
+
+
+def get_response_store() -> TableResponseStore | JsonbResponseStore:
+    """
+    Backend holding form responses: "table" (default) or "jsonb", from the
+    RESPONSE_STORE environment variable or `response_store` in db.yml.
+    Switching backends does not move existing responses.
+    """
+    kind = environ.get("RESPONSE_STORE") or configured_store()
+    if kind not in STORES:
+        raise ValueError(f"Unknown response store '{kind}'")
+    return STORES[kind]
@@ -0,0 +1,75 @@
+from array import array
+import mmap
+
+
+class ScoreMatrix:
+    """
+    Leader-by-participant match scores, either held in memory or backed by
+    a file that is mapped read-only, so large events stay out of RAM and
+    several worker processes can share one matrix on disk.
+    """
+
+    TYPECODE = "i"
+
+    def __init__(self, leaders: list, participants: list, scores, file_map=None):
+        # Index by object since the generators shuffle the leader list in place
+        self._leader_index = {leader: i for i, leader in enumerate(leaders)}
+        self._participant_index = {p: i for i, p in enumerate(participants)}
+        self._width = len(participants)
+        self._scores = scores
+        self._map = file_map
+
+    @classmethod
+    def build(
+        cls,
+        leaders: list,
+        participants: list,
+        weights: list,
+        path: str | None = None,
+        block_rows: int = 64,
+    ) -> "ScoreMatrix":
+        """
+        Score every leader against every participant.
+        With a `path`, rows are written to the file `block_rows` leaders at
+        a time and the finished file is mapped instead of kept in memory.
+        """
+        if path is None:
+            scores = array(cls.TYPECODE)
+            for leader in leaders:
+                scores.extend(leader.match_participant(p, weights) for p in participants)
+            return cls(leaders, participants, memoryview(scores))
+
+        with open(path, "wb") as file:
+            for start in range(0, len(leaders), block_rows):
+                block = array(cls.TYPECODE)
+                for leader in leaders[start : start + block_rows]:
+                    block.extend(leader.match_participant(p, weights) for p in participants)
+                block.tofile(file)
+        return cls.open(leaders, participants, path)
+
+    @classmethod
+    def open(cls, leaders: list, participants: list, path: str) -> "ScoreMatrix":
+        """Map a matrix written by `build` read-only, in the same leader and participant order"""
+        expected = len(leaders) * len(participants) * array(cls.TYPECODE).itemsize
+        if expected == 0:
+            return cls(leaders, participants, memoryview(array(cls.TYPECODE)))
+        with open(path, "rb") as file:
+            file_map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(file_map) != expected:
+            file_map.close()
+            raise ValueError(f"Score matrix {path} does not match {len(leaders)}x{len(participants)}")
+        return cls(leaders, participants, memoryview(file_map).cast(cls.TYPECODE), file_map)
+
+    def score(self, leader, participant) -> int:
+        return self._scores[self._leader_index[leader] * self._width + self._participant_index[participant]]
+
+    def row(self, leader):
+        """Scores of one leader against every participant, in participant order"""
+        start = self._leader_index[leader] * self._width
+        return self._scores[start : start + self._width]
+
+    def close(self):
+        """Release the file mapping, if any"""
+        self._scores.release()
+        if self._map is not None:
+            self._map.close()
@@ -0,0 +1,270 @@
+import asyncio
+from contextlib import asynccontextmanager
+from itertools import count
+from psycopg import AsyncConnection
+from psycopg.types.string import TextLoader
+from psycopg_pool import AsyncConnectionPool
+from .async_table import AsyncTable
+from .instrumentation import instrument
+from .db import (
+    Database,
+    DESCRIBE_TABLE_SQL,
+    LIST_TABLES_SQL,
+    schema_cache,
+    table_columns,
+)
+
+
+async def configure(conn: AsyncConnection):
+    """Read uuid columns as str, matching psycopg2's defaults"""
+    conn.adapters.register_loader("uuid", TextLoader)
+
+
+class AsyncDatabase:
+    """
+    asyncio counterpart of `Database` on psycopg 3, for ASGI handlers.
+    Checks a connection out of an AsyncConnectionPool on `open` (or when
+    entering `async with`) and returns it on `close`.
+    Queries use the same `%s` placeholders, so Table statements are shared.
+    """
+
+    def __init__(self, pool: AsyncConnectionPool, schema: str):
+        self._pool = pool
+        self._schema = schema
+        self._conn = None
+        self._tables = {}
+
+    async def __aenter__(self) -> "AsyncDatabase":
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    @property
+    def is_open(self) -> bool:
+        return self._conn is not None and not self._conn.closed
+
+    @property
+    def in_transaction(self) -> bool:
+        return self.is_open and not self._conn.autocommit
+
+    async def open(self):
+        self._conn = await self._pool.getconn()
+        await self._conn.set_autocommit(True)
+
+    async def close(self):
+        """Return the connection to the pool"""
+        if self._conn is not None:
+            await self._pool.putconn(self._conn)
+            self._conn = None
+
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        Group every statement in the block into one transaction, as
+        `Database.transaction` does; nested blocks become savepoints.
+        """
+        if self.in_transaction:
+            async with self._conn.transaction():
+                yield self
+            return
+        await self._conn.set_autocommit(False)
+        try:
+            async with self._conn.transaction():
+                yield self
+        finally:
+            if not self._conn.closed:
+                await self._conn.set_autocommit(True)
+
+    async def table(self, name: str) -> AsyncTable | None:
+        """A table of the schema, introspected on first use, or None"""
+        if name not in self._tables:
+            columns = await self.describe_table(name)
+            if columns is None:
+                return None
+            self._tables[name] = AsyncTable(name, columns, self)
+        return self._tables[name]
+
+    async def describe_table(self, name: str) -> list | None:
+        """Columns of a single table, or None if it does not exist"""
+        # The cache drains its listener over a blocking connection, so it runs off the loop
+        columns, token = await asyncio.to_thread(schema_cache.get_columns, self._schema, name)
+        if columns is not None:
+            return columns
+        rows = await self.select(DESCRIBE_TABLE_SQL, (self._schema, name))
+        if not rows:
+            return None
+        columns = table_columns(self._schema, rows)
+        await asyncio.to_thread(schema_cache.put_columns, self._schema, token, name, columns)
+        return columns
+
+    async def list_tables(self) -> list:
+        """Names of every table in the schema"""
+        names, token = await asyncio.to_thread(schema_cache.get_names, self._schema)
+        if names is not None:
+            return names
+        names = [row[0] for row in await self.select(LIST_TABLES_SQL, (self._schema,))]
+        await asyncio.to_thread(schema_cache.put_names, self._schema, token, names)
+        return names
+
+    def cursor(self, loaders: tuple = (), name: str | None = None):
+        """
+        Open a cursor whose results are read by the psycopg loaders in
+        `loaders`, as (type name, Loader) pairs. A `name` makes it server-side.
+        """
+        cursor = self._conn.cursor(name=name) if name else self._conn.cursor()
+        for type_name, loader in loaders:
+            cursor.adapters.register_loader(type_name, loader)
+        return cursor
+
+    async def select(
+        self,
+        query: str,
+        args=None,
+        number: int | None = None,
+        prepared: bool = False,
+        loaders: tuple = (),
+    ):
+        """
+        Retrieve results of query from database, as `Database.select` does.
+        `prepared` has psycopg prepare the query on this connection.
+        """
+        async with self.cursor(loaders) as cursor:
+            with instrument(query, args, self._conn) as event:
+                await cursor.execute(query, args or None, prepare=prepared or None)
+                event.rows = cursor.rowcount
+            if number is None:
+                return await cursor.fetchall()
+            if number == 1:
+                return await cursor.fetchone()
+            if number > 1:
+                return await cursor.fetchmany(number)
+            raise ValueError(f"{number} is not a positive integer.")
+
+    async def stream(self, query: str, args=None, itersize: int = 2000, loaders: tuple = ()):
+        """
+        Yield the results of a query one row at a time from a named
+        server-side cursor, fetching `itersize` rows per round trip.
+        A transaction stays open until the stream is exhausted or closed.
+        """
+        async with self.transaction():
+            cursor = self.cursor(loaders, f"mupp_stream_{next(cursor_names)}")
+            cursor.itersize = itersize
+            try:
+                with instrument(query, args, self._conn) as event:
+                    await cursor.execute(query, args or None)
+                    event.rows = 0
+                    async for row in cursor:
+                        event.rows += 1
+                        yield row
+            finally:
+                if self.is_open:
+                    await cursor.close()
+
+    async def exec_commit(self, query: str, args=None, loaders: tuple = ()):
+        """
+        Execute a query and return its result, as `Database.exec_commit` does.
+        Autocommits, or joins the current transaction block.
+        """
+        async with self.cursor(loaders) as cursor:
+            with instrument(query, args, self._conn) as event:
+                await cursor.execute(query, args or None)
+                event.rows = cursor.rowcount
+            if cursor.description is None:
+                return None
+            result = await cursor.fetchall()
+        return result if len(result) != 1 else result[0]
+
+    async def exec_many(
+        self,
+        query: str,
+        rows,
+        template: str | None = None,
+        page_size: int = 100,
+        fetch: bool = False,
+        loaders: tuple = (),
+    ):
+        """
+        Execute a query with a single `VALUES %s` placeholder for an iterable
+        of row tuples, `page_size` rows per statement, in one transaction.
+        Each row is spelled out as `template`, by default plain placeholders.
+        Returns the rows of every page when `fetch` is set.
+        """
+        result = []
+        async with self.transaction(), self.cursor(loaders) as cursor:
+            page = []
+            for row in rows:
+                page.append(row)
+                if len(page) == page_size:
+                    result.extend(await self._exec_page(cursor, query, page, template, fetch))
+                    page = []
+            if page:
+                result.extend(await self._exec_page(cursor, query, page, template, fetch))
+        return result if fetch else None
+
+    async def _exec_page(self, cursor, query: str, page: list, template: str | None, fetch: bool) -> list:
+        row = template or "({})".format(", ".join(["%s"] * len(page[0])))
+        sql = query.replace("VALUES %s", "VALUES " + ", ".join([row] * len(page)), 1)
+        with instrument(query, None, self._conn) as event:
+            await cursor.execute(sql, [value for values in page for value in values])
+            event.rows = cursor.rowcount
+        return await cursor.fetchall() if fetch else []
+
+    async def copy_out(self, query: str, args=None):
+        """Yield the output of a `COPY ... TO STDOUT` query as byte chunks"""
+        async with self._conn.cursor() as cursor:
+            with instrument(query, args, self._conn) as event:
+                async with cursor.copy(query, args or None) as copy:
+                    async for chunk in copy:
+                        yield bytes(chunk)
+                event.rows = cursor.rowcount
+
+
+# Names of server-side cursors opened by `AsyncDatabase.stream`
+cursor_names = count()
+
+# Keyed by event loop as well as schema, since a pool only works on the loop that opened it
+_pools: dict[tuple[int, str], AsyncConnectionPool] = {}
+
+
+async def get_async_pool(schema: str) -> AsyncConnectionPool:
+    """
+    Pool for a schema on the running event loop, opened on first use with
+    the `pool_min_size`/`pool_max_size` settings from db.yml. Close them
+    with `close_async_pools` before the loop ends.
+    """
+    key = (id(asyncio.get_running_loop()), schema)
+    if key not in _pools:
+        config = Database.load_config()
+        pool = AsyncConnectionPool(
+            kwargs={
+                "dbname": config["database"],
+                "user": config["user"],
+                "password": config["password"],
+                "host": config["host"],
+                "port": config["port"],
+                "options": f"-c search_path={schema}",
+            },
+            min_size=config.get("pool_min_size", 1),
+            max_size=config.get("pool_max_size", 10),
+            configure=configure,
+            open=False,
+        )
+        await pool.open()
+        async with pool.connection() as conn:
+            await conn.execute(f"CREATE SCHEMA IF NOT EXISTS {schema};")
+        # Another task may have opened one while this one connected
+        if key in _pools:
+            await pool.close()
+        else:
+            _pools[key] = pool
+    return _pools[key]
+
+
+async def close_async_pools():
+    """Close every async pool of the running event loop"""
+    loop = id(asyncio.get_running_loop())
+    pools = [_pools.pop(key) for key in list(_pools) if key[0] == loop]
+    for pool in pools:
+        await pool.close()
@@ -0,0 +1,194 @@
+from itertools import chain
+from psycopg.adapt import Loader
+from .table import Table, cast_json_date, cast_json_timestamp
+
+
+class JsonTimestampLoader(Loader):
+    def load(self, data):
+        return cast_json_timestamp(bytes(data).decode(), None)
+
+
+class JsonDateLoader(Loader):
+    def load(self, data):
+        return cast_json_date(bytes(data).decode(), None)
+
+
+# Result loaders that leave rows JSON-ready, as `JSON_CASTS` does for psycopg2
+JSON_LOADERS = (
+    ("timestamp", JsonTimestampLoader),
+    ("timestamptz", JsonTimestampLoader),
+    ("date", JsonDateLoader),
+)
+
+
+class AsyncTable(Table):
+    """
+    `Table` for an AsyncDatabase: the same statements and results,
+    with every query method a coroutine (or async generator for streams).
+    """
+
+    async def select(
+        self,
+        fields: list = [],
+        where: dict = {},
+        number: int | None = None,
+        prepare: bool = False,
+        stream: bool = False,
+        itersize: int = 2000,
+        order_by=None,
+        after=None,
+        limit: int | None = None,
+        as_tuples: bool = False,
+        offset: int | None = None,
+    ):
+        """
+        Select entities as `Table.select` does. With `stream`, returns an
+        async iterator over entities fetched `itersize` at a time.
+        """
+        statement, args = self._select_statement(
+            "select", fields, where, order_by, after, limit, offset=offset
+        )
+        decoder = statement.decoder
+        if stream:
+            rows = self._database.stream(statement.sql, args, itersize, JSON_LOADERS)
+            return rows if as_tuples else self._decode_stream(decoder, rows)
+        res = await self._database.select(
+            statement.sql, args, number, prepare, JSON_LOADERS
+        )
+        if res is None:
+            return None
+        if type(res) is tuple:
+            return res if as_tuples else decoder.obj(res)
+        return decoder.objs(res, as_tuples)
+
+    async def _decode_stream(self, decoder, rows):
+        fields = decoder.fields
+        try:
+            async for row in rows:
+                yield dict(zip(fields, row))
+        finally:
+            await rows.aclose()
+
+    async def select_json(
+        self,
+        fields: list = [],
+        where: dict = {},
+        order_by=None,
+        after=None,
+        limit: int | None = None,
+        casts: dict = {},
+        offset: int | None = None,
+    ) -> tuple[str, int, str | None]:
+        """Select entities as a JSON array rendered by Postgres, as `Table.select_json` does"""
+        statement, args = self._select_statement(
+            "json_agg", fields, where, order_by, after, limit, casts, offset
+        )
+        return await self._database.select(statement.sql, args, 1)
+
+    async def select_json_obj(self, fields: list = [], where: dict = {}, casts: dict = {}) -> str | None:
+        """Select the first matching entity as a JSON object rendered by Postgres, or None"""
+        statement, args = self._select_statement(
+            "row_to_json", fields, where, None, None, None, casts
+        )
+        res = await self._database.select(statement.sql, args, 1)
+        return None if res is None else res[0]
+
+    async def stream_json(
+        self,
+        fields: list = [],
+        where: dict = {},
+        order_by=None,
+        after=None,
+        casts: dict = {},
+        itersize: int = 2000,
+    ):
+        """Yield a JSON array of every matching entity as byte chunks, as `Table.stream_json` does"""
+        statement, args = self._select_statement(
+            "row_to_json", fields, where, order_by, after, None, casts
+        )
+        rows = self._database.stream(statement.sql, args, itersize)
+        try:
+            yield b"["
+            separator = ""
+            batch = []
+            async for (obj,) in rows:
+                batch.append(obj)
+                if len(batch) == itersize:
+                    yield (separator + ",".join(batch)).encode()
+                    separator = ","
+                    batch = []
+            if batch:
+                yield (separator + ",".join(batch)).encode()
+            yield b"]"
+        finally:
+            await rows.aclose()
+
+    def export_csv(self, labels: dict = {}, where: dict = {}):
+        """Yield entities as CSV byte chunks straight out of a COPY, as `Table.export_csv` does"""
+        sql, args = self._export_statement(labels, where)
+        return self._database.copy_out(sql, args)
+
+    async def insert(self, fields: dict = {}, returning: list = []):
+        """Insert an object, as `Table.insert` does"""
+        statement = self.statement("insert", fields, returning=returning)
+
+        if not statement.set_keys:
+            raise ValueError(
+                f"No valid fields provided for insertion into table '{self._name}'. Got: {list(fields.keys())}"
+            )
+
+        res = await self._database.exec_commit(
+            statement.sql, statement.values(fields), JSON_LOADERS
+        )
+        if res is None:
+            return None
+        return statement.decoder.obj(res)
+
+    async def update(self, fields: dict = {}, where: dict = {}, returning: list = []):
+        """Update table field value(s) according to WHERE mapping, as `Table.update` does"""
+        statement = self.statement("update", fields, where, returning)
+        res = await self._database.exec_commit(
+            statement.sql, statement.values(fields, where), JSON_LOADERS
+        )
+        if res is None:
+            return None
+        if type(res) is tuple:
+            return statement.decoder.obj(res)
+        return statement.decoder.objs(res)
+
+    async def delete(self, where: dict = {}, returning: list = []):
+        """Delete table row(s) according to WHERE mapping, as `Table.delete` does"""
+        statement = self.statement("delete", where=where, returning=returning)
+        res = await self._database.exec_commit(
+            statement.sql, statement.values(where=where), JSON_LOADERS
+        )
+        if res is None:
+            return None
+        if type(res) is tuple:
+            return statement.decoder.obj(res)
+        return statement.decoder.objs(res)
+
+    async def _write_many(
+        self,
+        operation: str,
+        rows,
+        keys: list = [],
+        returning: list = [],
+        chunk_size: int = 500,
+    ):
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            return [] if returning else None
+        statement, template = self._bulk_statement(operation, first, keys, returning)
+        res = await self._database.exec_many(
+            statement.sql,
+            (statement.values(row, row) for row in chain([first], rows)),
+            template,
+            chunk_size,
+            fetch=bool(statement.fields),
+            loaders=JSON_LOADERS,
+        )
+        if res is None:
+            return None
+        return statement.decoder.objs(res)
@@ -1,19 +1,39 @@
 import psycopg2
-from psycopg2.errors import ConnectionException
+from psycopg2.errors import ConnectionException, UndefinedColumn, UndefinedTable
+from psycopg2.extras import execute_values
+from psycopg2.extensions import register_type
 import yaml
 import os.path as path
+from os import listdir
+from collections.abc import Mapping
+from contextlib import contextmanager
+from queue import Queue, Full
+from threading import Event, Thread
+from weakref import WeakKeyDictionary
+from itertools import count
+import re
 from .table import Table
+from .schema_cache import SchemaCache, notify_schema_changed
+from .replicas import get_replica_set
+from .instrumentation import instrument, add_query_hook, SlowQueryLog
+from .explain import PlanCapture
 
 
 class Database:
     @staticmethod
-    def connect():
-        """Connect to the database with data from ~/config/db.yml"""
+    def load_config() -> dict:
+        """Read connection settings from ~/config/db.yml"""
         # credit swen610_db_utils
         config = {}
         yml_path = path.join(path.dirname(__file__), "../../../config/db.yml")
         with open(yml_path, "r") as file:
             config = yaml.load(file, Loader=yaml.FullLoader)
+        return config
+
+    @staticmethod
+    def connect():
+        """Connect to the database with data from ~/config/db.yml"""
+        config = Database.load_config()
         return psycopg2.connect(
             dbname=config["database"],
             user=config["user"],
@@ -22,33 +42,108 @@ class Database:
             port=config["port"],
         )
 
-    def __init__(self, schema_name: str):
+    def __init__(self, schema_name: str, pool=None, replicas=None):
+        """
+        Open a dedicated connection, or check one out of `pool`
+        (a ConnectionPool for the same schema) until `close`.
+        Reads go to `replicas` (a ReplicaSet), or the ones in db.yml, when
+        one is within the allowed lag; until then, and from the first
+        write on, they stay on the primary.
+        """
         self._conn = None
         self._schema = None
         self._tables = None
+        self._pool = pool
+        self._replicas = replicas
+        # (index, pool, connection) of the checked out replica, or False if none was fit
+        self._replica = None
+        self._wrote = False
+        self._depth = 0
+        self._ddl_pending = False
         self.open(schema_name)
 
+    @property
+    def is_open(self) -> bool:
+        return self._conn is not None and self._conn.closed == 0
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._depth > 0
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group every statement in the block into one transaction, committed
+        when the block exits and rolled back if it raises.
+        Nested blocks become savepoints, so only their own work is undone.
+        Outside of blocks the connection autocommits, so reads need no
+        BEGIN or ROLLBACK and each write commits on its own.
+        """
+        self._depth += 1
+        savepoint = f"mupp_savepoint_{self._depth}"
+        if self._depth > 1:
+            with self._conn.cursor() as c:
+                self.execute(c, f"SAVEPOINT {savepoint};")
+        else:
+            self._conn.autocommit = False
+        try:
+            yield self
+        except BaseException:
+            self._depth -= 1
+            if self._depth > 0:
+                with self._conn.cursor() as c:
+                    self.execute(c, f"ROLLBACK TO SAVEPOINT {savepoint};")
+            elif self.is_open:
+                self._conn.rollback()
+                self._end_transaction()
+            raise
+        self._depth -= 1
+        if self._depth > 0:
+            with self._conn.cursor() as c:
+                self.execute(c, f"RELEASE SAVEPOINT {savepoint};")
+        else:
+            try:
+                self._conn.commit()
+            finally:
+                self._end_transaction()
+
+    def _end_transaction(self):
+        self._conn.autocommit = True
+        # Metadata read while DDL was uncommitted may have been cached
+        if self._ddl_pending:
+            self._ddl_pending = False
+            self.fetch_tables()
+
     def cleanup(self, drop_schema=False):
         """
         Close the database connection, drop
         the current schema if specified
         """
         if drop_schema and self._schema is not None:
-            if self._conn.closed != 0:
+            if not self.is_open:
                 self.open()
             with self._conn.cursor() as cursor:
-                cursor.execute("DROP SCHEMA IF EXISTS {} CASCADE;".format(self._schema))
-            self._conn.commit()
-        if self._conn and self._conn.closed == 0:
+                self.execute(cursor, "DROP SCHEMA IF EXISTS {} CASCADE;".format(self._schema))
+            self.invalidate_tables()
+        if self.is_open:
             self.close()
 
     def open(self, schema: str = None):
-        """Start a new psycopg2 connection if not running"""
-        if self._conn is None or self._conn.closed != 0:
+        """Start a new psycopg2 connection, or check one out, if not running"""
+        if self.is_open:
+            raise ConnectionException("Connection is already open")
+        if self._pool is None:
             self._conn = self.connect()
+            self._conn.autocommit = True
             self.set_schema(schema or self._schema)
         else:
-            raise ConnectionException("Connection is already open")
+            # Pooled connections already have the schema on their search_path
+            self._conn = self._pool.getconn()
+            self._conn.autocommit = True
+            self._schema = self._pool.schema
+            self.load_tables()
+        if self._replicas is None:
+            self._replicas = get_replica_set(self._schema)
 
     def set_schema(self, schema: str = None):
         """Set the Postgres `search_path` to a schema"""
@@ -57,57 +152,71 @@ class Database:
         if self._schema is None:
             return
         with self._conn.cursor() as c:
-            c.execute("CREATE SCHEMA IF NOT EXISTS %s;" % self._schema)
-            c.execute("SET search_path TO {};".format(self._schema))
+            self.execute(c, "CREATE SCHEMA IF NOT EXISTS %s;" % self._schema)
+            self.execute(c, "SET search_path TO {};".format(self._schema))
             # c.execute('SET search_path TO {},public;'
             #           .format(self._schema))
-        self._conn.commit()
-        self.fetch_tables()
+        self.load_tables()
+
+    def load_tables(self):
+        """Start a lazy table mapping; tables are introspected on first access"""
+        self._tables = TableMap(self)
+
+    def invalidate_tables(self):
+        """
+        Drop cached table metadata for this schema in this process and,
+        via NOTIFY (sent on commit), in every other worker.
+        """
+        self._wrote = True
+        schema_cache.invalidate(self._schema)
+        notify_schema_changed(self._conn, self._schema)
+        if self.in_transaction:
+            self._ddl_pending = True
+        self.load_tables()
 
     def fetch_tables(self):
-        """Retrieve tables and columns from database"""
-        with self._conn.cursor() as c:
-            c.execute(
-                """
-        SELECT
-          JSON_OBJECT_AGG(
-            c1.table_name, 
-            (SELECT 
-              ARRAY_AGG(JSON_BUILD_OBJECT(
-                'ordinal_position', ordinal_position,
-                'column_name', column_name, 
-                'type', data_type, 
-                'default', column_default, 
-                'nullable', is_nullable != 'NO',
-                'schema', table_schema
-              ))
-            FROM information_schema.columns
-            WHERE table_name = c1.table_name
-            AND table_schema = %s
-            )
-          )
-        FROM information_schema.columns c1
-        WHERE table_schema = %s;
-      """,
-                (self._schema, self._schema),
-            )
-            tables = c.fetchone()[0]
-            if tables is not None:
-                for name in tables:
-                    tables[name] = Table(name, tables[name], self)
-            self._tables = tables
-        self._conn.rollback()
+        """Forget table metadata so it is read again from the database"""
+        schema_cache.invalidate(self._schema)
+        self.load_tables()
+
+    def describe_table(self, name: str) -> list | None:
+        """Columns of a single table, or None if it does not exist"""
+        columns, token = schema_cache.get_columns(self._schema, name)
+        if columns is not None:
+            return columns
+        rows = self.select(DESCRIBE_TABLE_SQL, (self._schema, name), primary=True)
+        if not rows:
+            return None
+        columns = table_columns(self._schema, rows)
+        schema_cache.put_columns(self._schema, token, name, columns)
+        return columns
+
+    def list_tables(self) -> list:
+        """Names of every table in the schema"""
+        names, token = schema_cache.get_names(self._schema)
+        if names is not None:
+            return names
+        rows = self.select(LIST_TABLES_SQL, (self._schema,), primary=True)
+        names = [row[0] for row in rows]
+        schema_cache.put_names(self._schema, token, names)
+        return names
 
     @property
-    def tables(self) -> dict[str, Table] | None:
+    def tables(self) -> "TableMap":
         return self._tables
 
     def close(self):
-        """Close existing psycopg2 connection"""
-        if self._conn.closed == 0:
+        """Close existing psycopg2 connection, or return it to the pool"""
+        if not self.is_open:
+            raise ConnectionException("Connection is already closed")
+        self._release_replica()
+        self._replica = None
+        self._wrote = False
+        if self._pool is None:
             self._conn.close()
         else:
-            raise ConnectionException("Connection is already closed")
+            self._pool.putconn(self._conn)
+            self._conn = None
 
     def exec_sql_file(self, file: str):
         """Read a SQL file into the database"""
@@ -115,25 +224,144 @@ class Database:
         abs_path = path.join(path.dirname(__file__), f"../../../{file}")
         # TODO: should closed connects raise exception
         # or just work automatically?
-        if self._conn.closed != 0:
+        if not self.is_open:
             self.open()
         with self._conn.cursor() as cursor:
             with open(abs_path, "r") as file:
-                cursor.execute(file.read())
-        self._conn.commit()
+                self.execute(cursor, file.read())
+        self.invalidate_tables()
 
-    def select(self, query: str, args=None, number: int | None = None):
+    def migrate(self, directory: str = "config/migrations") -> list:
         """
-        Retrieve results of query from database.
-        Supports both dict or tuple/list arguments.
-        Does *not* commit.
+        Apply the SQL files in `directory` (relative to the root dir) that
+        are not yet recorded in `schema_migrations`, in file name order,
+        each in its own transaction. An advisory lock keeps concurrent
+        deploys from applying the same migration twice.
+        Returns the versions (file names without `.sql`) applied.
         """
-        result = None
-        with self._conn.cursor() as cursor:
+        abs_path = path.join(path.dirname(__file__), "../../..", directory)
+        versions = sorted(name[:-4] for name in listdir(abs_path) if name.endswith(".sql"))
+        lock = f"mupp_migrations.{self._schema}"
+        applied = []
+        self.exec_commit("SELECT pg_advisory_lock(hashtext(%s));", (lock,))
+        try:
+            self.exec_commit(
+                """
+            CREATE TABLE IF NOT EXISTS schema_migrations(
+              version VARCHAR PRIMARY KEY,
+              applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+            );
+            """
+            )
+            done = {row[0] for row in self.select("SELECT version FROM schema_migrations;", primary=True)}
+            for version in versions:
+                if version in done:
+                    continue
+                with open(path.join(abs_path, f"{version}.sql"), "r") as file:
+                    sql = file.read()
+                with self.transaction(), self._conn.cursor() as cursor:
+                    self.execute(cursor, sql)
+                    self.execute(
+                        cursor, "INSERT INTO schema_migrations (version) VALUES (%s);", (version,)
+                    )
+                    self.invalidate_tables()
+                applied.append(version)
+        finally:
+            if self.is_open:
+                self.exec_commit("SELECT pg_advisory_unlock(hashtext(%s));", (lock,))
+        return applied
+
+    def _read_conn(self, primary: bool = False):
+        """
+        Connection to read from: a replica within the allowed lag, unless
+        `primary` is asked for, a transaction is open, or this Database has
+        written (so it reads its own writes).
+        """
+        if primary or self._wrote or self.in_transaction or self._replicas is None:
+            return self._conn
+        if self._replica is None:
+            self._replica = self._replicas.getconn() or False
+        return self._replica[2] if self._replica else self._conn
+
+    def _release_replica(self, unhealthy: bool = False):
+        """Return the replica connection, reading from the primary from now on"""
+        if self._replica:
+            if unhealthy:
+                self._replicas.mark_unhealthy(self._replica[0])
+            self._replicas.putconn(self._replica)
+        self._replica = False
+
+    def cursor(self, casts: tuple = (), name: str | None = None, conn=None):
+        """
+        Open a cursor whose results are converted by the psycopg2 typecasters
+        in `casts`, instead of the connection's defaults for those types.
+        A `name` makes it a server-side cursor. `conn` defaults to the primary.
+        """
+        cursor = (conn or self._conn).cursor(name=name)
+        for cast in casts:
+            register_type(cast, cursor)
+        return cursor
+
+    def execute(self, cursor, query: str, args=None, prepared: str | None = None):
+        """
+        Run a query on one of this connection's cursors.
+        With a `prepared` name, the query is PREPAREd once per connection
+        and run with EXECUTE afterwards; it then only supports tuple/list arguments.
+        Every call is timed and passed to the query hooks.
+        """
+        with instrument(query, args, cursor.connection) as event:
+            self._run(cursor, query, args, prepared)
+            event.rows = cursor.rowcount
+
+    def _run(self, cursor, query: str, args=None, prepared: str | None = None):
+        if prepared is None:
             if args:
                 cursor.execute(query, args)
             else:
                 cursor.execute(query)
+            return
+
+        names = prepared_statements.setdefault(cursor.connection, set())
+        if prepared not in names:
+            cursor.execute(f"PREPARE {prepared} AS {to_positional(query)};")
+            names.add(prepared)
+        if args:
+            cursor.execute(
+                f"EXECUTE {prepared} ({', '.join(['%s'] * len(args))});", args
+            )
+        else:
+            cursor.execute(f"EXECUTE {prepared};")
+
+    def select(
+        self,
+        query: str,
+        args=None,
+        number: int | None = None,
+        prepared: str | None = None,
+        casts: tuple = (),
+        primary: bool = False,
+    ):
+        """
+        Retrieve results of query from database.
+        Supports both dict or tuple/list arguments.
+        `casts` are psycopg2 typecasters applied to this query's results.
+        Autocommits, or joins the current transaction block.
+        Runs on a replica when one is fit, unless `primary` is set, and
+        falls back to the primary if the replica fails or lags behind.
+        """
+        conn = self._read_conn(primary)
+        if conn is self._conn:
+            return self._fetch(conn, query, args, number, prepared, casts)
+        try:
+            return self._fetch(conn, query, args, number, prepared, casts)
+        except REPLICA_ERRORS as err:
+            self._release_replica(unhealthy=not isinstance(err, STALE_ERRORS))
+            return self._fetch(self._conn, query, args, number, prepared, casts)
+
+    def _fetch(self, conn, query: str, args, number: int | None, prepared: str | None, casts: tuple):
+        result = None
+        with self.cursor(casts, conn=conn) as cursor:
+            self.execute(cursor, query, args, prepared)
 
             if number is None:
                 result = cursor.fetchall()
@@ -143,26 +371,346 @@ class Database:
                 result = cursor.fetchmany(number)
             else:
                 raise ValueError(f"{number} is not a positive integer.")
-        self._conn.rollback()
         return result
 
-    def exec_commit(self, query: str, args=None):
+    def stream(
+        self,
+        query: str,
+        args=None,
+        itersize: int = 2000,
+        casts: tuple = (),
+        primary: bool = False,
+    ):
+        """
+        Yield the results of a query one row at a time from a named
+        server-side cursor, fetching `itersize` rows per round trip so
+        large results are never buffered whole.
+        Supports both dict or tuple/list arguments.
+        Server-side cursors need a transaction, so one stays open (or the
+        current block is joined) until the stream is exhausted or closed.
+        Outside of blocks that transaction is on a connection of its own.
+        Reads from a replica when `select` would.
+        """
+        conn = self._read_conn(primary)
+        if conn is not self._conn:
+            replica = self._replica
+            conn.autocommit = False
+            cursor = self.cursor(casts, f"mupp_stream_{next(cursor_names)}", conn)
+            cursor.itersize = itersize
+            with instrument(query, args, conn) as event:
+                try:
+                    self._run(cursor, query, args)
+                except REPLICA_ERRORS as err:
+                    event.error = err
+                else:
+                    try:
+                        yield from self._count_rows(event, cursor)
+                    finally:
+                        # Leave the replica alone if it went back to its pool meanwhile
+                        if self._replica is replica and conn.closed == 0:
+                            cursor.close()
+                            conn.rollback()
+                            conn.autocommit = True
+                    return
+            if conn.closed == 0:
+                conn.rollback()
+                conn.autocommit = True
+            self._release_replica(unhealthy=not isinstance(event.error, STALE_ERRORS))
+
+        # An open block is joined. Otherwise the cursor's transaction lives on a
+        # connection of its own, so an abandoned stream cannot hold this one's
+        # later writes in a transaction that never commits
+        own = not self.in_transaction
+        conn = self._stream_conn() if own else self._conn
+        cursor = self.cursor(casts, f"mupp_stream_{next(cursor_names)}", conn)
+        cursor.itersize = itersize
+        try:
+            with instrument(query, args, conn) as event:
+                self._run(cursor, query, args)
+                yield from self._count_rows(event, cursor)
+        finally:
+            if own:
+                self._release_stream_conn(conn)
+            # Abandoned streams may be collected after the connection closed
+            elif self.is_open:
+                cursor.close()
+
+    def _stream_conn(self):
+        """A primary connection, in a transaction, for a stream to read through"""
+        if self._pool is not None:
+            conn = self._pool.getconn()
+        else:
+            conn = self.connect()
+            conn.autocommit = True
+            if self._schema is not None:
+                with conn.cursor() as c:
+                    c.execute("SET search_path TO {};".format(self._schema))
+        conn.autocommit = False
+        return conn
+
+    def _release_stream_conn(self, conn):
+        if conn.closed == 0:
+            conn.rollback()
+            conn.autocommit = True
+        if self._pool is not None:
+            self._pool.putconn(conn)
+        else:
+            conn.close()
+
+    @staticmethod
+    def _count_rows(event, rows):
+        # Streamed statements are recorded once the stream ends, with every row fetched
+        event.rows = 0
+        for row in rows:
+            event.rows += 1
+            yield row
+
+    def exec_commit(self, query: str, args=None, casts: tuple = ()):
         """
         Execute a query, commit to the database, and return the result.
         Supports both dict or tuple/list arguments.
-        On exceptions, rollback transaction and raise error.
+        Failed statements are rolled back and raise their error.
+        Inside a `transaction` block, the block commits or rolls back instead.
         """
         result = None
-        with self._conn.cursor() as c:
+        self._wrote = True
+        with self.cursor(casts) as c:
             try:
-                if args:
-                    c.execute(query, args)
-                else:
-                    c.execute(query)
+                self.execute(c, query, args)
                 result = c.fetchall()
             except Exception as err:
                 if err.args[0] != "no results to fetch":
-                    self._conn.rollback()
                     raise err
-        self._conn.commit()
         return result if result is None or len(result) != 1 else result[0]
+
+    def exec_values(
+        self,
+        query: str,
+        rows,
+        template: str | None = None,
+        page_size: int = 100,
+        fetch: bool = False,
+        casts: tuple = (),
+    ):
+        """
+        Execute a query with a single `VALUES %s` placeholder for an iterable
+        of row tuples, sending `page_size` rows per statement, and commit once.
+        Returns the rows of every page when `fetch` is set.
+        On exceptions, rollback transaction and raise error.
+        """
+        self._wrote = True
+        with self.transaction(), self.cursor(casts) as c:
+            with instrument(query, None, c.connection) as event:
+                result = execute_values(
+                    c, query, self._count_rows(event, rows), template, page_size, fetch
+                )
+        return result if fetch else None
+
+    def copy_out(self, query: str, args=None, chunk_size: int = 65536, queue_size: int = 8):
+        """
+        Stream the output of a `COPY ... TO STDOUT` query as byte chunks.
+        The COPY runs on a helper thread that blocks once `queue_size` chunks
+        are waiting, so memory stays bounded by the consumer's pace.
+        Closing the generator early cancels the COPY.
+        Reads from a replica when `select` would, and falls back to the
+        primary if the replica fails or lags behind before the first chunk.
+        The statement is recorded, with the rows copied, once the stream ends.
+        """
+        conn = self._read_conn()
+        if conn is not self._conn:
+            sent = False
+            try:
+                for chunk in self._copy(conn, query, args, chunk_size, queue_size):
+                    sent = True
+                    yield chunk
+                return
+            except REPLICA_ERRORS as err:
+                # Chunks already sent cannot be taken back
+                if sent:
+                    raise
+                self._release_replica(unhealthy=not isinstance(err, STALE_ERRORS))
+        yield from self._copy(self._conn, query, args, chunk_size, queue_size)
+
+    def _copy(self, conn, query: str, args, chunk_size: int, queue_size: int):
+        chunks = Queue(queue_size)
+        stop = Event()
+        failure = []
+        copied = []
+
+        def run():
+            writer = _CopyWriter(chunks, stop, chunk_size)
+            try:
+                with conn.cursor() as cursor:
+                    sql = cursor.mogrify(query, args) if args else query
+                    cursor.copy_expert(sql, writer)
+                    copied.append(cursor.rowcount)
+                writer.flush()
+            except Exception as err:
+                failure.append(err)
+            finally:
+                writer.finish()
+
+        worker = Thread(target=run, daemon=True)
+        worker.start()
+        # Timed here rather than in the worker, whose context has no request counters
+        with instrument(query, args, conn) as event:
+            try:
+                while True:
+                    chunk = chunks.get()
+                    if chunk is None:
+                        break
+                    yield chunk
+            finally:
+                stop.set()
+                worker.join()
+                if copied:
+                    event.rows = copied[0]
+            if failure:
+                raise failure[0]
+
+
+DESCRIBE_TABLE_SQL = """
+  SELECT
+    ROW_NUMBER() OVER (ORDER BY a.attnum),
+    a.attname,
+    FORMAT_TYPE(a.atttypid, NULL),
+    PG_GET_EXPR(d.adbin, d.adrelid),
+    NOT a.attnotnull
+  FROM pg_catalog.pg_attribute a
+  JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+  JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+  LEFT JOIN pg_catalog.pg_attrdef d
+    ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+  WHERE n.nspname = %s
+  AND c.relname = %s
+  AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+  AND a.attnum > 0
+  AND NOT a.attisdropped
+  ORDER BY a.attnum;
+"""
+
+LIST_TABLES_SQL = """
+  SELECT c.relname
+  FROM pg_catalog.pg_class c
+  JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+  WHERE n.nspname = %s
+  AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+  ORDER BY c.relname;
+"""
+
+
+def table_columns(schema: str, rows: list) -> list:
+    """Column descriptions, as Table expects them, from DESCRIBE_TABLE_SQL rows"""
+    return [
+        {
+            "ordinal_position": position,
+            "column_name": column_name,
+            "type": data_type,
+            "default": default,
+            "nullable": nullable,
+            "schema": schema,
+        }
+        for position, column_name, data_type, default, nullable in rows
+    ]
+
+
+def to_positional(query: str) -> str:
+    """Swap psycopg2 `%s` placeholders for the `$n` parameters PREPARE expects"""
+    count = iter(range(1, query.count("%s") + 1))
+    return re.sub(r"%s", lambda _: f"${next(count)}", query).strip().rstrip(";")
+
+
+schema_cache = SchemaCache(Database.connect)
+# Failures on a replica that the primary may not share
+REPLICA_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError, UndefinedTable, UndefinedColumn)
+# Replicas that have yet to replay DDL are behind, rather than broken
+STALE_ERRORS = (UndefinedTable, UndefinedColumn)
+# Names PREPAREd on each live connection, shared by every Database using it
+prepared_statements = WeakKeyDictionary()
+# Names of server-side cursors opened by `Database.stream`
+cursor_names = count()
+# Warn about statements slower than `slow_query_ms` in db.yml
+add_query_hook(SlowQueryLog(Database.load_config))
+# Plans of slow or sampled statements, when `explain_ms` or `explain_sample` is set in db.yml
+plan_capture = PlanCapture(Database.load_config)
+add_query_hook(plan_capture)
+
+
+class TableMap(Mapping):
+    """
+    Read-only `{name: Table}` view of a schema.
+    Each table is introspected on first access and memoized.
+    """
+
+    def __init__(self, database: Database):
+        self._database = database
+        self._tables = {}
+
+    def get(self, name: str, default=None):
+        if name not in self._tables:
+            columns = self._database.describe_table(name)
+            if columns is None:
+                return default
+            self._tables[name] = Table(name, columns, self._database)
+        return self._tables[name]
+
+    def __getitem__(self, name: str) -> Table:
+        table = self.get(name)
+        if table is None:
+            raise KeyError(name)
+        return table
+
+    def __contains__(self, name) -> bool:
+        return self.get(name) is not None
+
+    def __iter__(self):
+        return iter(self._database.list_tables())
+
+    def __len__(self) -> int:
+        return len(self._database.list_tables())
+
+
+class _CopyAborted(Exception):
+    pass
+
+
+class _CopyWriter:
+    """File-like target for `copy_expert` that batches rows into a bounded queue"""
+
+    def __init__(self, chunks: Queue, stop: Event, chunk_size: int):
+        self._chunks = chunks
+        self._stop = stop
+        self._chunk_size = chunk_size
+        self._buffer = []
+        self._buffered = 0
+
+    def write(self, data):
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self._chunk_size:
+            self.flush()
+        return len(data)
+
+    def flush(self):
+        if self._buffer:
+            self._put(b"".join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+
+    def finish(self):
+        """Signal the end of the stream, unless the reader already left"""
+        try:
+            self._put(None)
+        except _CopyAborted:
+            pass
+
+    def _put(self, item):
+        # Poll so an abandoned stream cannot block the COPY forever
+        while True:
+            if self._stop.is_set():
+                raise _CopyAborted()
+            try:
+                self._chunks.put(item, timeout=0.1)
+                return
+            except Full:
+                continue
@@ -0,0 +1,202 @@
+from collections import OrderedDict
+from datetime import datetime, timezone
+from threading import Lock
+import random
+import re
+import psycopg2.extensions
+from .instrumentation import QueryEvent, logger
+
+# Statements EXPLAIN accepts
+EXPLAINABLE = re.compile(r"^\s*(SELECT|WITH|VALUES|TABLE|INSERT|UPDATE|DELETE)\b", re.IGNORECASE)
+# Only these run again under ANALYZE; writes and side effects get a plain EXPLAIN
+READ_ONLY = re.compile(r"^\s*(SELECT|VALUES|TABLE)\b", re.IGNORECASE)
+SIDE_EFFECTS = re.compile(
+    r"\b(nextval|setval|set_config|pg_notify|pg_advisory\w*|pg_cancel_backend|pg_terminate_backend)\s*\("
+    r"|\bFOR\s+(UPDATE|SHARE|NO\s+KEY\s+UPDATE|KEY\s+SHARE)\b",
+    re.IGNORECASE,
+)
+
+_QUOTED = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_LITERALS = [
+    (_QUOTED, "?"),
+    (re.compile(r"%\(\w+\)s|%s|\$\d+"), "?"),
+    (_NUMBER, "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)"), "(...)"),
+    (re.compile(r"\s+"), " "),
+]
+
+# Plan lines that print the statement's values
+_CONDITIONS = re.compile(
+    r"^\s*(Index Cond|Recheck Cond|Hash Cond|Merge Cond|TID Cond|Join Filter|One-Time Filter"
+    r"|Filter|Order By|Sort Key|Group Key|Cache Key):"
+)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Shape of a statement, with literals and placeholders as `?` and lists
+    of them as `(...)`, so runs with different values group together.
+    """
+    for pattern, replacement in _LITERALS:
+        query = pattern.sub(replacement, query)
+    return query.strip().rstrip(";").strip()
+
+
+def scrub_plan(plan: str) -> str:
+    """
+    Plan text without the statement's values: quoted literals become `'?'`,
+    and numbers in conditions and keys `?`, keeping costs and timings.
+    """
+    lines = []
+    for line in plan.splitlines():
+        line = _QUOTED.sub("'?'", line)
+        if _CONDITIONS.match(line):
+            label, _, rest = line.partition(":")
+            line = f"{label}:{_NUMBER.sub('?', rest)}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+class PlanBuffer:
+    """
+    The `size` most recently seen query shapes, each with its
+    occurrences, time spent and latest captured plan. Thread safe.
+    """
+
+    def __init__(self, size: int = 100):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def add(self, shape: str, seconds: float) -> bool:
+        """Count an occurrence; True if the plan should be (re)captured"""
+        with self._lock:
+            entry = self._entries.get(shape)
+            if entry is None:
+                entry = self._entries[shape] = {
+                    "query": shape,
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "plan": None,
+                    "analyzed": False,
+                    "captured_at": None,
+                }
+                while len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+            self._entries.move_to_end(shape)
+            ms = seconds * 1000
+            slowest = entry["plan"] is None or ms > entry["max_ms"]
+            entry["count"] += 1
+            entry["total_ms"] += ms
+            entry["max_ms"] = max(entry["max_ms"], ms)
+            return slowest
+
+    def set_plan(self, shape: str, plan: str, analyzed: bool):
+        with self._lock:
+            entry = self._entries.get(shape)
+            if entry is not None:
+                entry["plan"] = plan
+                entry["analyzed"] = analyzed
+                entry["captured_at"] = datetime.now(timezone.utc).isoformat()
+
+    def top(self, number: int = 10) -> list:
+        """Shapes that took the most time in total, with their plans"""
+        with self._lock:
+            entries = [dict(entry) for entry in self._entries.values()]
+        entries.sort(key=lambda entry: entry["total_ms"], reverse=True)
+        return entries[:number]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class PlanCapture:
+    """
+    Opt-in hook keeping query plans for statements slower than
+    `explain_ms`, and for an `explain_sample` fraction of the rest,
+    in a buffer of `explain_buffer` (default 100) shapes.
+    Off unless one of them is set in the config `load_config` returns,
+    which is read once, on the first statement.
+
+    A plan is captured when a shape is first seen and whenever it runs
+    slower than before, on the connection the statement used and inside
+    a savepoint so an open transaction survives failures. Reads are
+    run again with `EXPLAIN (ANALYZE, BUFFERS)`; writes, and reads with
+    side effects, are only planned. Values are scrubbed from the plans kept,
+    as they are from query shapes.
+    """
+
+    def __init__(self, load_config):
+        self._load_config = load_config
+        self._loaded = False
+        self.threshold = None
+        self.sample = 0.0
+        self.plans = PlanBuffer()
+
+    @property
+    def enabled(self) -> bool:
+        self._configure()
+        return self.threshold is not None or self.sample > 0
+
+    def _configure(self):
+        if self._loaded:
+            return
+        config = self._load_config()
+        if config.get("explain_ms") is not None:
+            self.threshold = config["explain_ms"] / 1000
+        self.sample = config.get("explain_sample", 0.0)
+        self.plans.size = config.get("explain_buffer", self.plans.size)
+        self._loaded = True
+
+    def __call__(self, event: QueryEvent):
+        if not self.enabled or not self._wanted(event) or not self._explainable(event):
+            return
+        shape = normalize_query(event.query)
+        if self.plans.add(shape, event.seconds):
+            analyze = bool(READ_ONLY.match(event.query)) and not SIDE_EFFECTS.search(event.query)
+            plan = self._explain(event, analyze)
+            if plan is not None:
+                self.plans.set_plan(shape, plan, analyze)
+
+    def _wanted(self, event: QueryEvent) -> bool:
+        if self.threshold is not None and event.seconds >= self.threshold:
+            return True
+        return self.sample > 0 and random.random() < self.sample
+
+    @staticmethod
+    def _explainable(event: QueryEvent) -> bool:
+        if event.error is not None or not isinstance(event.conn, psycopg2.extensions.connection):
+            return False
+        if event.conn.closed or not EXPLAINABLE.match(event.query):
+            return False
+        # Multi-statement scripts, and queries psycopg2 expanded itself (VALUES %s pages)
+        if ";" in event.query.strip().rstrip(";"):
+            return False
+        return event.params is not None or "%s" not in event.query
+
+    def _explain(self, event: QueryEvent, analyze: bool) -> str | None:
+        options = "(ANALYZE, BUFFERS)" if analyze else ""
+        sql = f"EXPLAIN {options} {event.query.strip().rstrip(';')}"
+        conn = event.conn
+        savepoint = not conn.autocommit
+        # Run on a plain cursor, so the EXPLAIN is not itself instrumented
+        with conn.cursor() as cursor:
+            if savepoint:
+                cursor.execute("SAVEPOINT mupp_explain;")
+            try:
+                if event.params:
+                    cursor.execute(sql, event.params)
+                else:
+                    cursor.execute(sql)
+                plan = scrub_plan("\n".join(row[0] for row in cursor.fetchall()))
+            except psycopg2.Error:
+                logger.warning("Could not explain query: %s", normalize_query(event.query), exc_info=True)
+                if savepoint:
+                    cursor.execute("ROLLBACK TO SAVEPOINT mupp_explain;")
+                return None
+            if savepoint:
+                cursor.execute("RELEASE SAVEPOINT mupp_explain;")
+        return plan
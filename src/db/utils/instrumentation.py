@@ -0,0 +1,128 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+import logging
+import time
+
+logger = logging.getLogger("mupp.db")
+
+
+class QueryEvent:
+    """
+    One statement sent to Postgres: its SQL and parameters, the connection
+    it ran on, how long it took, how many rows it returned or changed
+    (-1 if unknown) and the error it raised, if any.
+    """
+
+    def __init__(self, query: str, params, conn):
+        self.query = query
+        self.params = params
+        self.conn = conn
+        self.seconds = 0.0
+        self.rows = -1
+        self.error = None
+
+
+class QueryStats:
+    """Running totals of the queries made in one request or task"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.errors = 0
+
+    def add(self, event: QueryEvent):
+        self.count += 1
+        self.seconds += event.seconds
+        self.rows += max(event.rows, 0)
+        self.errors += event.error is not None
+
+
+_hooks = []
+_stats: ContextVar[QueryStats | None] = ContextVar("mupp_query_stats", default=None)
+
+
+def add_query_hook(hook):
+    """Call `hook(event)` with a QueryEvent after every statement, e.g. for metrics or tracing"""
+    _hooks.append(hook)
+
+
+def remove_query_hook(hook):
+    _hooks.remove(hook)
+
+
+def track_queries() -> QueryStats:
+    """Start counting queries in the current context (a request, task or thread)"""
+    stats = QueryStats()
+    _stats.set(stats)
+    return stats
+
+
+def tracked_queries() -> QueryStats | None:
+    """Counters started by `track_queries` in the current context, if any"""
+    return _stats.get()
+
+
+@contextmanager
+def instrument(query: str, params, conn):
+    """
+    Time the statement run inside the block, which may set `rows` on the
+    yielded event, then count it and pass it to every hook.
+    """
+    event = QueryEvent(query, params, conn)
+    started = time.perf_counter()
+    try:
+        yield event
+    except Exception as err:
+        # Closing a stream early (GeneratorExit) is not a failed statement
+        event.error = err
+        raise
+    finally:
+        event.seconds = time.perf_counter() - started
+        record(event)
+
+
+def record(event: QueryEvent):
+    stats = _stats.get()
+    if stats is not None:
+        stats.add(event)
+    for hook in list(_hooks):
+        try:
+            hook(event)
+        except Exception:
+            # A broken subscriber must not fail the query it observed
+            logger.exception("Query hook %r failed", hook)
+
+
+def redact(params):
+    """Parameters with every value masked, keeping their shape for the log"""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: "?" for key in params}
+    return ["?"] * len(params)
+
+
+class SlowQueryLog:
+    """
+    Hook logging statements slower than `slow_query_ms` (default 200)
+    as a warning, with their parameters redacted.
+    `load_config` is read once, on the first statement.
+    """
+
+    def __init__(self, load_config):
+        self._load_config = load_config
+        self._threshold = None
+
+    def __call__(self, event: QueryEvent):
+        if self._threshold is None:
+            self._threshold = self._load_config().get("slow_query_ms", 200) / 1000
+        if event.seconds < self._threshold:
+            return
+        logger.warning(
+            "Slow query (%.1f ms, %d rows): %s params=%s",
+            event.seconds * 1000,
+            event.rows,
+            " ".join(event.query.split()),
+            redact(event.params),
+        )
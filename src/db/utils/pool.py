@@ -0,0 +1,130 @@
+from threading import BoundedSemaphore, Lock
+import time
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+
+
+class ConnectionPool:
+    """
+    Warm psycopg2 connections for a single schema.
+    Connections open with the schema on their `search_path`, are health
+    checked on checkout, and at most `max_size` are handed out at once.
+    Read-only servers cannot create the schema, so pass `create_schema=False`.
+    """
+
+    def __init__(
+        self,
+        schema: str,
+        config: dict,
+        min_size: int = 1,
+        max_size: int = 10,
+        ping_after: float = 30.0,
+        checkout_timeout: float = 10.0,
+        create_schema: bool = True,
+    ):
+        self._schema = schema
+        self._ping_after = ping_after
+        self._checkout_timeout = checkout_timeout
+        self._slots = BoundedSemaphore(max_size)
+        self._last_used = {}
+        self._pool = ThreadedConnectionPool(
+            min_size,
+            max_size,
+            dbname=config["database"],
+            user=config["user"],
+            password=config["password"],
+            host=config["host"],
+            port=config["port"],
+            options=f"-c search_path={schema}",
+        )
+        if create_schema:
+            self._create_schema()
+
+    @property
+    def schema(self) -> str:
+        return self._schema
+
+    def _create_schema(self):
+        conn = self._pool.getconn()
+        try:
+            with conn.cursor() as c:
+                c.execute("CREATE SCHEMA IF NOT EXISTS %s;" % self._schema)
+            conn.commit()
+        finally:
+            self._pool.putconn(conn)
+
+    def _healthy(self, conn) -> bool:
+        """Reject closed connections and ping ones that sat idle too long"""
+        if conn.closed != 0:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is None or time.monotonic() - last_used < self._ping_after:
+            return True
+        try:
+            with conn.cursor() as c:
+                c.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
+
+    def getconn(self):
+        """Check out a healthy connection, waiting for a free slot if the pool is full"""
+        if not self._slots.acquire(timeout=self._checkout_timeout):
+            raise PoolError(f"No connection available for schema '{self._schema}'")
+        try:
+            conn = self._pool.getconn()
+            while not self._healthy(conn):
+                self._discard(conn)
+                conn = self._pool.getconn()
+            return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn):
+        """Return a connection; broken ones are closed instead of reused"""
+        self._last_used[id(conn)] = time.monotonic()
+        try:
+            if conn.closed != 0:
+                self._discard(conn)
+            else:
+                self._pool.putconn(conn)
+        finally:
+            self._slots.release()
+
+    def _discard(self, conn):
+        self._last_used.pop(id(conn), None)
+        self._pool.putconn(conn, close=True)
+
+    def close(self):
+        self._pool.closeall()
+
+
+_pools: dict[str, ConnectionPool] = {}
+_pools_lock = Lock()
+
+
+def get_pool(schema: str) -> ConnectionPool:
+    """Process-wide pool for a schema, created on first use"""
+    # Imported here since the Database module imports the replicas, which use pools
+    from .db import Database
+
+    with _pools_lock:
+        if schema not in _pools:
+            config = Database.load_config()
+            _pools[schema] = ConnectionPool(
+                schema,
+                config,
+                min_size=config.get("pool_min_size", 1),
+                max_size=config.get("pool_max_size", 10),
+            )
+        return _pools[schema]
+
+
+def close_pools():
+    """Close every pooled connection in this process"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
@@ -0,0 +1,160 @@
+from threading import Lock
+import time
+import psycopg2
+from psycopg2.pool import PoolError
+from .pool import ConnectionPool
+
+LAG_QUERY = """
+  SELECT pg_is_in_recovery(),
+    CASE
+      WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+      ELSE COALESCE(EXTRACT(EPOCH FROM NOW() - pg_last_xact_replay_timestamp()), 0)
+    END;
+"""
+
+
+class ReplicaSet:
+    """
+    Read-only standbys of the primary for one schema.
+    Each replica's lag is measured at most every `check_every` seconds;
+    only standbys within `max_lag` seconds of the primary receive reads.
+    """
+
+    def __init__(
+        self,
+        schema: str,
+        configs: list,
+        max_lag: float = 5.0,
+        check_every: float = 5.0,
+        max_size: int = 10,
+    ):
+        self._schema = schema
+        self._configs = configs
+        self._max_lag = max_lag
+        self._check_every = check_every
+        self._max_size = max_size
+        self._lock = Lock()
+        self._pools = [None] * len(configs)
+        # (monotonic time of the last check, whether the replica may be read)
+        self._status = [(None, False)] * len(configs)
+        self._next = 0
+
+    def getconn(self):
+        """
+        Check out a connection to a replica within the allowed lag, trying
+        each in turn, as an (index, pool, connection) triple for `putconn`.
+        Returns None when no replica is fit to read from.
+        """
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self._configs)
+        for offset in range(len(self._configs)):
+            index = (start + offset) % len(self._configs)
+            if not self._maybe_fresh(index):
+                continue
+            try:
+                pool = self._pool(index)
+                conn = pool.getconn()
+                conn.autocommit = True
+            except (psycopg2.Error, PoolError):
+                self.mark_unhealthy(index)
+                continue
+            if self._fresh(index, conn):
+                return index, pool, conn
+            pool.putconn(conn)
+        return None
+
+    def putconn(self, replica: tuple):
+        _, pool, conn = replica
+        pool.putconn(conn)
+
+    def mark_unhealthy(self, index: int):
+        """Skip a replica until its next check, e.g. after a failed query"""
+        with self._lock:
+            self._status[index] = (time.monotonic(), False)
+
+    def _maybe_fresh(self, index: int) -> bool:
+        checked_at, healthy = self._status[index]
+        return healthy or checked_at is None or self._stale(checked_at)
+
+    def _stale(self, checked_at: float) -> bool:
+        return time.monotonic() - checked_at >= self._check_every
+
+    def _fresh(self, index: int, conn) -> bool:
+        checked_at, healthy = self._status[index]
+        if checked_at is not None and not self._stale(checked_at):
+            return healthy
+        try:
+            with conn.cursor() as c:
+                c.execute(LAG_QUERY)
+                in_recovery, lag = c.fetchone()
+            # A server out of recovery was promoted and no longer follows the primary
+            healthy = in_recovery and lag <= self._max_lag
+        except psycopg2.Error:
+            healthy = False
+        with self._lock:
+            self._status[index] = (time.monotonic(), healthy)
+        return healthy
+
+    def _pool(self, index: int) -> ConnectionPool:
+        with self._lock:
+            if self._pools[index] is None:
+                self._pools[index] = ConnectionPool(
+                    self._schema,
+                    self._configs[index],
+                    min_size=0,
+                    max_size=self._max_size,
+                    checkout_timeout=1.0,
+                    create_schema=False,
+                )
+            return self._pools[index]
+
+    def close(self):
+        with self._lock:
+            for pool in self._pools:
+                if pool is not None:
+                    pool.close()
+            self._pools = [None] * len(self._configs)
+
+
+_replica_sets: dict[str, ReplicaSet | None] = {}
+_replica_sets_lock = Lock()
+
+
+def get_replica_set(schema: str) -> ReplicaSet | None:
+    """
+    Process-wide replicas for a schema from the `replicas` list in db.yml,
+    or None if there are none. Each entry overrides settings of the
+    primary, e.g. `- host: replica1` or `- port: 5433`.
+    `max_replica_lag` (seconds, default 5) bounds how stale reads may be
+    and `replica_check_interval` (default 5) how often lag is measured.
+    """
+    # Imported here since Database itself reads from the replicas
+    from .db import Database
+
+    with _replica_sets_lock:
+        if schema not in _replica_sets:
+            config = Database.load_config()
+            entries = config.get("replicas") or []
+            primary = {key: value for key, value in config.items() if key != "replicas"}
+            _replica_sets[schema] = (
+                ReplicaSet(
+                    schema,
+                    [{**primary, **entry} for entry in entries],
+                    config.get("max_replica_lag", 5.0),
+                    config.get("replica_check_interval", 5.0),
+                    config.get("pool_max_size", 10),
+                )
+                if entries
+                else None
+            )
+        return _replica_sets[schema]
+
+
+def close_replica_sets():
+    """Close every replica connection in this process"""
+    with _replica_sets_lock:
+        for replicas in _replica_sets.values():
+            if replicas is not None:
+                replicas.close()
+        _replica_sets.clear()
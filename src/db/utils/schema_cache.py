@@ -0,0 +1,101 @@
+from threading import Lock
+import os
+import psycopg2
+
+CHANNEL = "mupp_schema_changed"
+
+
+class SchemaCache:
+    """
+    Process-wide table metadata: column lists per table and the
+    list of table names, keyed by schema.
+    A dedicated connection LISTENs on `CHANNEL`, so DDL announced by any
+    worker with `notify_schema_changed` evicts the schema here as well.
+    Without a working listener nothing is cached.
+    """
+
+    def __init__(self, connect):
+        self._connect = connect
+        self._lock = Lock()
+        self._columns = {}
+        self._names = {}
+        self._versions = {}
+        self._listener = None
+        self._pid = None
+
+    def get_columns(self, schema: str, table: str) -> tuple[list | None, int]:
+        """
+        Cached columns of a table (or None) and a version token.
+        Pass the token back to `put_columns` so metadata read while DDL
+        was in flight is not stored.
+        """
+        with self._lock:
+            self._drain()
+            return self._columns.get(schema, {}).get(table), self._versions.get(schema, 0)
+
+    def put_columns(self, schema: str, token: int, table: str, columns: list):
+        with self._lock:
+            if self._current(schema, token):
+                self._columns.setdefault(schema, {})[table] = columns
+
+    def get_names(self, schema: str) -> tuple[list | None, int]:
+        """Cached table names of a schema (or None) and a version token"""
+        with self._lock:
+            self._drain()
+            return self._names.get(schema), self._versions.get(schema, 0)
+
+    def put_names(self, schema: str, token: int, names: list):
+        with self._lock:
+            if self._current(schema, token):
+                self._names[schema] = names
+
+    def _current(self, schema: str, token: int) -> bool:
+        self._drain()
+        return self._listener is not None and self._versions.get(schema, 0) == token
+
+    def invalidate(self, schema: str):
+        with self._lock:
+            self._evict(schema)
+
+    def _evict(self, schema: str):
+        self._columns.pop(schema, None)
+        self._names.pop(schema, None)
+        self._versions[schema] = self._versions.get(schema, 0) + 1
+
+    def _drain(self):
+        """Apply pending notifications, (re)opening the listener as needed"""
+        if self._pid != os.getpid():
+            # Never reuse a listener inherited from a parent process
+            self._listener = None
+            self._pid = os.getpid()
+        if self._listener is None or self._listener.closed != 0:
+            self._reset()
+            return
+        try:
+            self._listener.poll()
+        except psycopg2.Error:
+            self._reset()
+            return
+        while self._listener.notifies:
+            self._evict(self._listener.notifies.pop(0).payload)
+
+    def _reset(self):
+        """Forget everything, since notifications may have been missed"""
+        for schema in set(self._columns) | set(self._names):
+            self._evict(schema)
+        try:
+            self._listener = self._connect()
+            self._listener.autocommit = True
+            with self._listener.cursor() as c:
+                c.execute(f"LISTEN {CHANNEL};")
+        except psycopg2.Error:
+            self._listener = None
+
+
+def notify_schema_changed(conn, schema: str):
+    """
+    Announce DDL on a schema to every process's SchemaCache.
+    Delivered when the caller's transaction commits.
+    """
+    with conn.cursor() as c:
+        c.execute("SELECT pg_notify(%s, %s);", (CHANNEL, schema))
@@ -1,4 +1,8 @@
 from datetime import date, datetime
+from functools import lru_cache
+from itertools import chain
+from hashlib import md5
+from psycopg2.extensions import new_type
 
 
 def json_prep(value):
@@ -9,6 +13,54 @@ def json_prep(value):
     return value
 
 
+def cast_json_timestamp(value: str | None, cursor):
+    """
+    Format a timestamp as `json_prep` would, straight from Postgres' text
+    output ("2024-01-31 09:30:00.123456+00") without building a datetime.
+    """
+    if value is None or len(value) < 19 or value[10] != " ":
+        return value  # NULL, infinity or BC dates
+    millis = "000"
+    if value[19:20] == ".":
+        end = 20
+        while end < 23 and value[end : end + 1].isdigit():
+            end += 1
+        millis = value[20:end].ljust(3, "0")
+    return f"{value[:10]}T{value[11:19]}.{millis}Z"
+
+
+def cast_json_date(value: str | None, cursor):
+    """Format a date as `json_prep` would, straight from Postgres' text output"""
+    if value is None or len(value) != 10:
+        return value
+    return value + "T00:00:00.000Z"
+
+
+# to_char formats rendering timestamps and dates as `json_prep` does
+JSON_TIME_FORMATS = {
+    "timestamp without time zone": 'YYYY-MM-DD"T"HH24:MI:SS.MS"Z"',
+    "timestamp with time zone": 'YYYY-MM-DD"T"HH24:MI:SS.MS"Z"',
+    "date": 'YYYY-MM-DD"T00:00:00.000Z"',
+}
+
+
+def json_column(col: str, col_type: str | None, cast: str | None = None) -> str:
+    """Select expression for a column whose value Postgres renders into JSON"""
+    if cast is not None:
+        return f"{col}::{cast} AS {col}"
+    if col_type in JSON_TIME_FORMATS:
+        return f"to_char({col}, '{JSON_TIME_FORMATS[col_type]}') AS {col}"
+    return col
+
+
+# Result typecasters that leave rows JSON-ready. uuid and json columns
+# already arrive as str and parsed objects with psycopg2's defaults.
+JSON_CASTS = (
+    new_type((1114, 1184), "JSON_TIMESTAMP", cast_json_timestamp),
+    new_type((1082,), "JSON_DATE", cast_json_date),
+)
+
+
 def generate_where_clause(filtered_where: list) -> str:
     """
     Return a Postgres WHERE clause,
@@ -18,6 +70,104 @@ def generate_where_clause(filtered_where: list) -> str:
     return "WHERE " + " AND ".join(filtered_where) if len(filtered_where) > 0 else ""
 
 
+class Predicate:
+    """
+    A WHERE mapping value for conditions other than equality,
+    e.g. `{"id": In([1, 2]), "email": ILike("%@rit.edu")}`.
+    `op` is part of the cached statement shape, `params` fill its placeholders.
+    """
+
+    op = "="
+
+    def __init__(self, value):
+        self.params = [value]
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(map(repr, self.params))})"
+
+
+class Ne(Predicate):
+    op = "<>"
+
+
+class Gt(Predicate):
+    op = ">"
+
+
+class Gte(Predicate):
+    op = ">="
+
+
+class Lt(Predicate):
+    op = "<"
+
+
+class Lte(Predicate):
+    op = "<="
+
+
+class ILike(Predicate):
+    op = "ilike"
+
+
+class In(Predicate):
+    """Matches any of `values`, sent as a single array parameter"""
+
+    op = "in"
+
+    def __init__(self, values):
+        self.params = [list(values)]
+
+
+class Between(Predicate):
+    """Matches values from `low` to `high`, inclusive"""
+
+    op = "between"
+
+    def __init__(self, low, high):
+        self.params = [low, high]
+
+
+class IsNull(Predicate):
+    def __init__(self, is_null: bool = True):
+        self.op = "is null" if is_null else "is not null"
+        self.params = []
+
+
+WHERE_TEMPLATES = {
+    "=": "{col}=%s",
+    "<>": "{col}<>%s",
+    ">": "{col}>%s",
+    ">=": "{col}>=%s",
+    "<": "{col}<%s",
+    "<=": "{col}<=%s",
+    "ilike": "{col} ILIKE %s",
+    "in": "{col} = ANY(%s)",
+    "between": "{col} BETWEEN %s AND %s",
+    "is null": "{col} IS NULL",
+    "is not null": "{col} IS NOT NULL",
+}
+
+
+def where_shape(where) -> tuple:
+    """(column, op) pairs describing a WHERE mapping, or names for equality"""
+    if not isinstance(where, dict):
+        return tuple(where)
+    return tuple(
+        (key, value.op) if isinstance(value, Predicate) else key
+        for key, value in where.items()
+    )
+
+
+def order_shape(order_by) -> tuple:
+    """Sort keys as a tuple; a leading '-' sorts that column descending"""
+    if order_by is None:
+        return ()
+    if isinstance(order_by, str):
+        return (order_by,)
+    return tuple(order_by)
+
+
 def generate_return_statement(filtered_returning: list) -> str:
     """
     Return a Postgres RETURNING statement,
@@ -31,6 +181,231 @@ def generate_return_statement(filtered_returning: list) -> str:
     )
 
 
+def quote_label(label: str) -> str:
+    """Quote arbitrary text for use as a column alias"""
+    return '"' + str(label).replace('"', '""') + '"'
+
+
+class RowDecoder:
+    """
+    Turns result rows of one projection into objects. Rows are read with
+    `JSON_CASTS`, so their values need no further conversion.
+    """
+
+    def __init__(self, fields: tuple):
+        self.fields = fields
+
+    def obj(self, row: tuple) -> dict:
+        return dict(zip(self.fields, row))
+
+    def objs(self, rows, as_tuples: bool = False) -> list:
+        if as_tuples:
+            return list(rows)
+        fields = self.fields
+        return [dict(zip(fields, row)) for row in rows]
+
+    def stream(self, rows):
+        """Decode a row generator lazily, closing it along with this one"""
+        fields = self.fields
+        try:
+            for row in rows:
+                yield dict(zip(fields, row))
+        finally:
+            rows.close()
+
+
+@lru_cache(maxsize=2048)
+def compile_decoder(fields: tuple) -> RowDecoder:
+    return RowDecoder(fields)
+
+
+class Statement:
+    """
+    SQL generated for one operation shape, with the columns whose values
+    fill its parameters and the columns of each returned row.
+    """
+
+    def __init__(
+        self,
+        sql: str,
+        set_keys: tuple,
+        where_keys: tuple,
+        fields: tuple,
+        where_clause: str = "",
+    ):
+        self.sql = sql
+        self.set_keys = set_keys
+        self.where_keys = where_keys
+        self.fields = fields
+        self.where_clause = where_clause
+        self.decoder = compile_decoder(fields)
+        # Stable across processes, so every connection agrees on the name
+        self.name = "mupp_" + md5(sql.encode()).hexdigest()[:16]
+
+    def values(self, fields: dict = {}, where: dict = {}) -> list:
+        values = [fields[key] for key in self.set_keys]
+        for key in self.where_keys:
+            value = where[key]
+            if isinstance(value, Predicate):
+                values.extend(value.params)
+            else:
+                values.append(value)
+        return values
+
+
+@lru_cache(maxsize=2048)
+def compile_statement(
+    name: str,
+    columns: tuple,
+    operation: str,
+    fields: tuple = (),
+    where: tuple = (),
+    returning: tuple = (),
+    order_by: tuple = (),
+    after: bool = False,
+    limit: bool = False,
+    column_types: tuple = (),
+    casts: tuple = (),
+    offset: bool = False,
+) -> Statement:
+    """
+    Build the SQL for an operation shape once per table layout.
+    Unknown column names are dropped, matching the column order of the table.
+    `where` holds column names compared for equality, or (column, op) pairs
+    for the operators in WHERE_TEMPLATES.
+    Selects may be sorted by `order_by` keys, start `after` the values of
+    the sort columns (keyset pagination, with every key sorted the same
+    way), and take a LIMIT and OFFSET; these follow the WHERE values as
+    parameters.
+    The "json_agg" and "row_to_json" selects have Postgres render the JSON
+    text, formatting columns by `column_types` (aligned with `columns`) and
+    converting the (column, type) pairs in `casts`.
+    """
+    where_ops = dict(key if isinstance(key, tuple) else (key, "=") for key in where)
+    filtered_fields = tuple(col for col in columns if col in fields)
+    filtered_where = tuple(col for col in columns if col in where_ops)
+    filtered_returning = tuple(col for col in columns if col in returning)
+    conditions = []
+    for col in filtered_where:
+        if where_ops[col] not in WHERE_TEMPLATES:
+            raise ValueError(f"Unknown operator '{where_ops[col]}' for column '{col}'")
+        conditions.append(WHERE_TEMPLATES[where_ops[col]].format(col=col))
+    where_clause = generate_where_clause(conditions)
+
+    if operation in ("select", "json_agg", "row_to_json"):
+        sort = []
+        for key in order_by:
+            col = key.lstrip("-")
+            if col not in columns:
+                raise ValueError(f"Cannot order {name} by unknown column '{col}'")
+            sort.append(f"{col} DESC" if key.startswith("-") else col)
+        if after and not order_by:
+            raise ValueError("Paging with 'after' requires 'order_by' columns")
+        if after and len({key.startswith("-") for key in order_by}) != 1:
+            raise ValueError("Paging with 'after' requires every 'order_by' column sorted the same way")
+        projection = filtered_fields or columns
+        keys = [key.lstrip("-") for key in order_by]
+        if after:
+            op = "<" if order_by[0].startswith("-") else ">"
+            placeholders = ", ".join(["%s"] * len(keys))
+            conditions.append(f"({', '.join(keys)}) {op} ({placeholders})")
+        if operation == "select":
+            select_list = ", ".join(projection)
+        else:
+            types = dict(zip(columns, column_types))
+            cast_types = dict(casts)
+            select_list = ", ".join(
+                json_column(col, types.get(col), cast_types.get(col)) for col in projection
+            )
+        if operation == "json_agg" and keys:
+            # Raw sort values for the cursor, which rendered JSON may round
+            select_list += "".join(f", {col} AS mupp_key_{i}" for i, col in enumerate(keys))
+        sql = f"""
+      SELECT {select_list}
+      FROM {name}
+      {generate_where_clause(conditions)}
+      {'ORDER BY ' + ', '.join(sort) if sort else ''}
+      {'LIMIT %s' if limit else ''}
+      {'OFFSET %s' if offset else ''}
+    """
+        if operation == "json_agg":
+            # One document, with its length and the sort values of its last
+            # entity as a cursor: their text for one key, a JSON array for more
+            if not keys:
+                cursor = "NULL"
+            elif len(keys) == 1:
+                cursor = "(array_agg(k.mupp_key_0::text))[count(*)]"
+            else:
+                values = ", ".join(f"k.mupp_key_{i}" for i in range(len(keys)))
+                cursor = f"(array_agg(json_build_array({values})::text))[count(*)]"
+            fields = ", ".join(f"k.{col}" for col in projection)
+            sql = f"""
+      SELECT COALESCE(json_agg((SELECT r FROM (SELECT {fields}) AS r)), '[]')::text, count(*), {cursor}
+      FROM ({sql}) AS k
+    """
+        elif operation == "row_to_json":
+            sql = f"""
+      SELECT row_to_json(r)::text FROM ({sql}) AS r
+    """
+        return Statement(sql + ";", (), filtered_where, projection, where_clause)
+
+    if operation == "insert":
+        sql = f"""
+      INSERT INTO {name}
+      ({', '.join(filtered_fields)})
+      VALUES ({', '.join(['%s'] * len(filtered_fields))})
+      {generate_return_statement(list(filtered_returning))};
+    """
+        return Statement(sql, filtered_fields, (), filtered_returning)
+
+    if operation == "update":
+        sql = f"""
+      UPDATE {name}
+      SET {', '.join(col + '=%s' for col in filtered_fields)}
+      {where_clause}
+      {generate_return_statement(list(filtered_returning))};
+    """
+        return Statement(sql, filtered_fields, filtered_where, filtered_returning, where_clause)
+
+    if operation == "delete":
+        sql = f"""
+      DELETE FROM {name}
+      {where_clause}
+      {generate_return_statement(list(filtered_returning))};
+    """
+        return Statement(sql, (), filtered_where, filtered_returning, where_clause)
+
+    if operation in ("insert_many", "upsert"):
+        # `where` names the conflict target for upserts
+        sql = f"""
+      INSERT INTO {name}
+      ({', '.join(filtered_fields)})
+      VALUES %s
+    """
+        if operation == "upsert":
+            updates = [f"{col}=EXCLUDED.{col}" for col in filtered_fields if col not in filtered_where]
+            sql += f"""  ON CONFLICT ({', '.join(filtered_where)})
+      {'DO UPDATE SET ' + ', '.join(updates) if updates else 'DO NOTHING'}
+    """
+        sql += f"""  {generate_return_statement(list(filtered_returning))};
+    """
+        return Statement(sql, filtered_fields, (), filtered_returning)
+
+    if operation == "update_many":
+        # Each VALUES row carries the new fields followed by the `where` keys
+        values_columns = filtered_fields + filtered_where
+        sql = f"""
+      UPDATE {name} AS t
+      SET {', '.join(f'{col}=v.{col}' for col in filtered_fields)}
+      FROM (VALUES %s) AS v ({', '.join(values_columns)})
+      {generate_where_clause([f't.{col}=v.{col}' for col in filtered_where])}
+      {generate_return_statement([f't.{col}' for col in filtered_returning])};
+    """
+        return Statement(sql, filtered_fields, filtered_where, filtered_returning)
+
+    raise ValueError(f"Unknown operation '{operation}'")
+
+
 class Table:
     def __init__(
         self,
@@ -42,169 +417,340 @@ class Table:
         self._name = name
         self._columns = columns
         self._database = database
+        self._column_names = tuple(col["column_name"] for col in columns)
+        self._column_types = {col["column_name"]: col["type"] for col in columns}
+        self._type_names = tuple(col["type"] for col in columns)
 
     def __repr__(self):
         return self._name
 
-    def parse_obj(self, entity: tuple, filtered_fields: list):
+    def statement(
+        self,
+        operation: str,
+        fields=(),
+        where=(),
+        returning=(),
+        order_by=None,
+        after: bool = False,
+        limit: bool = False,
+        casts: dict = {},
+        offset: bool = False,
+    ) -> Statement:
         """
-        Parse database entity tuple into a JSON serializable object
+        Cached SQL for an operation on the given field and RETURNING names and
+        WHERE mapping (or names), keyed by its shape rather than its values
         """
-        obj = {}
-        if len(filtered_fields) == 0:
-            for col in self._columns:
-                obj[col["column_name"]] = json_prep(
-                    entity[(col["ordinal_position"] - 1)]
-                )
-        else:
-            for i in range(len(filtered_fields)):
-                obj[filtered_fields[i]] = json_prep(entity[i])
+        return compile_statement(
+            self._name,
+            self._column_names,
+            operation,
+            tuple(fields),
+            where_shape(where),
+            tuple(returning),
+            order_shape(order_by),
+            after,
+            limit,
+            self._type_names,
+            tuple(casts.items()),
+            offset,
+        )
 
-        return obj
+    def select(
+        self,
+        fields: list = [],
+        where: dict = {},
+        number: int | None = None,
+        prepare: bool = False,
+        stream: bool = False,
+        itersize: int = 2000,
+        order_by=None,
+        after=None,
+        limit: int | None = None,
+        as_tuples: bool = False,
+        offset: int | None = None,
+        primary: bool = False,
+    ):
+        """
+        Select entities from the current table and return them as JSON objects.
+        WHERE mapping values are compared for equality, or may be Predicates
+        such as In, Between, IsNull or ILike.
+        `prepare` runs hot lookups as a server-side prepared statement.
+        `stream` returns an iterator that fetches `itersize` entities at a
+        time from a server-side cursor instead of a list; `number` is ignored.
+        `order_by` sorts by a column or list of columns ("-id" for descending),
+        and `after` only returns entities past a value of the sort column (a
+        list of values when sorting by several), so pages of `limit` entities
+        can be read by passing the last values of each page as the next
+        `after`. `offset` skips entities instead.
+        `as_tuples` returns entities as tuples, in table column order, instead of objects.
+        `primary` skips read replicas, for rows that must reflect recent writes.
+        """
+        statement, args = self._select_statement(
+            "select", fields, where, order_by, after, limit, offset=offset
+        )
+        decoder = statement.decoder
+        if stream:
+            rows = self._database.stream(statement.sql, args, itersize, JSON_CASTS, primary)
+            return rows if as_tuples else decoder.stream(rows)
+        res = self._database.select(
+            statement.sql,
+            args,
+            number,
+            statement.name if prepare else None,
+            JSON_CASTS,
+            primary,
+        )
+        if res is None:
+            return None
+        if type(res) is tuple:
+            return res if as_tuples else decoder.obj(res)
+        return decoder.objs(res, as_tuples)
 
-    def parse_array_of_ojbs(self, entities: list, filtered_fields: list):
+    def _select_statement(
+        self,
+        operation: str,
+        fields,
+        where: dict,
+        order_by,
+        after,
+        limit,
+        casts: dict = {},
+        offset=None,
+    ) -> tuple[Statement, list]:
+        statement = self.statement(
+            operation,
+            fields,
+            where,
+            (),
+            order_by,
+            after is not None,
+            limit is not None,
+            casts,
+            offset is not None,
+        )
+        args = statement.values(where=where)
+        if isinstance(after, (list, tuple)):
+            args.extend(after)
+        elif after is not None:
+            args.append(after)
+        for value in (limit, offset):
+            if value is not None:
+                args.append(value)
+        return statement, args
+
+    def select_json(
+        self,
+        fields: list = [],
+        where: dict = {},
+        order_by=None,
+        after=None,
+        limit: int | None = None,
+        casts: dict = {},
+        offset: int | None = None,
+    ) -> tuple[str, int, str | None]:
         """
-        Parse a list of database entity tuples
+        Select entities as a JSON array rendered by Postgres, ready to send as is.
+        Takes the same filtering and paging arguments as `select`; `casts` maps
+        columns to SQL types to convert them to, e.g. "json" for JSON stored as text.
+        Returns the document, its number of entities, and a cursor to pass as
+        the next `after`: the last entity's sort value as text, or its sort
+        values as a JSON array when sorting by several columns (None without
+        `order_by` or entities).
         """
-        arr = []
-        for entity in entities:
-            arr.append(self.parse_obj(entity, filtered_fields))
-        return arr
+        statement, args = self._select_statement(
+            "json_agg", fields, where, order_by, after, limit, casts, offset
+        )
+        return self._database.select(statement.sql, args, 1)
 
-    def select(self, fields: list = [], where: dict = {}, number: int | None = None):
+    def select_json_obj(self, fields: list = [], where: dict = {}, casts: dict = {}) -> str | None:
+        """Select the first matching entity as a JSON object rendered by Postgres, or None"""
+        statement, args = self._select_statement(
+            "row_to_json", fields, where, None, None, None, casts
+        )
+        res = self._database.select(statement.sql, args, 1)
+        return None if res is None else res[0]
+
+    def stream_json(
+        self,
+        fields: list = [],
+        where: dict = {},
+        order_by=None,
+        after=None,
+        casts: dict = {},
+        itersize: int = 2000,
+    ):
         """
-        Select entities from the current table and return them as JSON objects.
-        TODO: WHERE maps assume comparison. Must expand support.
-        """
-        filtered_fields = []
-        filtered_where = []
-        values = []
-
-        for column in self._columns:
-            if column["column_name"] in fields:
-                filtered_fields.append(column["column_name"])
-            if column["column_name"] in where:
-                filtered_where.append(column["column_name"] + "=%s")
-                # TODO: validate type
-                values.append(where[column["column_name"]])
-
-        query = f"""
-      SELECT {
-        '*' if len(filtered_fields) == 0
-        else ', '.join(filtered_fields)
-      }
-      FROM {self._name}
-      {generate_where_clause(filtered_where)};
-    """
-        res = self._database.select(query, values, number)
-        if res is None:
-            return None
-        return (
-            self.parse_obj(res, filtered_fields)
-            if type(res) is tuple
-            else self.parse_array_of_ojbs(res, filtered_fields)
+        Yield a JSON array of every matching entity as byte chunks, one batch
+        of `itersize` entities per chunk, from a server-side cursor.
+        """
+        statement, args = self._select_statement(
+            "row_to_json", fields, where, order_by, after, None, casts
+        )
+        rows = self._database.stream(statement.sql, args, itersize)
+        try:
+            yield b"["
+            separator = ""
+            batch = []
+            for (obj,) in rows:
+                batch.append(obj)
+                if len(batch) == itersize:
+                    yield (separator + ",".join(batch)).encode()
+                    separator = ","
+                    batch = []
+            if batch:
+                yield (separator + ",".join(batch)).encode()
+            yield b"]"
+        finally:
+            rows.close()
+
+    def export_csv(self, labels: dict = {}, where: dict = {}, chunk_size: int = 65536):
+        """
+        Stream entities as CSV byte chunks straight out of a COPY, with a
+        header row naming each column by its entry in `labels`, if any.
+        """
+        sql, args = self._export_statement(labels, where)
+        return self._database.copy_out(sql, args, chunk_size)
+
+    def _export_statement(self, labels: dict, where: dict) -> tuple[str, list]:
+        statement = self.statement("select", [], where)
+        projection = ", ".join(
+            f"{col} AS {quote_label(labels.get(col, col))}" for col in statement.fields
         )
+        sql = f"""
+      COPY (SELECT {projection} FROM {self._name} {statement.where_clause})
+      TO STDOUT WITH CSV HEADER;
+    """
+        return sql, statement.values(where=where)
 
     def insert(self, fields: dict = {}, returning: list = []):
         """
         Insert an object by converting into an entity tuple.
         Optionally return updated fields if specified in list.
         """
-        filtered_fields = []
-        value_holder = []
-        filtered_returning = []
-        values = []
-
-        for column in self._columns:
-            if column["column_name"] in fields:
-                filtered_fields.append(column["column_name"])
-                value_holder.append("%s")
-                values.append(fields[column["column_name"]])
-            if column["column_name"] in returning:
-                filtered_returning.append(column["column_name"])
+        statement = self.statement("insert", fields, returning=returning)
 
-        if not filtered_fields:
+        if not statement.set_keys:
             raise ValueError(
                 f"No valid fields provided for insertion into table '{self._name}'. Got: {list(fields.keys())}"
             )
 
-        query = f"""
-      INSERT INTO {self._name}
-      ({', '.join(filtered_fields)})
-      VALUES ({', '.join(value_holder)})
-      {generate_return_statement(filtered_returning)};
-    """
-        res = self._database.exec_commit(query, values)
+        res = self._database.exec_commit(statement.sql, statement.values(fields), JSON_CASTS)
         if res is None:
             return None
-        return self.parse_obj(res, filtered_returning)
+        return statement.decoder.obj(res)
 
     def update(self, fields: dict = {}, where: dict = {}, returning: list = []):
         """
         Update table field value(s) according to WHERE mapping (default all entities).
+        WHERE mapping values may be Predicates, as in `select`.
         Optionally return updated fields if specified in list.
-        TODO: WHERE maps assume comparison. Must expand support.
-        """
-        filtered_fields = []
-        filtered_where = []
-        filtered_returning = []
-        field_values = []
-        where_values = []
-
-        for column in self._columns:
-            if column["column_name"] in fields:
-                filtered_fields.append(column["column_name"] + "=%s")
-                field_values.append(fields[column["column_name"]])
-            if column["column_name"] in where:
-                filtered_where.append(column["column_name"] + "=%s")
-                where_values.append(where[column["column_name"]])
-            if column["column_name"] in returning:
-                filtered_returning.append(column["column_name"])
-
-        # TODO: this seems inefficient, consider named replacements for values
-        values = field_values + where_values
-        query = f"""
-      UPDATE {self._name}
-      SET {', '.join(filtered_fields)}
-      {generate_where_clause(filtered_where)}
-      {generate_return_statement(filtered_returning)};
-    """
-        res = self._database.exec_commit(query, values)
+        """
+        statement = self.statement("update", fields, where, returning)
+        res = self._database.exec_commit(
+            statement.sql, statement.values(fields, where), JSON_CASTS
+        )
         if res is None:
             return None
-        return (
-            self.parse_obj(res, filtered_returning)
-            if type(res) is tuple
-            else self.parse_array_of_ojbs(res, filtered_returning)
-        )
+        if type(res) is tuple:
+            return statement.decoder.obj(res)
+        return statement.decoder.objs(res)
 
     def delete(self, where: dict = {}, returning: list = []):
         """
         Delete table row(s) according to WHERE mapping (deletes all entries when omitted).
+        WHERE mapping values may be Predicates, as in `select`.
         Optionally return updated fields if specified in list.
-        TODO: WHERE maps assume comparison. Must expand support.
         """
-        filtered_where = []
-        filtered_returning = []
-        values = []
-
-        for column in self._columns:
-            if column["column_name"] in where:
-                filtered_where.append(column["column_name"] + "=%s")
-                values.append(where[column["column_name"]])
-            if column["column_name"] in returning:
-                filtered_returning.append(column["column_name"])
-
-        query = f"""
-      DELETE FROM {self._name}
-      {generate_where_clause(filtered_where)}
-      {generate_return_statement(filtered_returning)};
-    """
-        res = self._database.exec_commit(query, values)
+        statement = self.statement("delete", where=where, returning=returning)
+        res = self._database.exec_commit(
+            statement.sql, statement.values(where=where), JSON_CASTS
+        )
         if res is None:
             return None
-        return (
-            self.parse_obj(res, filtered_returning)
-            if type(res) is tuple
-            else self.parse_array_of_ojbs(res, filtered_returning)
+        if type(res) is tuple:
+            return statement.decoder.obj(res)
+        return statement.decoder.objs(res)
+
+    def _write_many(
+        self,
+        operation: str,
+        rows,
+        keys: list = [],
+        returning: list = [],
+        chunk_size: int = 500,
+    ):
+        """
+        Shared path of the bulk writers. The first row decides which fields
+        are written; rows go out `chunk_size` at a time in one transaction.
+        """
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            return [] if returning else None
+        statement, template = self._bulk_statement(operation, first, keys, returning)
+        res = self._database.exec_values(
+            statement.sql,
+            (statement.values(row, row) for row in chain([first], rows)),
+            template,
+            chunk_size,
+            fetch=bool(statement.fields),
+            casts=JSON_CASTS,
         )
+        if res is None:
+            return None
+        return statement.decoder.objs(res)
+
+    def _bulk_statement(
+        self, operation: str, first: dict, keys: list, returning: list
+    ) -> tuple[Statement, str | None]:
+        """
+        Statement of a bulk write whose fields are those of its `first` row,
+        and the template of each VALUES row (None for plain placeholders)
+        """
+        # update_many sends its keys after the fields, upsert inserts them too
+        fields = [key for key in first if operation == "upsert" or key not in keys]
+        statement = self.statement(operation, fields, keys, returning)
+        if not statement.set_keys:
+            raise ValueError(
+                f"No valid fields provided for table '{self._name}'. Got: {fields}"
+            )
+        if operation != "insert_many" and (
+            not keys or any(key not in self._column_names for key in keys)
+        ):
+            raise ValueError(
+                f"Invalid keys provided for table '{self._name}'. Got: {keys}"
+            )
+
+        template = None
+        if operation == "update_many":
+            # VALUES rows are untyped, so cast each one to its column type
+            template = "({})".format(
+                ", ".join(
+                    f"%s::{self._column_types[col]}"
+                    for col in statement.set_keys + statement.where_keys
+                )
+            )
+        return statement, template
+
+    def insert_many(self, rows, returning: list = [], chunk_size: int = 500):
+        """
+        Insert an iterable of objects with one multi-row INSERT per chunk.
+        Optionally return inserted fields if specified in list.
+        """
+        return self._write_many("insert_many", rows, [], returning, chunk_size)
+
+    def update_many(self, rows, keys: list, returning: list = [], chunk_size: int = 500):
+        """
+        Update many rows, matching each object on its `keys` fields and
+        setting its other fields, with one UPDATE ... FROM (VALUES ...) per chunk.
+        Optionally return updated fields if specified in list.
+        """
+        return self._write_many("update_many", rows, keys, returning, chunk_size)
+
+    def upsert(self, rows, conflict: list, returning: list = [], chunk_size: int = 500):
+        """
+        Insert an iterable of objects, updating existing rows whose `conflict`
+        fields (a unique constraint) already match.
+        Optionally return written fields if specified in list.
+        """
+        return self._write_many("upsert", rows, conflict, returning, chunk_size)
@@ -0,0 +1,70 @@
+from argparse import ArgumentParser
+from dotenv import load_dotenv
+from os import environ
+import os.path as path
+from db.utils.db import Database
+from db.batch_groupings import (
+    run_batch,
+    write_results_to_files,
+    write_results_to_database,
+    format_summary,
+)
+
+load_dotenv()
+
+
+def parse_args():
+    parser = ArgumentParser(
+        description="Regenerate groupings for many forms outside of the web server"
+    )
+    parser.add_argument("form_ids", nargs="*", help="hosted form ids to regroup")
+    parser.add_argument(
+        "--csv",
+        nargs="*",
+        default=[],
+        help="exported response CSVs, named <form_id>.csv",
+    )
+    parser.add_argument("--schema", default=environ.get("DB_SCHEMA", "public"))
+    parser.add_argument("--workers", type=int, help="process pool size")
+    parser.add_argument(
+        "--exact", action="store_true", help="solve small events to optimality"
+    )
+    parser.add_argument(
+        "--time-limit",
+        type=int,
+        default=30,
+        help="seconds the exact solver may run per form before keeping the heuristic schedule",
+    )
+    parser.add_argument(
+        "--score-dir",
+        help="keep score matrices in memory-mapped files here while solving, instead of RAM",
+    )
+    parser.add_argument("--out", help="write schedules as JSON files to this directory")
+    parser.add_argument(
+        "--save", action="store_true", help="store schedules in form_groupings"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    sources = [("db", args.schema, form_id) for form_id in args.form_ids]
+    for csv_path in args.csv:
+        form_id = path.splitext(path.basename(csv_path))[0]
+        sources.append(("csv", csv_path, form_id))
+
+    results = run_batch(
+        sources, args.workers, args.exact, args.time_limit, args.score_dir
+    )
+
+    if args.out:
+        write_results_to_files(results, args.out)
+    if args.save:
+        db = Database(args.schema)
+        write_results_to_database(db, results)
+        db.cleanup()
+    print(format_summary(results))
+
+
+if __name__ == "__main__":
+    main()
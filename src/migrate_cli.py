@@ -0,0 +1,26 @@
+from argparse import ArgumentParser
+from dotenv import load_dotenv
+from os import environ
+from db.utils.db import Database
+
+load_dotenv()
+
+
+def main():
+    parser = ArgumentParser(description="Apply pending schema migrations")
+    parser.add_argument("--schema", default=environ.get("DB_SCHEMA", "public"))
+    parser.add_argument("--dir", default="config/migrations", help="migrations directory")
+    args = parser.parse_args()
+
+    db = Database(args.schema)
+    try:
+        applied = db.migrate(args.dir)
+    finally:
+        db.cleanup()
+    for version in applied:
+        print(f"Applied {version}")
+    print(f"{len(applied)} migrations applied to schema '{args.schema}'")
+
+
+if __name__ == "__main__":
+    main()
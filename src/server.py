@@ -3,11 +3,12 @@ from os import environ
 from flask import Flask
 from flask_restful import Resource, Api
 from flask_cors import CORS
-from db.utils.db import Database
+from api.request_db import get_db, close_db, count_queries, add_server_timing
 
 from api.accounts import Accounts, Account
 from api.logins import LoginAPI, LogoutAPI, GetLoginTable
-from api.hosted_forms import Forms, Form, FormResponses, FormGroupings
+from api.hosted_forms import Forms, Form, FormResponses, FormResponsesExport, FormGroupings
+from api.debug import QueryPlans
 try:
     environ.pop("DB_SCHEMA")
 except Exception as e:
@@ -17,12 +18,15 @@ load_dotenv()
 
 class Root(Resource):
     def get(self):
-        db = Database(environ.get("DB_SCHEMA", "public"))
+        db = get_db()
         return db.tables["mupp_setup_demo"].select("*")
 
 
 app = Flask(__name__)
-CORS(app)
+app.before_request(count_queries)
+app.after_request(add_server_timing)
+app.teardown_appcontext(close_db)
+CORS(app, expose_headers=["Next-Cursor", "Server-Timing"])
 api = Api(app)
 
 api.add_resource(Root, "/")
@@ -37,7 +41,9 @@ api.add_resource(Forms, "/forms")
 api.add_resource(Form, "/forms/<string:form_id>", endpoint="form_api")  # API route
 api.add_resource(Form, "/form/<string:form_id>", endpoint="form_view")  # Shareable user-facing route
 api.add_resource(FormResponses, "/responses/<string:form_id>")
+api.add_resource(FormResponsesExport, "/responses/<string:form_id>/export")
 api.add_resource(FormGroupings, '/groupings/<string:form_id>')
+api.add_resource(QueryPlans, "/debug/queries")
 
 if __name__ == "__main__":
     app.run(host="::", port=5001, debug=True)
@@ -0,0 +1,64 @@
+from unittest import TestCase
+from src.db.utils.db import Database
+from tests.api.test_req_utils import test_get
+
+base_url = "http://localhost:5001"
+endpoint = "/debug/queries"
+config = Database.load_config()
+capture_on = config.get("explain_ms") is not None
+operators = config.get("debug_operators") or []
+
+
+class QueryPlansResourceTest(TestCase):
+    def setUp(self):
+        self.db = Database("test")
+        self.db.exec_sql_file("config/demo_db_setup.sql")
+        self.db.fetch_tables()
+        self.account_id = self.db.exec_commit(
+            "INSERT INTO accounts (username, email, password, salt) VALUES (%s, %s, %s, %s) RETURNING id;",
+            ("test", "test@fake.email.com", "dummy", "salt"),
+        )[0]
+        self.session_headers = {"session-key": "operator-secret-key"}
+        self.db.exec_commit(
+            "INSERT INTO logins (user_id, session_key) VALUES (%s, %s);",
+            (self.account_id, self.session_headers["session-key"]),
+        )
+
+    def tearDown(self):
+        self.db.cleanup(True)
+
+    def test_get_requires_login(self):
+        test_get(self, base_url + endpoint, expected_status=401)
+
+    def expected_status(self, operator_status=200) -> int:
+        if not capture_on:
+            return 404
+        return operator_status if self.account_id in operators else 403
+
+    def test_get_lists_slowest_shapes_to_operators(self):
+        """
+        GET requests to /debug/queries list captured query shapes, slowest
+        in total first, to `debug_operators` while `explain_ms` is set
+        """
+        test_get(self, base_url + "/forms", header=self.session_headers)
+        data = test_get(
+            self, base_url + endpoint, params={"limit": 5},
+            header=self.session_headers, expected_status=self.expected_status(),
+        )
+        if self.expected_status() != 200:
+            return
+        self.assertLessEqual(len(data), 5)
+        totals = [entry["total_ms"] for entry in data]
+        self.assertEqual(sorted(totals, reverse=True), totals)
+        self.assertTrue(data, "Expected the /forms queries to be captured")
+        self.assertTrue(all("%s" not in entry["query"] and entry["plan"] for entry in data))
+        self.assertFalse(
+            any(self.session_headers["session-key"] in entry["plan"] for entry in data),
+            "Expected session keys to be scrubbed from plans",
+        )
+
+    def test_get_rejects_bad_limits(self):
+        test_get(
+            self, base_url + endpoint, params={"limit": 0},
+            header=self.session_headers, expected_status=self.expected_status(400),
+        )
@@ -2,7 +2,8 @@ from unittest import TestCase
 from src.db.form_hosting import generate_form_table, format_table_name
 from src.db.utils.db import Database
 from tests.api.test_req_utils import test_get, test_post, test_put, test_delete
-from json import dumps
+from json import dumps, loads
+from requests import get
 
 base_url = "http://localhost:5001"
 endpoint = "/forms"
@@ -79,6 +80,75 @@ class FormsResourceTest(TestCase):
         data = test_get(self, base_url + endpoint, header=self.session_headers, expected_status=200)
         self.assertEqual(expected, data, 'Expected to receive form data back')
 
+    def test_get_pages_forms_with_limit_and_after(self):
+        """
+        GET requests to /forms with a limit return one page in creation order and a
+        Next-Cursor header to request the following page with; forms created
+        mid-scan land on later pages
+        """
+        table = self.db.tables['hosted_forms']
+        table.insert_many(
+            {'account_id': self.account_ids[0][0], 'form_structure': dumps(self.dummy_form_data)}
+            for _ in range(3)
+        )
+        expected = table.select(where={ 'account_id': self.account_ids[0][0] }, order_by=['created_at', 'id'])
+
+        res = get(base_url + endpoint, params={'limit': 2}, headers=self.session_headers)
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(expected[:2], res.json())
+        cursor = res.headers.get('Next-Cursor')
+        self.assertEqual(expected[1]['id'], loads(cursor)[1])
+
+        newest = table.insert(
+            {'account_id': self.account_ids[0][0], 'form_structure': dumps(self.dummy_form_data)}, ['id']
+        )
+        res = get(base_url + endpoint, params={'limit': 2, 'after': cursor}, headers=self.session_headers)
+        self.assertEqual(expected[2:], res.json()[:1])
+        self.assertEqual(newest['id'], res.json()[1]['id'])
+
+        res = get(base_url + endpoint, params={'limit': 2, 'after': res.headers['Next-Cursor']}, headers=self.session_headers)
+        self.assertEqual([], res.json())
+        self.assertIsNone(res.headers.get('Next-Cursor'), 'Expected no cursor after the last page')
+
+    def test_get_rejects_malformed_cursors(self):
+        """
+        GET requests to /forms with an `after` that is not a page cursor are rejected
+        """
+        test_get(self, base_url + endpoint, params={'limit': 2, 'after': 'nope'},
+                 header=self.session_headers, expected_status=400)
+
+    def test_get_reports_query_timing(self):
+        """
+        Responses carry a Server-Timing header with the request's query count and time
+        """
+        res = get(base_url + endpoint, headers=self.session_headers)
+        self.assertEqual(200, res.status_code)
+        self.assertRegex(res.headers.get('Server-Timing'), r'^db;dur=[0-9.]+;desc="[1-9][0-9]* queries"$')
+
+    def test_get_projects_requested_fields(self):
+        """
+        GET requests to /forms with fields only return those fields and the id
+        """
+        self.db.tables['hosted_forms'].insert({
+            'account_id': self.account_ids[0][0],
+            'form_structure': dumps(self.dummy_form_data)
+        })
+        data = test_get(
+            self, base_url + endpoint, params={'fields': 'created_at'},
+            header=self.session_headers, expected_status=200
+        )
+        self.assertEqual(1, len(data))
+        self.assertEqual({'id', 'created_at'}, set(data[0].keys()))
+
+    def test_get_rejects_invalid_limit(self):
+        """
+        GET requests to /forms with a limit out of range return a 400
+        """
+        test_get(
+            self, base_url + endpoint, params={'limit': 0},
+            header=self.session_headers, expected_status=400
+        )
+
     def test_post_adds_form_table_to_database(self):
         """
         POST requests to the /forms endpoint generates a new table
@@ -101,6 +171,21 @@ class FormsResourceTest(TestCase):
             f"Expected {expected_table_count} form tables in database",
         )
 
+    def test_post_does_not_keep_form_when_table_creation_fails(self):
+        """
+        POST requests to the /forms endpoint with a structure that cannot become a table
+        leave no hosted_forms row behind
+        """
+        original_count = len(self.db.tables['hosted_forms'].select())
+        test_post(
+            self,
+            base_url + endpoint,
+            json={"form_structure": {"entities": {"broken": {"type": "textField"}}}},
+            header=self.session_headers,
+            expected_status=500,
+        )
+        self.assertEqual(original_count, len(self.db.tables['hosted_forms'].select()))
+
     def test_post_returns_form_id_on_success(self):
         """
         POST requests to the /forms endpoint to return generated table id
@@ -314,3 +399,93 @@ class FormResourceTest(TestCase):
         test_delete(
             self, base_url + endpoint + param_endpoint,expected_status=401
         )
+
+
+class FormResponsesResourceTest(TestCase):
+    def setUp(self):
+        self.db = Database("test")
+        self.db.cleanup(True)
+        self.db.exec_sql_file("config/demo_db_setup.sql")
+        self.db.fetch_tables()
+        account_id = self.db.exec_commit(
+            """
+        INSERT INTO accounts (username, email, password, salt)
+        VALUES (%s, %s, %s, %s)
+        RETURNING id;
+        """,
+            ("test", "test@fake.email.com", "dummy", "salt"),
+        )[0]
+        form_data = {
+            'entities': {
+            '7a77959a-eb84-447c-9ed7-200e2a674eea': {
+                'type': 'textField',
+                'attributes': {'label': 'Your Name', 'required': True},
+            },
+            },
+            'root': ['7a77959a-eb84-447c-9ed7-200e2a674eea']
+        }
+        self.form_id = self.db.exec_commit(
+            "INSERT INTO hosted_forms (account_id, form_structure) VALUES (%s, %s) RETURNING id;",
+            (account_id, dumps(form_data)),
+        )[0]
+        generate_form_table(self.db, self.form_id)
+        self.db.tables[format_table_name(self.form_id)].insert_many(
+            {"your_name": f"person {i}"} for i in range(3)
+        )
+        self.session_headers = {"session-key": "session_key"}
+        self.db.exec_commit(
+            "INSERT INTO logins (user_id, session_key) VALUES (%s, %s);",
+            (account_id, self.session_headers.get("session-key")),
+        )
+
+    def tearDown(self):
+        self.db.cleanup()
+
+    def test_get_streams_responses_as_csv(self):
+        """
+        GET requests to /responses/<string:form_id>/export return every response as CSV
+        with the question labels as headers
+        """
+        res = get(
+            f"{base_url}/responses/{self.form_id}/export", headers=self.session_headers
+        )
+        self.assertEqual(200, res.status_code)
+        self.assertTrue(res.headers["Content-Type"].startswith("text/csv"))
+        lines = res.text.splitlines()
+        self.assertEqual("id,Your Name", lines[0])
+        self.assertEqual(4, len(lines), "Expected a header and three responses")
+
+    def test_get_requires_session(self):
+        """
+        GET requests to /responses/<string:form_id>/export without a session return 401
+        """
+        res = get(f"{base_url}/responses/{self.form_id}/export")
+        self.assertEqual(401, res.status_code)
+
+    def test_get_returns_every_response(self):
+        """
+        GET requests to /responses/<string:form_id> return all responses as a JSON list
+        """
+        data = test_get(
+            self, f"{base_url}/responses/{self.form_id}",
+            header=self.session_headers, expected_status=200
+        )
+        expected = self.db.tables[format_table_name(self.form_id)].select(order_by="id")
+        self.assertEqual(expected, data)
+
+    def test_get_pages_responses(self):
+        """
+        GET requests to /responses/<string:form_id> with a limit return a page and a Next-Cursor
+        """
+        res = get(
+            f"{base_url}/responses/{self.form_id}", params={"limit": 2},
+            headers=self.session_headers
+        )
+        self.assertEqual(["person 0", "person 1"], [r["your_name"] for r in res.json()])
+        res = get(
+            f"{base_url}/responses/{self.form_id}",
+            params={"limit": 2, "after": res.headers["Next-Cursor"]},
+            headers=self.session_headers
+        )
+        self.assertEqual(["person 2"], [r["your_name"] for r in res.json()])
+        self.assertNotIn("Next-Cursor", res.headers)
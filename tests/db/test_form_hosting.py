@@ -1,7 +1,12 @@
 from unittest import TestCase
 from tests.api.test_req_utils import test_post
 from src.db.utils.db import Database
-from src.db.form_hosting import generate_form_table, format_table_name, get_uuid_to_column_map
+from src.db.form_hosting import (
+    generate_form_table,
+    format_table_name,
+    get_uuid_to_column_map,
+    get_form_questions,
+)
 from json import dumps
 
 
@@ -75,6 +80,16 @@ class FormUtilsTest(TestCase):
             f'Expected form table "{formatted_name}" to be generated.',
         )
 
+    def test_generate_form_table_types_columns_by_question(self):
+        """
+        `generate_form_table` gives numberScale questions INT columns
+        """
+        generate_form_table(self.db, self.form_id)
+        table = self.db.tables[format_table_name(self.form_id)]
+        types = {col["column_name"]: col["type"] for col in table._columns}
+        self.assertEqual("integer", types["age"])
+        self.assertEqual("character varying", types["name"])
+
     def test_format_table_name_invalid(self):
         """
         format_table_name should still generate a string for weird IDs.
@@ -98,3 +113,21 @@ class FormUtilsTest(TestCase):
         clean_id = "abc123xyz"
         result = format_table_name(clean_id)
         self.assertEqual(result, "fabc123xyz")
+
+    def test_get_form_questions_follow_root_order(self):
+        """
+        `get_form_questions` lists questions in `root` order, not the key order of the stored JSONB.
+        """
+        questions = get_form_questions(self.db, self.form_id)
+        self.assertEqual(
+            [
+                ('7a77959a-eb84-447c-9ed7-200e2a674eea', 'Name', 'textField', True),
+                ('7a49f550-5966-4c8c-89eb-a0797940fff3', 'Age', 'numberScale', False),
+            ],
+            questions,
+        )
+        self.assertEqual(['name', 'age'], list(get_uuid_to_column_map(self.db, self.form_id).values()))
+
+    def test_get_form_questions_of_missing_form(self):
+        with self.assertRaises(ValueError):
+            get_form_questions(self.db, "00000000-0000-0000-0000-000000000000")
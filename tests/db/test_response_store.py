@@ -0,0 +1,98 @@
+from unittest import TestCase
+from json import dumps, loads
+from src.db.utils.db import Database
+from src.db.form_hosting import format_table_name
+from src.db.response_store import TableResponseStore, JsonbResponseStore
+
+
+class TableResponseStoreTest(TestCase):
+    store = TableResponseStore()
+
+    def setUp(self):
+        self.db = Database("test")
+        self.db.cleanup(True)
+        self.db.exec_sql_file("config/demo_db_setup.sql")
+        account_id = self.db.exec_commit(
+            "INSERT INTO accounts (username, email, password, salt) VALUES (%s, %s, %s, %s) RETURNING id;",
+            ("test", "test@fake.email.com", "dummy", "salt"),
+        )[0]
+        form_data = {
+            'entities': {
+                'name-uuid': {'type': 'textField', 'attributes': {'label': 'Your Name', 'required': True}},
+                'age-uuid': {'type': 'numberScale', 'attributes': {'label': 'Age'}},
+            },
+            'root': ['name-uuid', 'age-uuid']
+        }
+        self.form_id = self.db.exec_commit(
+            "INSERT INTO hosted_forms (account_id, form_structure) VALUES (%s, %s) RETURNING id;",
+            (account_id, dumps(form_data)),
+        )[0]
+        self.store.create(self.db, self.form_id)
+        for i in range(3):
+            self.store.insert(self.db, self.form_id, {"your_name": f"person {i}", "age": 20 + i})
+
+    def tearDown(self):
+        self.db.cleanup(True)
+
+    def test_columns_follow_question_order(self):
+        self.assertTrue(self.store.exists(self.db, self.form_id))
+        self.assertEqual(["your_name", "age"], self.store.columns(self.db, self.form_id))
+
+    def test_unknown_form_does_not_exist(self):
+        self.assertFalse(self.store.exists(self.db, "00000000-0000-0000-0000-000000000000"))
+        self.assertFalse(self.store.exists(self.db, "not-a-form"))
+
+    def test_insert_requires_required_answers(self):
+        with self.assertRaises(Exception):
+            self.store.insert(self.db, self.form_id, {"your_name": None, "age": 1})
+
+    def test_view_selects_and_pages_responses(self):
+        view = self.store.view(self.db, self.form_id)
+        rows = view.select(order_by="id")
+        self.assertEqual(["person 0", "person 1", "person 2"], [row["your_name"] for row in rows])
+        self.assertEqual(20, rows[0]["age"])
+        doc, count, last = view.select_json(["id", "your_name"], order_by="id", limit=2)
+        self.assertEqual(2, count)
+        page, _, _ = view.select_json(["your_name"], order_by="id", after=last, limit=2)
+        self.assertEqual([{"your_name": "person 2"}], loads(page))
+        streamed = loads(b"".join(view.stream_json(["your_name"], order_by="id")))
+        self.assertEqual(3, len(streamed))
+
+    def test_view_exports_csv_with_labels(self):
+        view = self.store.view(self.db, self.form_id)
+        lines = b"".join(view.export_csv({"your_name": "Your Name", "age": "Age"})).decode().splitlines()
+        self.assertEqual("id,Your Name,Age", lines[0])
+        self.assertEqual(4, len(lines))
+
+    def test_insert_rejects_answers_of_the_wrong_type(self):
+        with self.assertRaises(Exception):
+            self.store.insert(self.db, self.form_id, {"your_name": "someone", "age": "old"})
+
+    def test_rows_stream_every_response(self):
+        rows = list(self.store.rows(self.db, self.form_id))
+        self.assertEqual(3, len(rows))
+        self.assertEqual({"id", "your_name", "age"}, set(rows[0]))
+
+    def test_drop_removes_responses(self):
+        with self.db.transaction():
+            self.store.drop(self.db, self.form_id)
+            self.db.tables["hosted_forms"].delete({"id": self.form_id})
+        self.assertFalse(self.store.exists(self.db, self.form_id))
+
+
+class JsonbResponseStoreTest(TableResponseStoreTest):
+    store = JsonbResponseStore()
+
+    def test_create_needs_no_table(self):
+        self.assertIsNone(self.db.tables.get(format_table_name(self.form_id)))
+
+    def test_drop_removes_responses(self):
+        super().test_drop_removes_responses()
+        self.assertEqual((0,), self.db.select("SELECT count(*) FROM form_responses;", number=1))
+
+    def test_responses_are_partitioned_by_form(self):
+        partitions = self.db.select(
+            "SELECT DISTINCT tableoid::regclass::text FROM form_responses;"
+        )
+        self.assertEqual(1, len(partitions))
+        self.assertTrue(partitions[0][0].startswith("form_responses_"))
@@ -0,0 +1,125 @@
+from unittest import IsolatedAsyncioTestCase
+from asyncio import gather, run, to_thread
+from json import loads
+from src.db.utils.db import Database
+from src.db.utils.async_db import AsyncDatabase, get_async_pool, close_async_pools
+from src.db.utils.table import In
+from src.db.utils.instrumentation import track_queries
+
+
+class AsyncDatabaseTest(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.sync_db = Database("test")
+        self.table_name = "async_utils"
+        self.sync_db.exec_commit(
+            f"""
+      DROP TABLE IF EXISTS {self.table_name};
+      CREATE TABLE {self.table_name}(
+        id SERIAL PRIMARY KEY,
+        test_field VARCHAR,
+        ref UUID DEFAULT gen_random_uuid(),
+        created TIMESTAMP DEFAULT '2024-01-31 09:30:00.1234'
+      );
+      INSERT INTO {self.table_name} (test_field) VALUES ('dummy'), ('another dummy');
+      """
+        )
+        self.sync_db.invalidate_tables()
+
+    async def asyncSetUp(self):
+        self.db = AsyncDatabase(await get_async_pool("test"), "test")
+        await self.db.open()
+        self.table = await self.db.table(self.table_name)
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        await close_async_pools()
+
+    def tearDown(self):
+        self.sync_db.cleanup(True)
+
+    async def test_select_matches_sync_table(self):
+        expected = self.sync_db.tables[self.table_name].select(order_by="id")
+        self.assertEqual(expected, await self.table.select(order_by="id"))
+        self.assertEqual("2024-01-31T09:30:00.123Z", expected[0]["created"])
+        self.assertIsInstance(expected[0]["ref"], str)
+
+    async def test_select_with_predicates_and_number(self):
+        res = await self.table.select(["id"], {"id": In([1, 2])}, number=1, order_by="-id")
+        self.assertEqual({"id": 2}, res)
+        self.assertIsNone(await self.table.select(where={"id": 3}, number=1, prepare=True))
+
+    async def test_insert_update_delete(self):
+        self.assertEqual({"id": 3}, await self.table.insert({"test_field": "new"}, ["id"]))
+        res = await self.table.update({"test_field": "changed"}, {"id": In([1, 3])}, ["id"])
+        self.assertEqual([{"id": 1}, {"id": 3}], res)
+        self.assertEqual({"id": 2}, await self.table.delete({"test_field": "another dummy"}, ["id"]))
+        self.assertIsNone(await self.table.delete({"id": 3}))
+        self.assertEqual(
+            [{"test_field": "changed"}], await self.table.select(["test_field"])
+        )
+
+    async def test_bulk_writes(self):
+        res = await self.table.insert_many(
+            ({"test_field": f"bulk {i}"} for i in range(5)), ["id"], chunk_size=2
+        )
+        self.assertEqual([3, 4, 5, 6, 7], [row["id"] for row in res])
+        await self.table.update_many([{"id": 1, "test_field": "one"}], ["id"])
+        await self.table.upsert([{"id": 2, "test_field": "two"}], ["id"])
+        self.assertEqual(
+            [{"test_field": "one"}, {"test_field": "two"}],
+            await self.table.select(["test_field"], {"id": In([1, 2])}, order_by="id"),
+        )
+
+    async def test_stream_and_json(self):
+        rows = await self.table.select(["id"], stream=True, itersize=1, order_by="id")
+        self.assertEqual([{"id": 1}, {"id": 2}], [row async for row in rows])
+        chunks = [chunk async for chunk in self.table.stream_json(["id"], order_by="id", itersize=1)]
+        self.assertEqual([{"id": 1}, {"id": 2}], loads(b"".join(chunks)))
+        doc, count, last = await self.table.select_json(["id"], order_by="id", limit=1)
+        self.assertEqual(([{"id": 1}], 1, "1"), (loads(doc), count, last))
+        self.assertEqual({"id": 2}, loads(await self.table.select_json_obj(["id"], {"id": 2})))
+
+    async def test_export_csv(self):
+        chunks = [chunk async for chunk in self.table.export_csv({"test_field": "Field"}, {"id": 1})]
+        lines = b"".join(chunks).decode().splitlines()
+        self.assertEqual("id,Field,ref,created", lines[0])
+        self.assertEqual(2, len(lines))
+
+    async def test_transaction_rolls_back(self):
+        with self.assertRaises(RuntimeError):
+            async with self.db.transaction():
+                await self.table.insert({"test_field": "pending"})
+                async with self.db.transaction():
+                    await self.table.delete()
+                raise RuntimeError()
+        self.assertFalse(self.db.in_transaction)
+        self.assertEqual(2, len(await self.table.select()))
+
+    async def test_concurrent_queries_use_separate_connections(self):
+        async def count_rows():
+            async with AsyncDatabase(await get_async_pool("test"), "test") as db:
+                return await db.select("SELECT count(*), pg_sleep(0.2) FROM async_utils;", number=1)
+
+        results = await gather(*(count_rows() for _ in range(4)))
+        self.assertEqual([2] * 4, [count for count, _ in results])
+
+    async def test_each_event_loop_gets_its_own_pool(self):
+        async def other_loop():
+            pool = await get_async_pool("test")
+            async with AsyncDatabase(pool, "test") as db:
+                count = await db.select("SELECT count(*) FROM async_utils;", number=1)
+            await close_async_pools()
+            return pool, count
+
+        pool = await get_async_pool("test")
+        other_pool, count = await to_thread(run, other_loop())
+        self.assertIsNot(pool, other_pool)
+        self.assertEqual((2,), count)
+        self.assertIs(pool, await get_async_pool("test"), "Expected this loop's pool to stay open")
+        self.assertEqual(2, len(await self.table.select()))
+
+    async def test_queries_are_counted(self):
+        stats = track_queries()
+        await self.table.select()
+        await self.table.insert_many(({"test_field": "bulk"} for _ in range(3)), chunk_size=2)
+        self.assertEqual((3, 5), (stats.count, stats.rows))
@@ -0,0 +1,112 @@
+from unittest import TestCase
+from src.db.utils.db import Database
+from src.db.utils.instrumentation import QueryEvent, add_query_hook, remove_query_hook
+from src.db.utils.explain import PlanBuffer, PlanCapture, normalize_query, scrub_plan
+
+
+class NormalizeQueryTest(TestCase):
+    def test_literals_and_placeholders_become_markers(self):
+        self.assertEqual(
+            "SELECT * FROM f1a2 WHERE id IN (...) AND name = ? AND age > ?",
+            normalize_query("SELECT *\n  FROM f1a2 WHERE id IN (%s, %s, %s) AND name = 'it''s' AND age > 21;"),
+        )
+        self.assertEqual(
+            normalize_query("SELECT 1 FROM logins WHERE session_key = %(key)s"),
+            normalize_query("SELECT 2 FROM logins WHERE session_key = $1"),
+        )
+
+
+class ScrubPlanTest(TestCase):
+    def test_values_are_scrubbed_but_costs_kept(self):
+        plan = scrub_plan(
+            "Index Scan using t_pkey on t  (cost=0.14..8.16 rows=1 width=68)\n"
+            "  Index Cond: (id = ANY ('{3,4}'::integer[]))\n"
+            "  Filter: ((n > 12.5) AND ((name)::text = 'it''s'::text))\n"
+            "  Rows Removed by Filter: 2"
+        )
+        self.assertIn("(cost=0.14..8.16 rows=1 width=68)", plan)
+        self.assertIn("Index Cond: (id = ANY ('?'::integer[]))", plan)
+        self.assertIn("Filter: ((n > ?) AND ((name)::text = '?'::text))", plan)
+        self.assertIn("Rows Removed by Filter: 2", plan)
+
+
+class PlanBufferTest(TestCase):
+    def test_keeps_most_recent_shapes_and_ranks_by_total_time(self):
+        plans = PlanBuffer(2)
+        self.assertTrue(plans.add("a", 0.5))
+        plans.set_plan("a", "plan a", True)
+        self.assertFalse(plans.add("a", 0.1), "Expected faster runs to keep their plan")
+        self.assertTrue(plans.add("a", 0.9), "Expected slower runs to be captured again")
+        plans.add("b", 2.0)
+        plans.add("c", 0.1)
+        self.assertEqual(["b", "c"], [entry["query"] for entry in plans.top()])
+        self.assertEqual(1, len(plans.top(1)))
+
+
+class PlanCaptureTest(TestCase):
+    def setUp(self):
+        self.db = Database("test")
+        self.db.exec_commit(
+            """
+      DROP TABLE IF EXISTS explained;
+      CREATE TABLE explained(id SERIAL PRIMARY KEY, name VARCHAR);
+      INSERT INTO explained (name) VALUES ('a'), ('b');
+      """
+        )
+        self.capture = PlanCapture(lambda: {"explain_ms": 0})
+        add_query_hook(self.capture)
+
+    def tearDown(self):
+        remove_query_hook(self.capture)
+        self.db.cleanup(True)
+
+    def entry(self, shape: str) -> dict:
+        return next(entry for entry in self.capture.plans.top(100) if entry["query"] == shape)
+
+    def test_reads_are_analyzed(self):
+        self.db.select("SELECT * FROM explained WHERE id = %s;", (1,), primary=True)
+        self.db.select("SELECT * FROM explained WHERE id = %s;", (2,), primary=True)
+        entry = self.entry("SELECT * FROM explained WHERE id = ?")
+        self.assertEqual(2, entry["count"])
+        self.assertTrue(entry["analyzed"])
+        self.assertIn("actual time", entry["plan"])
+
+    def test_plans_leave_out_parameter_values(self):
+        self.db.select("SELECT * FROM explained WHERE name = %s AND id > %s;", ("secret-session-key", 41), primary=True)
+        plan = self.entry("SELECT * FROM explained WHERE name = ? AND id > ?")["plan"]
+        self.assertNotIn("secret-session-key", plan)
+        self.assertNotIn("41", plan)
+
+    def test_writes_are_only_planned(self):
+        self.db.exec_commit("UPDATE explained SET name = %s WHERE id = %s;", ("c", 1))
+        entry = self.entry("UPDATE explained SET name = ? WHERE id = ?")
+        self.assertFalse(entry["analyzed"])
+        self.assertNotIn("actual time", entry["plan"])
+        self.assertEqual(1, self.db.select("SELECT count(*) FROM explained WHERE name = 'c';", number=1)[0])
+
+    def test_transactions_survive_failed_explains(self):
+        with self.db.transaction():
+            self.db.exec_commit("INSERT INTO explained (name) VALUES ('d');")
+            with self.assertLogs("mupp.db", "WARNING"):
+                self.capture(QueryEvent("SELECT * FROM not_a_table;", None, self.db._conn))
+        self.assertEqual(3, self.db.select("SELECT count(*) FROM explained;", number=1)[0])
+
+    def test_side_effects_are_only_planned(self):
+        with self.db.transaction():
+            self.db.exec_commit("SELECT pg_advisory_lock(1);")
+            self.db.exec_commit("SELECT pg_advisory_unlock(1);")
+        self.assertFalse(self.entry("SELECT pg_advisory_lock(?)")["analyzed"])
+        self.assertIsNone(
+            self.db.select("SELECT 1 FROM pg_locks WHERE locktype = 'advisory';", number=1),
+            "Expected plans of side effects not to run them again",
+        )
+
+    def test_off_without_config(self):
+        capture = PlanCapture(lambda: {})
+        self.assertFalse(capture.enabled)
+        add_query_hook(capture)
+        try:
+            self.db.select("SELECT 1;")
+        finally:
+            remove_query_hook(capture)
+        self.assertEqual([], capture.plans.top())
@@ -0,0 +1,99 @@
+from unittest import TestCase
+from src.db.utils.db import Database
+from src.db.utils.instrumentation import (
+    QueryEvent,
+    SlowQueryLog,
+    add_query_hook,
+    remove_query_hook,
+    track_queries,
+    tracked_queries,
+    redact,
+)
+
+
+class InstrumentationTest(TestCase):
+    def setUp(self):
+        self.db = Database("test")
+        self.db.exec_commit(
+            """
+      DROP TABLE IF EXISTS instrumented;
+      CREATE TABLE instrumented(id SERIAL PRIMARY KEY, name VARCHAR);
+      INSERT INTO instrumented (name) VALUES ('a'), ('b'), ('c');
+      """
+        )
+        self.events = []
+        add_query_hook(self.events.append)
+
+    def tearDown(self):
+        remove_query_hook(self.events.append)
+        self.db.cleanup(True)
+
+    def test_hooks_see_every_statement_with_rows(self):
+        self.db.select("SELECT * FROM instrumented WHERE id > %s;", (1,), primary=True)
+        self.db.exec_commit("UPDATE instrumented SET name = 'd';")
+        select, update = self.events
+        self.assertIn("SELECT * FROM instrumented", select.query)
+        self.assertEqual((1,), select.params)
+        self.assertEqual(2, select.rows)
+        self.assertEqual(3, update.rows)
+        self.assertGreater(select.seconds, 0)
+        self.assertIsNone(select.error)
+
+    def test_streams_and_copies_are_recorded_when_done(self):
+        rows = self.db.stream("SELECT * FROM instrumented;", itersize=1, primary=True)
+        next(rows)
+        self.assertEqual([], self.events)
+        rows.close()
+        self.assertEqual(1, self.events[0].rows)
+        self.assertIsNone(self.events[0].error)
+        b"".join(self.db.copy_out("COPY instrumented TO STDOUT;"))
+        self.assertEqual(3, self.events[1].rows)
+        self.db.exec_values("INSERT INTO instrumented (name) VALUES %s;", [("e",), ("f",)], page_size=1)
+        self.assertEqual(2, self.events[-1].rows)
+
+    def test_failed_statements_carry_their_error(self):
+        with self.assertRaises(Exception):
+            self.db.exec_commit("SELECT * FROM not_a_table;")
+        self.assertIsNotNone(self.events[0].error)
+
+    def test_counters_total_the_current_context(self):
+        stats = track_queries()
+        self.db.select("SELECT * FROM instrumented;", primary=True)
+        self.db.select("SELECT * FROM instrumented LIMIT 1;", primary=True)
+        self.assertIs(stats, tracked_queries())
+        self.assertEqual((2, 4, 0), (stats.count, stats.rows, stats.errors))
+        self.assertGreater(stats.seconds, 0)
+
+    def test_broken_hooks_do_not_fail_queries(self):
+        def broken(event):
+            raise RuntimeError("broken hook")
+
+        add_query_hook(broken)
+        try:
+            with self.assertLogs("mupp.db", "ERROR"):
+                self.assertEqual((3,), self.db.select("SELECT count(*) FROM instrumented;", number=1))
+        finally:
+            remove_query_hook(broken)
+
+
+class SlowQueryLogTest(TestCase):
+    def test_logs_slow_queries_with_redacted_params(self):
+        log = SlowQueryLog(lambda: {"slow_query_ms": 10})
+        event = QueryEvent("SELECT *\n  FROM accounts WHERE email = %s;", ("secret@fake.email.com",), None)
+        event.seconds = 0.02
+        with self.assertLogs("mupp.db", "WARNING") as logs:
+            log(event)
+        self.assertIn("SELECT * FROM accounts WHERE email = %s;", logs.output[0])
+        self.assertNotIn("secret", logs.output[0])
+
+    def test_ignores_fast_queries(self):
+        log = SlowQueryLog(lambda: {})
+        event = QueryEvent("SELECT 1;", None, None)
+        event.seconds = 0.01
+        with self.assertNoLogs("mupp.db"):
+            log(event)
+
+    def test_redact_keeps_shape(self):
+        self.assertEqual({"email": "?"}, redact({"email": "a@b.c"}))
+        self.assertEqual(["?", "?"], redact(("a", "b")))
+        self.assertIsNone(redact(None))
@@ -0,0 +1,91 @@
+from unittest import TestCase
+from tempfile import TemporaryDirectory
+from json import dumps
+import os.path as path
+from src.db.utils.db import Database
+
+VERSIONS = [
+    "0001_form_structure_jsonb",
+    "0002_form_responses",
+    "0003_lookup_indexes",
+    "0004_logins_primary_key",
+]
+
+
+class MigrationsTest(TestCase):
+    def setUp(self):
+        self.db = Database("test")
+        self.db.cleanup(True)
+        self.db.open("test")
+
+    def tearDown(self):
+        self.db.cleanup(True)
+
+    def index_names(self) -> set:
+        rows = self.db.select(
+            "SELECT indexname FROM pg_indexes WHERE schemaname = %s;", ("test",)
+        )
+        return {row[0] for row in rows}
+
+    def test_migrates_old_schema_keeping_data(self):
+        self.db.exec_commit(
+            """
+        CREATE TABLE accounts(id SERIAL PRIMARY KEY, username VARCHAR);
+        CREATE TABLE logins(id SERIAL, user_id VARCHAR, session_key VARCHAR UNIQUE NOT NULL);
+        CREATE TABLE hosted_forms(
+          id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+          account_id INT NOT NULL REFERENCES accounts(id) ON DELETE CASCADE,
+          form_structure VARCHAR NOT NULL
+        );
+        INSERT INTO accounts (username) VALUES ('test');
+        INSERT INTO logins (user_id, session_key) VALUES ('1', 'key');
+        """
+        )
+        self.db.exec_commit(
+            "INSERT INTO hosted_forms (account_id, form_structure) VALUES (1, %s);",
+            (dumps({"entities": {}, "root": []}),),
+        )
+
+        self.assertEqual(VERSIONS, self.db.migrate())
+        self.assertEqual(
+            {"entities": {}, "root": []},
+            self.db.tables["hosted_forms"].select(["form_structure"], number=1)["form_structure"],
+        )
+        self.assertEqual([{"user_id": "1"}], self.db.tables["logins"].select(["user_id"]))
+        self.assertTrue(
+            {"logins_pkey", "logins_user_id", "hosted_forms_account_id", "form_responses_answers"}
+            <= self.index_names()
+        )
+        self.assertEqual([], self.db.migrate(), "Expected applied migrations to be skipped")
+
+    def test_migrations_are_idempotent_on_current_schema(self):
+        self.db.exec_sql_file("config/demo_db_setup.sql")
+        self.assertEqual(VERSIONS, self.db.migrate())
+        self.assertEqual(
+            len(VERSIONS), self.db.select("SELECT count(*) FROM schema_migrations;", number=1)[0]
+        )
+
+    def test_failed_migration_is_not_recorded(self):
+        with TemporaryDirectory() as directory:
+            for name, sql in (
+                ("0001_create.sql", "CREATE TABLE migrated (id INT);"),
+                ("0002_broken.sql", "CREATE TABLE migrated_too (id INT); SELECT missing;"),
+            ):
+                with open(path.join(directory, name), "w") as file:
+                    file.write(sql)
+            with self.assertRaises(Exception):
+                self.db.migrate(directory)
+            self.assertFalse(self.db.in_transaction)
+            self.assertIn("migrated", self.db.tables)
+            self.assertNotIn("migrated_too", self.db.tables)
+            self.assertEqual(
+                [("0001_create",)], self.db.select("SELECT version FROM schema_migrations;")
+            )
+            # The advisory lock was released, so another runner can proceed
+            other = Database("test")
+            locked = other.exec_commit(
+                "SELECT pg_try_advisory_lock(hashtext('mupp_migrations.test'));"
+            )
+            other.exec_commit("SELECT pg_advisory_unlock(hashtext('mupp_migrations.test'));")
+            other.cleanup()
+            self.assertEqual((True,), locked)
@@ -0,0 +1,51 @@
+from unittest import TestCase
+from psycopg2.pool import PoolError
+from src.db.utils.db import Database
+from src.db.utils.pool import ConnectionPool
+
+
+class ConnectionPoolTest(TestCase):
+    def setUp(self):
+        self.pool = ConnectionPool(
+            "test", Database.load_config(), max_size=2, checkout_timeout=0.1
+        )
+
+    def tearDown(self):
+        self.pool.close()
+        Database("test").cleanup(True)
+
+    def test_connections_use_pool_schema(self):
+        conn = self.pool.getconn()
+        with conn.cursor() as c:
+            c.execute("SHOW search_path;")
+            self.assertEqual("test", c.fetchone()[0])
+        self.pool.putconn(conn)
+
+    def test_checkout_is_capped_at_max_size(self):
+        first = self.pool.getconn()
+        second = self.pool.getconn()
+        with self.assertRaises(PoolError):
+            self.pool.getconn()
+        self.pool.putconn(first)
+        third = self.pool.getconn()
+        self.assertIs(first, third, "Expected returned connection to be reused")
+        self.pool.putconn(second)
+        self.pool.putconn(third)
+
+    def test_closed_connections_are_replaced(self):
+        conn = self.pool.getconn()
+        conn.close()
+        self.pool.putconn(conn)
+        replacement = self.pool.getconn()
+        self.assertEqual(0, replacement.closed, "Expected a live connection")
+        self.pool.putconn(replacement)
+
+    def test_database_returns_connection_on_close(self):
+        db = Database("test", self.pool)
+        conn = db._conn
+        self.assertTrue(db.is_open)
+        db.close()
+        self.assertFalse(db.is_open)
+        reused = self.pool.getconn()
+        self.assertIs(conn, reused, "Expected closed Database to return its connection")
+        self.pool.putconn(reused)
@@ -0,0 +1,94 @@
+import psycopg2
+from unittest import TestCase, skipUnless
+from src.db.utils.db import Database
+from src.db.utils.replicas import ReplicaSet, close_replica_sets
+
+config = Database.load_config()
+
+
+class ReplicaSetTest(TestCase):
+    def tearDown(self):
+        Database("test").cleanup(True)
+
+    def test_primary_is_not_a_fit_replica(self):
+        replicas = ReplicaSet("test", [config])
+        self.assertIsNone(replicas.getconn(), "Expected a server out of recovery to be skipped")
+        replicas.close()
+
+    def test_unreachable_replica_waits_for_next_check(self):
+        replicas = ReplicaSet("test", [{**config, "port": 1}], check_every=60)
+        self.assertIsNone(replicas.getconn())
+        self.assertFalse(replicas._maybe_fresh(0), "Expected failed replica to be skipped until rechecked")
+        replicas.close()
+
+    def test_reads_fall_back_to_primary(self):
+        replicas = ReplicaSet("test", [config])
+        db = Database("test", replicas=replicas)
+        self.assertEqual((False,), db.select("SELECT pg_is_in_recovery();", number=1))
+        self.assertEqual([(False,)], list(db.stream("SELECT pg_is_in_recovery();")))
+        db.cleanup()
+        replicas.close()
+
+
+@skipUnless(config.get("replicas"), "needs a standby listed under `replicas` in db.yml")
+class ReplicaRoutingTest(TestCase):
+    IN_RECOVERY = "SELECT pg_is_in_recovery();"
+
+    def setUp(self):
+        self.db = Database("test")
+
+    def tearDown(self):
+        self.db.cleanup(True)
+
+    @classmethod
+    def tearDownClass(cls):
+        close_replica_sets()
+
+    def test_reads_use_replica(self):
+        self.assertEqual((True,), self.db.select(self.IN_RECOVERY, number=1))
+        self.assertEqual([(True,)], list(self.db.stream(self.IN_RECOVERY)))
+        self.assertEqual((True,), self.db.select(self.IN_RECOVERY, number=1))
+
+    def test_primary_reads_skip_replica(self):
+        self.assertEqual((False,), self.db.select(self.IN_RECOVERY, number=1, primary=True))
+
+    def test_reads_after_write_use_primary(self):
+        self.assertEqual((True,), self.db.select(self.IN_RECOVERY, number=1))
+        self.db.exec_commit("CREATE TABLE replicated (id INT);")
+        self.assertEqual((False,), self.db.select(self.IN_RECOVERY, number=1))
+        self.assertEqual([], self.db.tables["replicated"].select())
+
+    def test_reads_in_transaction_use_primary(self):
+        with self.db.transaction():
+            self.assertEqual((False,), self.db.select(self.IN_RECOVERY, number=1))
+
+    def test_missing_table_on_replica_falls_back(self):
+        writer = Database("test")
+        writer.exec_commit("CREATE TABLE IF NOT EXISTS replicated (id INT);")
+        writer.exec_commit("INSERT INTO replicated VALUES (1);")
+        writer.cleanup()
+        # Whether or not the standby replayed the table yet, the row is found
+        self.assertEqual([{"id": 1}], self.db.tables["replicated"].select())
+
+    def test_exports_fall_back_while_replica_lags(self):
+        self.assertEqual((True,), self.db.select(self.IN_RECOVERY, number=1))
+        standby = {**config, **config["replicas"][0]}
+        replica = psycopg2.connect(
+            dbname=standby["database"],
+            user=standby["user"],
+            password=standby["password"],
+            host=standby["host"],
+            port=standby["port"],
+        )
+        replica.autocommit = True
+        with replica.cursor() as cursor:
+            cursor.execute("SELECT pg_wal_replay_pause();")
+        try:
+            writer = Database("test")
+            writer.exec_commit("CREATE TABLE lagging (id INT); INSERT INTO lagging VALUES (1);")
+            writer.cleanup()
+            self.assertEqual(b"1\n", b"".join(self.db.copy_out("COPY lagging TO STDOUT;")))
+        finally:
+            with replica.cursor() as cursor:
+                cursor.execute("SELECT pg_wal_replay_resume();")
+            replica.close()
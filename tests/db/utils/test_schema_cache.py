@@ -0,0 +1,60 @@
+from unittest import TestCase
+import time
+from src.db.utils.db import Database, schema_cache
+from src.db.utils.schema_cache import SchemaCache
+
+
+class SchemaCacheTest(TestCase):
+    def setUp(self):
+        self.db = Database("test")
+        self.db.exec_commit("CREATE TABLE IF NOT EXISTS cached (id SERIAL, name VARCHAR);")
+        self.db.fetch_tables()
+
+    def tearDown(self):
+        self.db.cleanup(True)
+
+    def wait_for_eviction(self, cache: SchemaCache, schema: str) -> bool:
+        for _ in range(20):
+            if cache.get_names(schema)[0] is None:
+                return True
+            time.sleep(0.05)
+        return False
+
+    def test_new_database_reuses_cached_tables(self):
+        self.assertEqual(["cached"], list(self.db.tables))
+        self.assertIsNotNone(self.db.tables["cached"])
+        self.assertEqual(["cached"], schema_cache.get_names("test")[0])
+        self.assertIsNotNone(schema_cache.get_columns("test", "cached")[0])
+
+    def test_invalidate_evicts_other_workers(self):
+        """A second cache stands in for another worker process"""
+        worker = SchemaCache(Database.connect)
+        _, token = worker.get_names("test")
+        worker.put_names("test", token, ["cached"])
+        self.assertIsNotNone(worker.get_names("test")[0])
+        self.db.invalidate_tables()
+        self.assertTrue(self.wait_for_eviction(worker, "test"))
+
+    def test_put_ignores_metadata_read_during_ddl(self):
+        _, token = schema_cache.get_columns("test", "cached")
+        self.db.invalidate_tables()
+        schema_cache.put_columns("test", token, "cached", [])
+        self.assertIsNone(schema_cache.get_columns("test", "cached")[0])
+
+    def test_missing_tables_are_not_cached(self):
+        self.assertIsNone(self.db.tables.get("missing"))
+        self.db.exec_commit("CREATE TABLE missing (id SERIAL);")
+        self.assertIsNotNone(self.db.tables.get("missing"))
+
+    def test_columns_skip_dropped_columns(self):
+        self.db.exec_commit("ALTER TABLE cached DROP COLUMN id;")
+        self.db.fetch_tables()
+        columns = self.db.tables["cached"]._columns
+        self.assertEqual([(1, "name")], [(c["ordinal_position"], c["column_name"]) for c in columns])
+
+    def test_generated_tables_are_visible_after_invalidation(self):
+        self.db.exec_commit("CREATE TABLE added (id SERIAL);")
+        self.db.invalidate_tables()
+        other = Database("test")
+        self.assertIsNotNone(other.tables.get("added"))
+        other.cleanup()
@@ -1,5 +1,19 @@
 from unittest import TestCase
-from src.db.utils.db import Database
+from datetime import date, datetime
+from json import loads
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from src.db.utils.db import Database, prepared_statements, to_positional
+from src.db.utils.table import (
+    json_prep,
+    cast_json_timestamp,
+    cast_json_date,
+    In,
+    Between,
+    IsNull,
+    ILike,
+    Ne,
+    Gte,
+)
 
 
 class TableUtilsTest(TestCase):
@@ -257,3 +271,304 @@ class TableUtilsTest(TestCase):
             deleted["test_field"],
             "Expected original and deleted to have same test fields",
         )
+
+    def test_statement_shapes_are_cached(self):
+        first = self.table.statement("select", ["test_field"], {"id": 1})
+        second = self.table.statement("select", ["test_field"], {"id": 2})
+        self.assertIs(first, second, "Expected one compiled statement per shape")
+        self.assertEqual(("test_field",), first.fields)
+        self.assertEqual(("id",), first.where_keys)
+
+    def test_statement_ignores_unknown_columns(self):
+        statement = self.table.statement("update", {"test_field": "x", "bogus": 1}, {"id": 1})
+        self.assertEqual(("test_field",), statement.set_keys)
+        self.assertEqual(["x", 1], statement.values({"test_field": "x", "bogus": 1}, {"id": 1}))
+
+    def test_select_with_prepared_statement(self):
+        expected = self.table.select(where={"id": 2})
+        res = self.table.select(where={"id": 2}, prepare=True)
+        self.assertEqual(expected, res, "Expected prepared select to match plain select")
+        name = self.table.statement("select", [], {"id": 2}).name
+        self.assertIn(name, prepared_statements[self.db._conn])
+        self.assertEqual(expected, self.table.select(where={"id": 2}, prepare=True))
+
+    def test_to_positional_numbers_placeholders(self):
+        self.assertEqual(
+            "SELECT a FROM t WHERE a=$1 AND b=$2",
+            to_positional("SELECT a FROM t WHERE a=%s AND b=%s;"),
+        )
+
+    def test_insert_many_in_chunks_and_returns_objects(self):
+        rows = ({"test_field": f"bulk {i}"} for i in range(5))
+        res = self.table.insert_many(rows, ["id", "test_field"], chunk_size=2)
+        self.assertEqual(5, len(res), "Expected a returned object per inserted row")
+        self.assertEqual("bulk 4", res[4]["test_field"])
+        self.assertEqual(7, len(self.table.select()))
+
+    def test_insert_many_without_rows_does_nothing(self):
+        self.assertIsNone(self.table.insert_many([]))
+        self.assertEqual(2, len(self.table.select()))
+
+    def test_update_many_matches_rows_on_keys(self):
+        res = self.table.update_many(
+            [{"id": 1, "test_field": "first"}, {"id": 2, "test_field": "second"}],
+            ["id"],
+            ["id", "test_field"],
+            chunk_size=1,
+        )
+        self.assertEqual(
+            [{"id": 1, "test_field": "first"}, {"id": 2, "test_field": "second"}],
+            sorted(res, key=lambda row: row["id"]),
+        )
+        self.assertEqual("second", self.table.select(where={"id": 2}, number=1)["test_field"])
+
+    def test_update_many_requires_keys(self):
+        with self.assertRaises(ValueError):
+            self.table.update_many([{"test_field": "everything"}], [])
+
+    def test_upsert_inserts_and_updates(self):
+        self.db.exec_commit(f"ALTER TABLE {self.table_name} ADD UNIQUE (id);")
+        res = self.table.upsert(
+            [{"id": 2, "test_field": "replaced"}, {"id": 10, "test_field": "new"}],
+            ["id"],
+            ["id", "test_field"],
+        )
+        self.assertEqual(2, len(res))
+        self.assertEqual(3, len(self.table.select()))
+        self.assertEqual("replaced", self.table.select(where={"id": 2}, number=1)["test_field"])
+
+    def test_export_csv_uses_labels_for_header(self):
+        data = b"".join(self.table.export_csv({"test_field": 'Test "Field"'}))
+        lines = data.decode().splitlines()
+        self.assertEqual('id,"Test ""Field"""', lines[0])
+        self.assertEqual(["1,dummy", "2,another dummy"], sorted(lines[1:]))
+
+    def test_export_csv_streams_in_chunks(self):
+        self.table.insert_many({"test_field": "x" * 100} for _ in range(200))
+        chunks = list(self.table.export_csv(where={"test_field": "x" * 100}, chunk_size=1024))
+        self.assertGreater(len(chunks), 1, "Expected the export to arrive in several chunks")
+        self.assertEqual(201, len(b"".join(chunks).splitlines()))
+
+    def test_export_csv_closed_early_leaves_connection_usable(self):
+        self.table.insert_many({"test_field": "x" * 100} for _ in range(200))
+        export = self.table.export_csv(chunk_size=256)
+        next(export)
+        export.close()
+        self.assertEqual(202, len(self.table.select()))
+
+    def test_select_stream_yields_objects_lazily(self):
+        self.table.insert_many({"test_field": f"bulk {i}"} for i in range(10))
+        rows = self.table.select(["test_field"], stream=True, itersize=3)
+        self.assertNotIsInstance(rows, list, "Expected an iterator when streaming")
+        self.assertEqual(
+            sorted(row["test_field"] for row in self.table.select(["test_field"])),
+            sorted(row["test_field"] for row in rows),
+        )
+
+    def test_select_stream_with_WHERE(self):
+        res = list(self.table.select(where={"id": 2}, stream=True))
+        self.assertEqual([{"id": 2, "test_field": "another dummy"}], res)
+
+    def test_stream_closed_early_leaves_connection_usable(self):
+        self.table.insert_many({"test_field": f"bulk {i}"} for i in range(10))
+        rows = self.table.select(stream=True, itersize=2)
+        next(rows)
+        rows.close()
+        self.assertEqual(12, len(self.table.select()))
+
+    def test_abandoned_stream_does_not_hold_later_writes(self):
+        rows = self.table.select(stream=True, itersize=1)
+        next(rows)
+        self.assertFalse(self.db.in_transaction)
+        self.table.insert({"test_field": "after the stream"})
+        other = Database(self.db._schema)
+        self.assertEqual(1, len(other.tables[self.table_name].select(where={"test_field": "after the stream"})))
+        other.close()
+        rows.close()
+
+    def test_stream_joins_open_transaction(self):
+        with self.db.transaction():
+            self.table.insert({"test_field": "uncommitted"})
+            rows = list(self.table.select(["test_field"], stream=True))
+        self.assertIn({"test_field": "uncommitted"}, rows)
+
+    def test_select_pages_with_order_by_after_and_limit(self):
+        self.table.insert_many({"test_field": f"bulk {i}"} for i in range(3))
+        first = self.table.select(order_by="id", limit=2)
+        self.assertEqual([1, 2], [row["id"] for row in first])
+        second = self.table.select(order_by="id", after=first[-1]["id"], limit=2)
+        self.assertEqual([3, 4], [row["id"] for row in second])
+        last = self.table.select(["test_field"], order_by="id", after=4, limit=2)
+        self.assertEqual([{"test_field": "bulk 2"}], last)
+
+    def test_select_after_requires_order_by(self):
+        with self.assertRaises(ValueError):
+            self.table.select(after=1)
+        with self.assertRaises(ValueError):
+            self.table.select(order_by="bogus")
+
+    def test_json_casts_match_json_prep(self):
+        for value in [
+            datetime(2024, 1, 31, 9, 30, 0, 123456),
+            datetime(2024, 1, 31, 9, 30, 0, 100000),
+            datetime(2024, 1, 31, 9, 30),
+        ]:
+            self.assertEqual(json_prep(value), cast_json_timestamp(str(value), None))
+        self.assertEqual(
+            "2024-01-31T09:30:00.100Z", cast_json_timestamp("2024-01-31 09:30:00.1+05:30", None)
+        )
+        self.assertEqual(json_prep(date(2024, 1, 31)), cast_json_date("2024-01-31", None))
+        self.assertIsNone(cast_json_timestamp(None, None))
+        self.assertEqual("infinity", cast_json_timestamp("infinity", None))
+
+    def test_select_returns_timestamps_as_json_strings(self):
+        self.db.exec_commit(
+            f"""
+        ALTER TABLE {self.table_name}
+        ADD COLUMN created_at TIMESTAMP DEFAULT '2024-01-31 09:30:00.123456',
+        ADD COLUMN created_on DATE DEFAULT '2024-01-31';
+        """
+        )
+        self.db.invalidate_tables()
+        table = self.db.tables[self.table_name]
+        row = table.select(where={"id": 1}, number=1)
+        self.assertEqual("2024-01-31T09:30:00.123Z", row["created_at"])
+        self.assertEqual("2024-01-31T00:00:00.000Z", row["created_on"])
+        # Connection defaults are untouched for plain queries
+        raw = self.db.select(f"SELECT created_at FROM {self.table_name} WHERE id=1;", number=1)
+        self.assertIsInstance(raw[0], datetime)
+
+    def test_select_as_tuples_follows_column_order(self):
+        res = self.table.select(["test_field", "id"], {"id": 1}, as_tuples=True)
+        self.assertEqual([(1, "dummy")], res)
+
+    def test_select_after_dropped_column(self):
+        self.db.exec_commit(f"ALTER TABLE {self.table_name} ADD COLUMN extra INT;")
+        self.db.exec_commit(f"ALTER TABLE {self.table_name} DROP COLUMN extra;")
+        self.db.exec_commit(f"ALTER TABLE {self.table_name} ADD COLUMN last VARCHAR DEFAULT 'x';")
+        self.db.invalidate_tables()
+        row = self.db.tables[self.table_name].select(where={"id": 1}, number=1)
+        self.assertEqual({"id": 1, "test_field": "dummy", "last": "x"}, row)
+
+    def test_select_json_matches_select(self):
+        self.db.exec_commit(
+            f"ALTER TABLE {self.table_name} ADD COLUMN created_at TIMESTAMP DEFAULT NOW();"
+        )
+        self.db.invalidate_tables()
+        table = self.db.tables[self.table_name]
+        document, count, last = table.select_json(order_by="id", limit=1)
+        self.assertEqual(table.select(order_by="id", limit=1), loads(document))
+        self.assertEqual((1, "1"), (count, last))
+        self.assertEqual(("[]", 0, None), table.select_json(where={"id": 99}))
+
+    def test_select_json_obj_casts_columns(self):
+        self.table.insert({"test_field": '{"nested": [1, 2]}'})
+        document = self.table.select_json_obj(["test_field"], {"id": 3}, {"test_field": "json"})
+        self.assertEqual({"test_field": {"nested": [1, 2]}}, loads(document))
+        self.assertIsNone(self.table.select_json_obj(where={"id": 99}))
+
+    def test_stream_json_yields_a_json_array(self):
+        self.table.insert_many({"test_field": f"bulk {i}"} for i in range(5))
+        chunks = list(self.table.stream_json(order_by="id", itersize=2))
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual(self.table.select(order_by="id"), loads(b"".join(chunks)))
+        self.assertEqual([], loads(b"".join(self.table.stream_json(where={"id": 99}))))
+
+    def test_select_with_predicates(self):
+        self.table.insert_many([{"test_field": "Bulk"}, {"test_field": None}])
+        self.assertEqual(
+            [1, 3], [row["id"] for row in self.table.select(where={"id": In([1, 3, 9])}, order_by="id")]
+        )
+        self.assertEqual(
+            [2, 3], [row["id"] for row in self.table.select(where={"id": Between(2, 3)}, order_by="id")]
+        )
+        self.assertEqual([4], [row["id"] for row in self.table.select(where={"test_field": IsNull()})])
+        self.assertEqual(
+            ["Bulk"], [row["test_field"] for row in self.table.select(where={"test_field": ILike("bul%")})]
+        )
+        self.assertEqual(
+            [3],
+            [row["id"] for row in self.table.select(where={"id": Gte(2), "test_field": Ne("another dummy")})],
+        )
+
+    def test_predicate_shapes_are_cached_by_operator(self):
+        first = self.table.statement("select", [], {"id": In([1])})
+        self.assertIs(first, self.table.statement("select", [], {"id": In([2, 3])}))
+        self.assertIsNot(first, self.table.statement("select", [], {"id": 1}))
+        self.assertEqual([[2, 3]], first.values(where={"id": In([2, 3])}))
+
+    def test_prepared_select_with_predicates(self):
+        res = self.table.select(where={"id": In([2])}, prepare=True)
+        self.assertEqual([{"id": 2, "test_field": "another dummy"}], res)
+
+    def test_select_orders_descending_with_limit_and_offset(self):
+        self.table.insert_many({"test_field": f"bulk {i}"} for i in range(3))
+        res = self.table.select(["id"], order_by="-id", limit=2, offset=1)
+        self.assertEqual([{"id": 4}, {"id": 3}], res)
+        res = self.table.select(["id"], order_by=["-id"], after=3)
+        self.assertEqual([{"id": 2}, {"id": 1}], res)
+
+    def test_update_and_delete_with_predicates(self):
+        res = self.table.update({"test_field": "changed"}, {"id": In([1, 2])}, ["id"])
+        self.assertEqual(2, len(res))
+        res = self.table.delete({"test_field": IsNull(False)}, ["id"])
+        self.assertEqual(2, len(res))
+        self.assertEqual([], self.table.select())
+
+    def test_transaction_commits_once_at_exit(self):
+        other = Database("test")
+        try:
+            with self.db.transaction():
+                self.table.insert({"test_field": "pending"})
+                self.table.update({"test_field": "pending too"}, {"id": 1})
+                self.assertEqual(3, len(self.table.select()), "Expected own writes to be visible")
+                self.assertEqual(2, len(other.tables[self.table_name].select()))
+            self.assertEqual(3, len(other.tables[self.table_name].select(primary=True)))
+        finally:
+            other.cleanup()
+
+    def test_transaction_rolls_back_on_error(self):
+        with self.assertRaises(ValueError):
+            with self.db.transaction():
+                self.table.insert({"test_field": "discarded"})
+                self.table.delete({"id": 1})
+                raise ValueError("abort")
+        self.assertEqual(2, len(self.table.select()))
+        self.assertFalse(self.db.in_transaction)
+
+    def test_nested_transaction_rolls_back_to_savepoint(self):
+        with self.db.transaction():
+            self.table.insert({"test_field": "kept"})
+            try:
+                with self.db.transaction():
+                    self.table.insert({"test_field": "discarded"})
+                    self.db.exec_commit("SELECT * FROM missing_table;")
+            except Exception:
+                pass
+            self.table.insert({"test_field": "also kept"})
+        self.assertEqual(
+            ["kept", "also kept"],
+            [row["test_field"] for row in self.table.select(where={"id": Gte(3)}, order_by="id")],
+        )
+
+    def test_transaction_rollback_forgets_uncommitted_tables(self):
+        with self.assertRaises(ValueError):
+            with self.db.transaction():
+                self.db.exec_commit("CREATE TABLE rolled_back (id INT);")
+                self.db.invalidate_tables()
+                self.assertIn("rolled_back", self.db.tables)
+                raise ValueError("abort")
+        self.assertNotIn("rolled_back", self.db.tables)
+
+    def test_reads_autocommit_without_open_transaction(self):
+        self.table.select()
+        self.assertTrue(self.db._conn.autocommit)
+        self.assertEqual(TRANSACTION_STATUS_IDLE, self.db._conn.info.transaction_status)
+        with self.db.transaction():
+            self.assertFalse(self.db._conn.autocommit)
+        self.assertTrue(self.db._conn.autocommit)
+
+    def test_failed_write_leaves_connection_usable(self):
+        with self.assertRaises(Exception):
+            self.db.exec_commit("INSERT INTO missing_table VALUES (1);")
+        self.assertEqual(2, len(self.table.select()))
@@ -1,13 +1,20 @@
+import copy
+import random
 import unittest
+from json import loads
+from src.db import MatchingAlgorithms
 from src.db.MatchingAlgorithms import (
+    pulp,
     Leader,
     Participant,
     generate_matches,
     generate_parent,
     tier_list_optimized_generator,
+    exact_optimized_generator,
     p_sch_name_conversion,
     l_sch_name_conversion,
     output_schedule,
+    stream_schedule,
     gene_to_schedule,
     gene_evaluator,
     rounds,
@@ -21,6 +28,9 @@ from src.db.MatchingAlgorithms import (
     mutation,
     crossover,
     genetic_optimizer,
+    seed_population,
+    gene_signature,
+    population_diversity,
 )
 
 
@@ -100,6 +110,38 @@ class TestMatchingSystem(unittest.TestCase):
         expected_slots = len(self.participants) * rounds
         self.assertEqual(total_slots_filled, expected_slots)
 
+    @unittest.skipIf(pulp is None, "PuLP is not installed")
+    def test_exact_generator_is_optimal_and_valid(
+        self,
+    ):  # This checks the integer program keeps every scheduling rule and scores at least the heuristic
+        generate_matches(self.leaders, self.participants, self.weights)
+        tier_list_optimized_generator(self.leaders, self.participants)
+        heuristic_score = TMSCalc(generate_parent(self.leaders), self.weights)
+
+        optimal = exact_optimized_generator(self.leaders, self.participants, self.weights)
+        self.assertTrue(optimal)
+        self.assertGreaterEqual(
+            TMSCalc(generate_parent(self.leaders), self.weights), heuristic_score
+        )
+        for leader in self.leaders:
+            for session in leader.schedule:
+                self.assertLessEqual(len(session), max_group_size)
+        for participant in self.participants:
+            self.assertEqual(participant.rounds_scheduled, rounds)
+            self.assertEqual(len(set(participant.schedule)), rounds)
+
+    def test_exact_generator_keeps_heuristic_for_large_events(
+        self,
+    ):  # This checks events over exact_max_slots get the tier list schedule instead of a solve
+        self.addCleanup(setattr, MatchingAlgorithms, "exact_max_slots", MatchingAlgorithms.exact_max_slots)
+        MatchingAlgorithms.exact_max_slots = len(self.leaders) * len(self.participants) * rounds - 1
+        generate_matches(self.leaders, self.participants, self.weights)
+
+        self.assertFalse(exact_optimized_generator(self.leaders, self.participants, self.weights))
+        for participant in self.participants:
+            self.assertEqual(participant.rounds_scheduled, rounds)
+            self.assertEqual(len(set(participant.schedule)), rounds)
+
     def test_participant_schedule_constraints(
         self,
     ):  # This makes sure that the participants don't get overbooked
@@ -145,6 +187,28 @@ class TestMatchingSystem(unittest.TestCase):
         self.assertIn("Miss Piggy", result)
         self.assertIn("Andrew", result)
 
+    def test_stream_schedule_matches_output_schedule(
+        self,
+    ):  # This checks the streamed JSON joins into the output_schedule dict and leaves schedules untouched
+        generate_matches(self.leaders, self.participants, self.weights)
+        tier_list_optimized_generator(self.leaders, self.participants)
+        streamed = loads("".join(stream_schedule(self.leaders, self.participants)))
+        for leader in self.leaders:
+            for group in leader.schedule:
+                self.assertTrue(all(isinstance(p, Participant) for p in group))
+        self.assertEqual(streamed, output_schedule(self.leaders, self.participants))
+
+    def test_stream_schedule_ndjson(
+        self,
+    ):  # This checks that NDJSON mode yields one line per person
+        generate_matches(self.leaders, self.participants, self.weights)
+        tier_list_optimized_generator(self.leaders, self.participants)
+        lines = list(stream_schedule(self.leaders, self.participants, ndjson=True))
+        self.assertEqual(len(lines), len(self.leaders) + len(self.participants))
+        first = loads(lines[0])
+        self.assertEqual(first["name"], self.leaders[0].name)
+        self.assertEqual(len(first["schedule"]), rounds)
+
     def test_gene_evaluator(
         self,
     ):  # This tests the function used to evaluate iterations of the genetic algorithm
@@ -279,6 +343,43 @@ class TestMatchingSystem(unittest.TestCase):
         optimal_gene = genetic_optimizer(self.leaders, self.participants, self.weights)
         self.assertIsInstance(optimal_gene, dict)  
         self.assertTrue(all(isinstance(leader, Leader) for leader in optimal_gene))   
+
+    def test_seed_population_is_independent_of_leader_schedules(self):
+        # Tests that seeded genes are copies from separate runs, not references to leader.schedule
+        generate_matches(self.leaders, self.participants, self.weights)
+        generation = seed_population(self.leaders, self.participants, 5, seed=7)
+        self.assertEqual(len(generation), 5)
+        for gene in generation:
+            for leader in self.leaders:
+                self.assertIsNot(gene[leader], leader.schedule)
+        self.assertGreater(population_diversity(generation), 1)
+
+    def test_seed_population_is_reproducible_without_global_state(self):
+        # Tests that a seed gives the same population without reseeding the random module
+        def seeded_signatures():
+            leaders, participants = copy.deepcopy((self.leaders, self.participants))
+            generate_matches(leaders, participants, self.weights)
+            return [gene_signature(gene) for gene in seed_population(leaders, participants, 3, seed=7)]
+
+        state = random.getstate()
+        self.assertEqual(seeded_signatures(), seeded_signatures())
+        self.assertEqual(state, random.getstate())
+
+    def test_population_diversity_of_identical_genes(self):
+        # Tests that a population of one repeated schedule has no diversity
+        parent = generate_parent(self.leaders)
+        self.assertEqual(population_diversity([parent] * 10), 1)
+
+    def test_genetic_optimizer_stops_early_with_valid_gene(self):
+        # Tests that early stopping still returns a complete, valid schedule
+        optimal_gene = genetic_optimizer(
+            self.leaders, self.participants, self.weights, iterations=50, patience=1, seed=3
+        )
+        for r in range(rounds):
+            round_gene = {leader: [schedule[r]] for leader, schedule in optimal_gene.items()}
+            self.assertTrue(check_valid_gene(round_gene))
+        scheduled = sum(len(group) for schedule in optimal_gene.values() for group in schedule)
+        self.assertEqual(scheduled, len(self.participants) * rounds)
     
 
 if __name__ == "__main__":
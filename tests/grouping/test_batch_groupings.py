@@ -0,0 +1,119 @@
+from unittest import TestCase
+from tempfile import TemporaryDirectory
+from json import dumps, loads
+import csv
+import os.path as path
+import random
+from src.db.utils.db import Database
+from src.db.form_hosting import get_column_label_map
+from src.db.response_store import get_response_store
+from src.db.batch_groupings import (
+    load_csv_rows,
+    solve_source,
+    run_batch,
+    write_results_to_files,
+    format_summary,
+)
+from src.db.MatchingAlgorithms import rounds
+
+COLUMNS = ["id", "name", "email", "are_you_a_group_leader", "competitive", "difficulty"]
+
+
+class BatchGroupingsTest(TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.csv_paths = [self.write_export(f"form-{i}") for i in range(2)]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_export(self, form_id: str) -> str:
+        csv_path = path.join(self.tmp.name, f"{form_id}.csv")
+        with open(csv_path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(COLUMNS)
+            for i in range(25):
+                is_leader = i < 5
+                writer.writerow([
+                    i + 1,
+                    f"{'Leader' if is_leader else 'Participant'}{i}",
+                    f"person{i}@game.com",
+                    "true" if is_leader else "false",
+                    random.randint(1, 3),
+                    random.randint(1, 3),
+                ])
+        return csv_path
+
+    def test_solve_source_schedules_csv_export(self):
+        result = solve_source(("csv", self.csv_paths[0], "form-0"))
+        self.assertNotIn("error", result)
+        self.assertEqual(5, result["leaders"])
+        self.assertEqual(20, result["participants"])
+        self.assertEqual(25, len(result["schedule"]))
+        self.assertEqual(rounds, len(result["schedule"]["Participant10"]))
+        self.assertGreaterEqual(result["score"], 0)
+
+    def test_solve_source_reports_errors(self):
+        result = solve_source(("csv", path.join(self.tmp.name, "missing.csv"), "missing"))
+        self.assertIn("error", result, "Expected missing export to be reported")
+
+    def test_run_batch_preserves_order_and_writes_files(self):
+        sources = [("csv", p, f"form-{i}") for i, p in enumerate(self.csv_paths)]
+        results = run_batch(sources, workers=2)
+        self.assertEqual(["form-0", "form-1"], [r["form_id"] for r in results])
+
+        write_results_to_files(results, self.tmp.name)
+        with open(path.join(self.tmp.name, "form-1.json")) as file:
+            schedule = loads(file.read())
+        self.assertEqual(results[1]["schedule"], schedule)
+        self.assertIn("2 solved, 0 failed", format_summary(results))
+
+
+class ExportRoundTripTest(TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.db = Database("test")
+        self.db.cleanup(True)
+        self.db.exec_sql_file("config/demo_db_setup.sql")
+        account_id = self.db.exec_commit(
+            "INSERT INTO accounts (username, email, password, salt) VALUES (%s, %s, %s, %s) RETURNING id;",
+            ("test", "test@fake.email.com", "dummy", "salt"),
+        )[0]
+        labels = ["Your Name", "Email", "Are you a group leader?", "Competitive"]
+        form_data = {
+            "entities": {
+                f"q{i}": {"type": "textField", "attributes": {"label": label}}
+                for i, label in enumerate(labels)
+            },
+            "root": [f"q{i}" for i in range(len(labels))],
+        }
+        self.form_id = self.db.exec_commit(
+            "INSERT INTO hosted_forms (account_id, form_structure) VALUES (%s, %s) RETURNING id;",
+            (account_id, dumps(form_data)),
+        )[0]
+        self.store = get_response_store()
+        self.store.create(self.db, self.form_id)
+        for i in range(12):
+            self.store.insert(self.db, self.form_id, {
+                "your_name": f"Person {i}",
+                "email": f"person{i}@game.com",
+                "are_you_a_group_leader": "true" if i < rounds else "false",
+                "competitive": str(random.randint(1, 3)),
+            })
+
+    def tearDown(self):
+        self.db.cleanup(True)
+        self.tmp.cleanup()
+
+    def test_exported_csv_solves_from_the_cli(self):
+        csv_path = path.join(self.tmp.name, f"{self.form_id}.csv")
+        labels = get_column_label_map(self.db, self.form_id)
+        with open(csv_path, "wb") as file:
+            for chunk in self.store.view(self.db, self.form_id).export_csv(labels):
+                file.write(chunk)
+
+        rows, columns = load_csv_rows(csv_path)
+        self.assertEqual(["your_name", "email", "are_you_a_group_leader", "competitive"], columns)
+        result = solve_source(("csv", csv_path, self.form_id))
+        self.assertNotIn("error", result)
+        self.assertEqual((rounds, 12 - rounds), (result["leaders"], result["participants"]))
@@ -0,0 +1,70 @@
+from unittest import TestCase
+from tempfile import TemporaryDirectory
+import os.path as path
+from src.db.score_matrix import ScoreMatrix
+from src.db.MatchingAlgorithms import Leader, Participant, rounds, tier_list_optimized_generator
+from src.db.form_hosting import solve_groupings
+
+
+class ScoreMatrixTest(TestCase):
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.weights = [5, 2, 1]
+        self.leaders = [
+            Leader(f"Leader{i}", f"leader{i}@game.com", [i % 3, i % 2, 1]) for i in range(7)
+        ]
+        self.participants = [
+            Participant(f"Participant{i}", f"p{i}@game.com", [i % 3, (i // 2) % 2, i % 4])
+            for i in range(30)
+        ]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def assert_scores_match(self, scores: ScoreMatrix):
+        for leader in self.leaders:
+            for participant in self.participants:
+                self.assertEqual(
+                    leader.match_participant(participant, self.weights),
+                    scores.score(leader, participant),
+                )
+
+    def test_in_memory_matrix_matches_direct_scores(self):
+        scores = ScoreMatrix.build(self.leaders, self.participants, self.weights)
+        self.assert_scores_match(scores)
+        scores.close()
+
+    def test_file_backed_matrix_written_in_blocks(self):
+        score_path = path.join(self.tmp.name, "form.scores")
+        scores = ScoreMatrix.build(
+            self.leaders, self.participants, self.weights, score_path, block_rows=3
+        )
+        self.assertEqual(len(self.leaders) * len(self.participants) * 4, path.getsize(score_path))
+        self.assert_scores_match(scores)
+        scores.close()
+
+        shared = ScoreMatrix.open(self.leaders, self.participants, score_path)
+        self.assert_scores_match(shared)
+        shared.close()
+
+    def test_open_rejects_mismatched_file(self):
+        score_path = path.join(self.tmp.name, "form.scores")
+        ScoreMatrix.build(self.leaders, self.participants, self.weights, score_path).close()
+        with self.assertRaises(ValueError):
+            ScoreMatrix.open(self.leaders[:2], self.participants, score_path)
+
+    def test_tier_list_reads_matrix_without_buckets(self):
+        score_path = path.join(self.tmp.name, "form.scores")
+        scores = ScoreMatrix.build(self.leaders, self.participants, self.weights, score_path)
+        tier_list_optimized_generator(self.leaders, self.participants, scores)
+        scores.close()
+        self.assertTrue(all(not bucket for leader in self.leaders for bucket in leader.matches))
+        for participant in self.participants:
+            self.assertEqual(rounds, participant.rounds_scheduled)
+            self.assertEqual(rounds, len(set(participant.schedule)))
+
+    def test_solve_removes_score_file(self):
+        score_path = path.join(self.tmp.name, "form.scores")
+        solve_groupings(self.leaders, self.participants, score_path=score_path)
+        self.assertFalse(path.exists(score_path))
+        self.assertTrue(all(p.rounds_scheduled == rounds for p in self.participants))